@@ -5,5 +5,20 @@ from .run_wL2 import run_wL2
 from .query_point import query_point
 from .geodetic2enu import geodetic2enu
 from .enu2geodetic import enu2geodetic
+from .fast_MKA import fast_MKA
+from .get_tiles import get_tiles
+from .fast_med_filt import fast_med_filt
+from .fast_wL2 import fast_wL2
+from .run_kernel_tasks import run_kernel_tasks
+from .result_cache import ResultCache
+from .query_index import QueryIndex, circle_coordinates
+from .window_plane_fit import window_plane_fit
+from .radius_graph import radius_graph
+from .lof_sweep import lof_sweep
+from .roc_batch import roc_batch, hdf5_scores
+from .mka_accumulator import MKAAccumulator
+from .geometry import Geometry
+from .roi import roi_bounds
+from .ingest import read_offset_array, scatter_stack
 import pandas as pd
 import numpy as np
\ No newline at end of file
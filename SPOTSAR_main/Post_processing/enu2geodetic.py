@@ -1,25 +1,31 @@
-def enu2geodetic(x,y,z, lat_org, lon_org, alt_org):
-    transformer1 = pyproj.Transformer.from_crs(
-        {"proj":'latlong', "ellps":'WGS84', "datum":'WGS84'},
-        {"proj":'geocent', "ellps":'WGS84', "datum":'WGS84'},
-        )
-    transformer2 = pyproj.Transformer.from_crs(
-        {"proj":'geocent', "ellps":'WGS84', "datum":'WGS84'},
-        {"proj":'latlong', "ellps":'WGS84', "datum":'WGS84'},
-        )
-    
-    x_org, y_org, z_org = transformer1.transform( lon_org,lat_org,  alt_org,radians=False)
-    ecef_org=np.array([[x_org,y_org,z_org]]).T
-    
-    rot1 =  scipy.spatial.transform.Rotation.from_euler('x', -(90-lat_org), degrees=True).as_matrix()#angle*-1 : left handed *-1
-    rot3 =  scipy.spatial.transform.Rotation.from_euler('z', -(90+lon_org), degrees=True).as_matrix()#angle*-1 : left handed *-1
+import numpy as np
 
-    rotMatrix = rot1.dot(rot3)
+from .geodetic2enu import lla2ecef, ecef2lla, enu_rotation
 
-    ecefDelta = rotMatrix.T.dot( np.array([[x,y,z]]).T )
-    ecef = ecefDelta+ecef_org
-    lon, lat, alt = transformer2.transform( ecef[0,0],ecef[1,0],ecef[2,0],radians=False)
 
-    return [lat,lon,alt]
+def enu2geodetic(x, y, z, lat_org, lon_org, alt_org, method="pyproj"):
+    """
+    converts local east, north, up coordinates relative to an origin to geodetic coordinates.
+    accepts arrays of points and either one origin or one origin per point.
 
+    Args:
+        x, y, z (array-like): east, north and up coordinates in m
+        lat_org, lon_org, alt_org (array-like): coordinates of the origin(s) (degrees, m),
+                                                broadcastable with the points
+        method (str, optional): ECEF conversion, 'pyproj' (cached transformer) or 'numpy'
+                                (closed form). Defaults to "pyproj".
 
+    Returns:
+        [lat, lon, alt]: coordinates of the points (degrees, m)
+    """
+    x_org, y_org, z_org = lla2ecef(lat_org, lon_org, alt_org, method=method)
+    enu = np.stack(np.broadcast_arrays(*[np.asarray(v, dtype=np.float64) for v in (x, y, z)]), axis=-1)
+    rot = enu_rotation(lat_org, lon_org)
+    # inverse rotation is the transpose
+    ecef_delta = np.einsum("...ji,...j->...i", rot, enu)
+    lat, lon, alt = ecef2lla(
+        ecef_delta[..., 0] + x_org, ecef_delta[..., 1] + y_org, ecef_delta[..., 2] + z_org, method=method
+    )
+    if np.ndim(lat) == 0:
+        return [float(lat), float(lon), float(alt)]
+    return [lat, lon, alt]
@@ -0,0 +1,207 @@
+import numpy as np
+from numba import njit, prange
+
+
+@njit(cache=True)
+def _block_sum(a, start, n):
+    """
+    sum of at most 128 elements, unrolled in the same way as numpy's pairwise sum
+    """
+    if n < 8:
+        res = 0.0
+        for i in range(start, start + n):
+            res += a[i]
+        return res
+    r = np.empty(8)
+    for k in range(8):
+        r[k] = a[start + k]
+    i = 8
+    while i < n - (n % 8):
+        for k in range(8):
+            r[k] += a[start + i + k]
+        i += 8
+    res = ((r[0] + r[1]) + (r[2] + r[3])) + ((r[4] + r[5]) + (r[6] + r[7]))
+    while i < n:
+        res += a[start + i]
+        i += 1
+    return res
+
+
+@njit(cache=True)
+def _pairwise_sum(a, start, n):
+    """
+    summation in the same order as numpy's pairwise sum (np.sum) for
+    contiguous float64 data, so that results are bit-compatible with np.nanmean.
+    the recursion of numpy is replaced by an explicit post-order traversal
+    """
+    if n <= 128:
+        return _block_sum(a, start, n)
+    starts = np.empty(128, dtype=np.int64)
+    sizes = np.empty(128, dtype=np.int64)
+    visited = np.zeros(128, dtype=np.bool_)
+    values = np.empty(128)
+    n_values = 0
+    starts[0] = start
+    sizes[0] = n
+    top = 1
+    while top > 0:
+        s = starts[top - 1]
+        m = sizes[top - 1]
+        if m <= 128:
+            top -= 1
+            values[n_values] = _block_sum(a, s, m)
+            n_values += 1
+        elif visited[top - 1]:
+            # both halves are done, combine as left + right
+            top -= 1
+            visited[top] = False
+            values[n_values - 2] = values[n_values - 2] + values[n_values - 1]
+            n_values -= 1
+        else:
+            # divide by two but avoid non-multiples of unroll factor
+            visited[top - 1] = True
+            m2 = m // 2
+            m2 -= m2 % 8
+            # push right half first so that the left half is summed first
+            starts[top] = s + m2
+            sizes[top] = m - m2
+            starts[top + 1] = s
+            sizes[top + 1] = m2
+            top += 2
+    return values[0]
+
+
+@njit(cache=True)
+def _nanpercentile_sorted(vals, n, q):
+    """
+    linear percentile of the first n (sorted, nan free) elements of vals,
+    following the index and interpolation rules of np.nanpercentile
+    """
+    virtual_index = (n - 1) * (q / 100.0)
+    prev_f = np.floor(virtual_index)
+    if virtual_index >= n - 1:
+        prev_idx = n - 1
+        next_idx = n - 1
+        prev_f = -1.0
+    elif virtual_index < 0:
+        prev_idx = 0
+        next_idx = 0
+        prev_f = 0.0
+    else:
+        prev_idx = int(prev_f)
+        next_idx = prev_idx + 1
+    gamma = virtual_index - prev_f
+    a = vals[prev_idx]
+    b = vals[next_idx]
+    diff_b_a = b - a
+    if gamma >= 0.5:
+        return b - diff_b_a * (1 - gamma)
+    return a + diff_b_a * gamma
+
+
+@njit(cache=True)
+def _completion_mask(stack, window_size, comp_lim):
+    """
+    True where the fraction of the stack that is nan does not exceed comp_lim
+    """
+    n_stack, n_rows, n_cols = stack.shape
+    keep = np.empty((n_rows, n_cols), dtype=np.bool_)
+    for row in range(n_rows):
+        for col in range(n_cols):
+            n_nan = 0
+            for k in range(n_stack):
+                if np.isnan(stack[k, row, col]):
+                    n_nan += 1
+            nan_frac = (n_nan / (window_size**2)) / n_stack
+            keep[row, col] = nan_frac <= comp_lim
+    return keep
+
+
+@njit(parallel=True, cache=True)
+def _MKA_kernel(stack_R, stack_A, window_size, comp_lim):
+    n_stack, n_rows, n_cols = stack_R.shape
+    n_win = n_stack * window_size * window_size
+    offset = window_size // 2
+
+    # remove data that is nan for too many different window sizes
+    keep_R = _completion_mask(stack_R, window_size, comp_lim)
+    keep_A = _completion_mask(stack_A, window_size, comp_lim)
+
+    MKA_R = np.full((n_rows, n_cols), np.nan)
+    MKA_A = np.full((n_rows, n_cols), np.nan)
+
+    for win_i in prange(n_rows - window_size + 1):
+        win = np.empty(n_win)
+        sorted_win = np.empty(n_win)
+        for win_j in range(n_cols - window_size + 1):
+            for c in range(2):
+                if c == 0:
+                    stack = stack_R
+                    keep = keep_R
+                else:
+                    stack = stack_A
+                    keep = keep_A
+                # collect window in (stack, row, col) order
+                n_valid = 0
+                idx = 0
+                for k in range(n_stack):
+                    for a in range(window_size):
+                        for b in range(window_size):
+                            if keep[win_i + a, win_j + b]:
+                                v = stack[k, win_i + a, win_j + b]
+                            else:
+                                v = np.nan
+                            win[idx] = v
+                            if not np.isnan(v):
+                                sorted_win[n_valid] = v
+                                n_valid += 1
+                            idx += 1
+                if n_valid == 0:
+                    continue
+                sorted_win[:n_valid] = np.sort(sorted_win[:n_valid])
+                lower = _nanpercentile_sorted(sorted_win, n_valid, 2.5)
+                upper = _nanpercentile_sorted(sorted_win, n_valid, 97.5)
+
+                # mask data outside 95% confidence interval, nans count as zero
+                count = 0
+                for idx in range(n_win):
+                    v = win[idx]
+                    if np.isnan(v) or v < lower or v > upper:
+                        win[idx] = 0.0
+                    else:
+                        count += 1
+                if count == 0:
+                    continue
+                mean = _pairwise_sum(win, 0, n_win) / count
+                if c == 0:
+                    MKA_R[win_i + offset, win_j + offset] = mean
+                else:
+                    MKA_A[win_i + offset, win_j + offset] = mean
+    return MKA_R, MKA_A
+
+
+def fast_MKA(stack_R, stack_A, window_size=1, comp_lim=0.5):
+    """
+    compiled multi-kernel averaging of range and azimuth offsets in one pass.
+    per window the data outside the 95% confidence interval is removed and
+    the remaining data is averaged, giving the same result as the loop in
+    MultiKernel.Run_MKA
+
+    Args:
+        stack_R (np.ndarray): range offsets with shape (n_kernels, rows, cols)
+        stack_A (np.ndarray): azimuth offsets with shape (n_kernels, rows, cols)
+        window_size (int, optional): window dimension for MKA, odd numbers
+                                     prefered because of pixel centering.
+                                     Defaults to 1.
+        comp_lim (float, optional): completion limit between [0.0, 1.0]
+                                    Only take data for MKA if more than
+                                    comp_lim of the stack is not nan.
+                                    Defaults to 0.5.
+
+    Returns:
+        MKA_R_off: multi-kernel averaged range offset map
+        MKA_A_off: multi-kernel averaged azimuth offset map
+    """
+    stack_R = np.ascontiguousarray(stack_R, dtype=np.float64)
+    stack_A = np.ascontiguousarray(stack_A, dtype=np.float64)
+    return _MKA_kernel(stack_R, stack_A, int(window_size), float(comp_lim))
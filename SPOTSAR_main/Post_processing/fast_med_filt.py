@@ -0,0 +1,138 @@
+import numpy as np
+from numba import njit, prange
+from skimage.morphology import disk
+
+
+@njit(cache=True)
+def _reflect(idx, n):
+    """
+    index into the data using scipy.ndimage 'reflect' boundary mode (d c b a | a b c d | d c b a)
+    """
+    if n == 1:
+        return 0
+    period = 2 * n
+    idx = idx % period
+    if idx >= n:
+        idx = period - idx - 1
+    return idx
+
+
+@njit(cache=True)
+def _insert(sorted_win, n, value):
+    """
+    inserts value in the sorted first n elements of sorted_win, returns new n
+    """
+    lo = 0
+    hi = n
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if sorted_win[mid] < value:
+            lo = mid + 1
+        else:
+            hi = mid
+    for k in range(n, lo, -1):
+        sorted_win[k] = sorted_win[k - 1]
+    sorted_win[lo] = value
+    return n + 1
+
+
+@njit(cache=True)
+def _remove(sorted_win, n, value):
+    """
+    removes one occurrence of value from the sorted first n elements of sorted_win, returns new n
+    """
+    lo = 0
+    hi = n
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if sorted_win[mid] < value:
+            lo = mid + 1
+        else:
+            hi = mid
+    for k in range(lo, n - 1):
+        sorted_win[k] = sorted_win[k + 1]
+    return n - 1
+
+
+@njit(cache=True)
+def _median(sorted_win, n):
+    """
+    median as computed by np.nanmedian (mean of the middle values for even n)
+    """
+    if n == 0:
+        return np.nan
+    half = n // 2
+    if n % 2 == 1:
+        return sorted_win[half]
+    return (sorted_win[half - 1] + sorted_win[half]) / 2
+
+
+@njit(parallel=True, cache=True)
+def _med_filt_kernel(maps, col_lo, col_hi, n_footprint):
+    n_maps, n_rows, n_cols = maps.shape
+    n_fp_rows = col_lo.shape[0]
+    radius = n_fp_rows // 2
+    filtered = np.empty((n_maps, n_rows, n_cols))
+
+    for row in prange(n_rows):
+        sorted_win = np.empty(n_footprint)
+        for m in range(n_maps):
+            # fill the sorted window of the first pixel of the row
+            n = 0
+            for fr in range(n_fp_rows):
+                if col_lo[fr] > col_hi[fr]:
+                    continue
+                src_row = _reflect(row + fr - radius, n_rows)
+                for dc in range(col_lo[fr], col_hi[fr] + 1):
+                    value = maps[m, src_row, _reflect(dc, n_cols)]
+                    if not np.isnan(value):
+                        n = _insert(sorted_win, n, value)
+            filtered[m, row, 0] = _median(sorted_win, n)
+
+            # slide along the row: per footprint row one value leaves and one enters
+            for col in range(1, n_cols):
+                for fr in range(n_fp_rows):
+                    if col_lo[fr] > col_hi[fr]:
+                        continue
+                    src_row = _reflect(row + fr - radius, n_rows)
+                    value = maps[m, src_row, _reflect(col - 1 + col_lo[fr], n_cols)]
+                    if not np.isnan(value):
+                        n = _remove(sorted_win, n, value)
+                    value = maps[m, src_row, _reflect(col + col_hi[fr], n_cols)]
+                    if not np.isnan(value):
+                        n = _insert(sorted_win, n, value)
+                filtered[m, row, col] = _median(sorted_win, n)
+    return filtered
+
+
+def fast_med_filt(R_off, A_off, filt_radius):
+    """
+    compiled nan-aware median filter with a disk shaped footprint, filters range and
+    azimuth offsets in one pass. gives the same result as
+    scipy.ndimage.generic_filter(data, np.nanmedian, footprint=disk(filt_radius))
+    but keeps a sorted window that is updated while sliding along each row
+    instead of calling np.nanmedian per pixel.
+
+    Args:
+        R_off (np.ndarray): range offset map
+        A_off (np.ndarray): azimuth offset map (same shape as R_off)
+        filt_radius (int): radius of the disk shaped footprint in pixels
+
+    Returns:
+        R_off_med: median filtered range offset map
+        A_off_med: median filtered azimuth offset map
+    """
+    footprint = disk(radius=filt_radius).astype(bool)
+    # column span of the footprint per footprint row (disks have no gaps within a row)
+    col_lo = np.zeros(footprint.shape[0], dtype=np.int64)
+    col_hi = np.full(footprint.shape[0], -1, dtype=np.int64)
+    center = footprint.shape[1] // 2
+    for fr, fp_row in enumerate(footprint):
+        cols = np.flatnonzero(fp_row)
+        if cols.size > 0:
+            col_lo[fr] = cols[0] - center
+            col_hi[fr] = cols[-1] - center
+
+    maps = np.stack((R_off, A_off), axis=0).astype(np.float64)
+    filtered = _med_filt_kernel(maps, col_lo, col_hi, int(footprint.sum()))
+    return filtered[0].astype(np.result_type(R_off)), filtered[1].astype(np.result_type(A_off))
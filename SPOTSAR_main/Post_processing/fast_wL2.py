@@ -0,0 +1,135 @@
+import numpy as np
+from numba import njit, prange
+
+
+def _grid_halo(idx_map, win):
+    """
+    number of grid rows and columns that can hold points within win of each other,
+    based on the smallest spacing of idx_map along each axis
+
+    Args:
+        idx_map (np.ndarray): 2d map of range or azimuth index (nan where there is no point)
+        win (int): window size in the same units as idx_map
+
+    Returns:
+        halo: (row_halo, col_halo), None for an axis along which idx_map does not change
+    """
+    halo = []
+    for axis in (0, 1):
+        steps = np.abs(np.diff(idx_map, axis=axis))
+        steps = steps[np.isfinite(steps) & (steps > 0)]
+        if steps.size == 0:
+            halo.append(None)
+        else:
+            halo.append(int(np.ceil(win / steps.min())))
+    return halo
+
+
+@njit(parallel=True, cache=True)
+def _wL2_kernel(
+    X_map, Y_map, Lat_map, Lon_map, R_map, A_map, valid, Row_index_vec, Col_index_vec, row_halo, col_halo, A_win, R_win
+):
+    n_rows, n_cols = valid.shape
+    n_points = Row_index_vec.shape[0]
+    wL2_vec = np.full(n_points, np.nan)
+    for idx in prange(n_points):
+        row = Row_index_vec[idx]
+        col = Col_index_vec[idx]
+        q_x = X_map[row, col]
+        q_y = Y_map[row, col]
+        q_lat = Lat_map[row, col]
+        q_lon = Lon_map[row, col]
+        q_r_idx = R_map[row, col]
+        q_a_idx = A_map[row, col]
+        cos_q_lat = np.cos(q_lat)
+
+        n = 0
+        weight_sum = 0.0
+        weighted_L2 = 0.0
+        for nb_row in range(max(row - row_halo, 0), min(row + row_halo + 1, n_rows)):
+            for nb_col in range(max(col - col_halo, 0), min(col + col_halo + 1, n_cols)):
+                if not valid[nb_row, nb_col]:
+                    continue
+                d_r = R_map[nb_row, nb_col] - q_r_idx
+                d_a = A_map[nb_row, nb_col] - q_a_idx
+                # same overlap criterion as the loop over all points
+                if not (abs(d_r) < R_win and abs(d_a) < A_win and d_r != 0 and d_a != 0):
+                    continue
+                lat = Lat_map[nb_row, nb_col]
+                a = np.sin((lat - q_lat) / 2) ** 2 + cos_q_lat * np.cos(lat) * np.sin(
+                    (Lon_map[nb_row, nb_col] - q_lon) / 2
+                ) ** 2
+                dist = 2 * np.arcsin(np.sqrt(a))
+                weight = 1 / dist**2
+                weight_sum += weight
+                weighted_L2 += weight * np.hypot(X_map[nb_row, nb_col] - q_x, Y_map[nb_row, nb_col] - q_y)
+                n += 1
+        if n > 0:
+            wL2_vec[idx] = weighted_L2 / weight_sum / n
+    return wL2_vec
+
+
+def fast_wL2(
+    X_off, X_off_vec, Y_off_vec, Lat_off_vec, Lon_off_vec, R_idx_vec, A_idx_vec, Row_index_vec, Col_index_vec, A_win, R_win
+):
+    """
+    compiled weighted L2 outlier score. instead of comparing every point with all other
+    points, the neighbours of a point are gathered from the grid cells around it: the
+    points lie on a regular range/azimuth grid, so only a small stencil of rows and columns
+    can be within the window. runs in parallel over the points.
+
+    the score of a point is the inverse squared distance weighted mean of the length of the
+    difference vector (X_off, Y_off) with all points that overlap with its window
+    (|dR| < R_win and |dA| < A_win, excluding the same range and azimuth index),
+    divided by the number of overlapping points.
+
+    Args:
+        X_off (np.ndarray): 2d map of the quasi E-W offset (used for the shape of the output)
+        X_off_vec (np.ndarray): quasi E-W offset of the points
+        Y_off_vec (np.ndarray): quasi N-S offset of the points
+        Lat_off_vec (np.ndarray): latitude of the points in degrees
+        Lon_off_vec (np.ndarray): longitude of the points in degrees
+        R_idx_vec (np.ndarray): range index of the points
+        A_idx_vec (np.ndarray): azimuth index of the points
+        Row_index_vec (np.ndarray): row of the points in the 2d map
+        Col_index_vec (np.ndarray): column of the points in the 2d map
+        A_win (int): window size in azimuth
+        R_win (int): window size in range
+
+    Returns:
+        wL2: 2d map of the weighted L2 score, nan for points without overlapping neighbours
+    """
+    shape = np.shape(X_off)
+    Row_index_vec = np.asarray(Row_index_vec, dtype=np.int64)
+    Col_index_vec = np.asarray(Col_index_vec, dtype=np.int64)
+
+    # scatter the points back onto the grid so neighbours can be found by grid offsets
+    maps = []
+    for vec in (X_off_vec, Y_off_vec, np.radians(Lat_off_vec), np.radians(Lon_off_vec), R_idx_vec, A_idx_vec):
+        grid = np.full(shape, np.nan)
+        grid[Row_index_vec, Col_index_vec] = vec
+        maps.append(grid)
+    valid = np.zeros(shape, dtype=bool)
+    valid[Row_index_vec, Col_index_vec] = True
+
+    # a neighbour has to be within the window in both range and azimuth,
+    # so the smallest of the two halos bounds the stencil along each axis
+    R_map, A_map = maps[4], maps[5]
+    halos = [_grid_halo(R_map, R_win), _grid_halo(A_map, A_win)]
+    row_halo, col_halo = [
+        min([h[axis] for h in halos if h[axis] is not None], default=shape[axis]) for axis in (0, 1)
+    ]
+
+    wL2_vec = _wL2_kernel(
+        *maps,
+        valid,
+        Row_index_vec,
+        Col_index_vec,
+        row_halo,
+        col_halo,
+        float(A_win),
+        float(R_win),
+    )
+    wL2 = np.full(shape, np.nan)
+    wL2[Row_index_vec, Col_index_vec] = wL2_vec
+    return wL2
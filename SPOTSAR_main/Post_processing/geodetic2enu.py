@@ -1,22 +1,142 @@
+from functools import lru_cache
+
 import numpy as np
 import pyproj
-import scipy.spatial.transform     
 
+# WGS84 ellipsoid
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+WGS84_E2 = WGS84_F * (2 - WGS84_F)
+
+
+@lru_cache(maxsize=None)
+def geocent_transformer(inverse=False):
+    """
+    latlong -> geocentric (ECEF) transformer (geocentric -> latlong if inverse),
+    created on first use and reused afterwards
+    """
+    latlong = {"proj": "latlong", "ellps": "WGS84", "datum": "WGS84"}
+    geocent = {"proj": "geocent", "ellps": "WGS84", "datum": "WGS84"}
+    if inverse:
+        return pyproj.Transformer.from_crs(geocent, latlong)
+    return pyproj.Transformer.from_crs(latlong, geocent)
+
+
+def lla2ecef(lat, lon, alt, method="pyproj"):
+    """
+    converts WGS84 latitude, longitude (degrees) and height (m) to ECEF coordinates
+
+    Args:
+        lat, lon, alt (array-like): coordinates, any broadcastable shapes
+        method (str, optional): 'pyproj' uses the cached pyproj transformer,
+                                'numpy' uses the closed-form ellipsoid equations. Defaults to "pyproj".
+
+    Returns:
+        x, y, z: ECEF coordinates in m
+    """
+    lat, lon, alt = np.broadcast_arrays(*[np.asarray(v, dtype=np.float64) for v in (lat, lon, alt)])
+    if method == "pyproj":
+        x, y, z = geocent_transformer().transform(lon, lat, alt, radians=False)
+        return np.asarray(x), np.asarray(y), np.asarray(z)
+    if method != "numpy":
+        raise ValueError(f"method should be 'pyproj' or 'numpy', not {method}")
+    lat = np.radians(lat)
+    lon = np.radians(lon)
+    sin_lat = np.sin(lat)
+    cos_lat = np.cos(lat)
+    # prime vertical radius of curvature
+    N = WGS84_A / np.sqrt(1 - WGS84_E2 * sin_lat**2)
+    x = (N + alt) * cos_lat * np.cos(lon)
+    y = (N + alt) * cos_lat * np.sin(lon)
+    z = (N * (1 - WGS84_E2) + alt) * sin_lat
+    return x, y, z
+
+
+def ecef2lla(x, y, z, method="pyproj"):
+    """
+    converts ECEF coordinates to WGS84 latitude, longitude (degrees) and height (m)
+
+    Args:
+        x, y, z (array-like): ECEF coordinates in m, any broadcastable shapes
+        method (str, optional): 'pyproj' uses the cached pyproj transformer,
+                                'numpy' uses the closed-form solution of Zhu (1993). Defaults to "pyproj".
+
+    Returns:
+        lat, lon, alt: coordinates in degrees and m
+    """
+    x, y, z = np.broadcast_arrays(*[np.asarray(v, dtype=np.float64) for v in (x, y, z)])
+    if method == "pyproj":
+        lon, lat, alt = geocent_transformer(inverse=True).transform(x, y, z, radians=False)
+        return np.asarray(lat), np.asarray(lon), np.asarray(alt)
+    if method != "numpy":
+        raise ValueError(f"method should be 'pyproj' or 'numpy', not {method}")
+    a2 = WGS84_A**2
+    b2 = WGS84_B**2
+    ep2 = (a2 - b2) / b2
+    p = np.hypot(x, y)
+    F = 54 * b2 * z**2
+    G = p**2 + (1 - WGS84_E2) * z**2 - WGS84_E2 * (a2 - b2)
+    c = WGS84_E2**2 * F * p**2 / G**3
+    s = np.cbrt(1 + c + np.sqrt(c**2 + 2 * c))
+    k = s + 1 + 1 / s
+    P = F / (3 * k**2 * G**2)
+    Q = np.sqrt(1 + 2 * WGS84_E2**2 * P)
+    r0 = -P * WGS84_E2 * p / (1 + Q) + np.sqrt(
+        a2 / 2 * (1 + 1 / Q) - P * (1 - WGS84_E2) * z**2 / (Q * (1 + Q)) - P * p**2 / 2
+    )
+    U = np.hypot(p - WGS84_E2 * r0, z)
+    V = np.sqrt((p - WGS84_E2 * r0) ** 2 + (1 - WGS84_E2) * z**2)
+    z0 = b2 * z / (WGS84_A * V)
+    alt = U * (1 - b2 / (WGS84_A * V))
+    lat = np.degrees(np.arctan2(z + ep2 * z0, p))
+    lon = np.degrees(np.arctan2(y, x))
+    return lat, lon, alt
+
+
+def enu_rotation(lat_org, lon_org):
+    """
+    rotation matrices from ECEF to local east, north, up at one or many origins
+
+    Args:
+        lat_org, lon_org (array-like): latitude and longitude of the origins in degrees
+
+    Returns:
+        rot: (..., 3, 3) rotation matrices, rows are the east, north and up unit vectors
+    """
+    lat = np.radians(np.asarray(lat_org, dtype=np.float64))
+    lon = np.radians(np.asarray(lon_org, dtype=np.float64))
+    lat, lon = np.broadcast_arrays(lat, lon)
+    sin_lat, cos_lat = np.sin(lat), np.cos(lat)
+    sin_lon, cos_lon = np.sin(lon), np.cos(lon)
+    zero = np.zeros(np.shape(lat))
+    return np.stack(
+        (
+            np.stack((-sin_lon, cos_lon, zero), axis=-1),
+            np.stack((-sin_lat * cos_lon, -sin_lat * sin_lon, cos_lat), axis=-1),
+            np.stack((cos_lat * cos_lon, cos_lat * sin_lon, sin_lat), axis=-1),
+        ),
+        axis=-2,
+    )
 
-def geodetic2enu(lat, lon, alt, lat_org, lon_org, alt_org):
-    transformer = pyproj.Transformer.from_crs(
-        {"proj":'latlong', "ellps":'WGS84', "datum":'WGS84'},
-        {"proj":'geocent', "ellps":'WGS84', "datum":'WGS84'},
-        )
-    x, y, z = transformer.transform( lon,lat,  alt,radians=False)
-    x_org, y_org, z_org = transformer.transform( lon_org,lat_org,  alt_org,radians=False)
-    vec=np.array([[ x-x_org, y-y_org, z-z_org]]).T
 
-    rot1 =  scipy.spatial.transform.Rotation.from_euler('x', -(90-lat_org), degrees=True).as_matrix()#angle*-1 : left handed *-1
-    rot3 =  scipy.spatial.transform.Rotation.from_euler('z', -(90+lon_org), degrees=True).as_matrix()#angle*-1 : left handed *-1
+def geodetic2enu(lat, lon, alt, lat_org, lon_org, alt_org, method="pyproj"):
+    """
+    converts geodetic coordinates to local east, north, up coordinates relative to an origin.
+    accepts arrays of points and either one origin or one origin per point.
 
-    rotMatrix = rot1.dot(rot3)    
-   
-    enu = rotMatrix.dot(vec).T.ravel()
-    return enu.T
+    Args:
+        lat, lon, alt (array-like): coordinates of the points (degrees, m)
+        lat_org, lon_org, alt_org (array-like): coordinates of the origin(s) (degrees, m),
+                                                broadcastable with the points
+        method (str, optional): ECEF conversion, 'pyproj' (cached transformer) or 'numpy'
+                                (closed form). Defaults to "pyproj".
 
+    Returns:
+        enu: (..., 3) array with east, north, up in m ((3,) for a single point)
+    """
+    x, y, z = lla2ecef(lat, lon, alt, method=method)
+    x_org, y_org, z_org = lla2ecef(lat_org, lon_org, alt_org, method=method)
+    vec = np.stack(np.broadcast_arrays(x - x_org, y - y_org, z - z_org), axis=-1)
+    rot = enu_rotation(lat_org, lon_org)
+    return np.einsum("...ij,...j->...i", rot, vec)
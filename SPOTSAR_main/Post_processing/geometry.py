@@ -0,0 +1,101 @@
+import os
+
+import numpy as np
+
+
+class Geometry:
+    """
+    latitude and longitude of a frame from the big-endian float32 .lat/.lon files (GAMMA),
+    opened as read-only memory maps. only the pages of the requested pixels are read and
+    converted to native float64 (0 coordinates become nan), so regions of interest never
+    load the full frame. Geometry.open returns the same object for the same files, so all
+    kernels and pairs of a frame share one geometry.
+
+    Attr
+    ----------
+    Lat_file : str
+        path to latitude file (.lat)
+    Lon_file : str
+        path to longitude file (.lon)
+    Width : int
+        width of the lat/lon files
+    Shape : tuple
+        (lines, width) of the lat/lon files
+    """
+
+    _shared = {}
+
+    def __init__(self, lat_file, lon_file, width):
+        self.Lat_file = lat_file
+        self.Lon_file = lon_file
+        self.Width = int(width)
+        lines = os.path.getsize(lon_file) // (4 * self.Width)
+        self.Shape = (int(lines), self.Width)
+        self._maps = None
+
+    @classmethod
+    def open(cls, lat_file, lon_file, width):
+        """
+        returns the shared geometry of the lat/lon files, created when first opened
+
+        Args:
+            lat_file (str): path to latitude file (.lat)
+            lon_file (str): path to longitude file (.lon)
+            width (int): width of the lat/lon files
+
+        Returns:
+            Geometry: geometry of the frame
+        """
+        key = (os.path.realpath(lat_file), os.path.realpath(lon_file), int(width))
+        geometry = cls._shared.get(key)
+        if geometry is None:
+            geometry = cls(lat_file, lon_file, width)
+            cls._shared[key] = geometry
+        return geometry
+
+    def __getstate__(self):
+        # memory maps are opened again after unpickling instead of copying the frame
+        state = self.__dict__.copy()
+        state["_maps"] = None
+        return state
+
+    @property
+    def maps(self):
+        """(lat, lon) read-only big-endian memory maps with shape (lines, width)"""
+        if self._maps is None:
+            self._maps = tuple(np.memmap(f, dtype=">f4", mode="r", shape=self.Shape) for f in [self.Lat_file, self.Lon_file])
+        return self._maps
+
+    @staticmethod
+    def _to_native(values):
+        values = values.astype(np.float64)
+        # 0,0 coordinates are outside the geocoded area
+        values[values == 0] = np.nan
+        return values
+
+    def gather(self, rows, cols):
+        """
+        latitude and longitude of pixels of the lat/lon files
+
+        Args:
+            rows (np.ndarray): line index of the pixels
+            cols (np.ndarray): column index of the pixels
+
+        Returns:
+            lat, lon: float64 arrays with the shape of rows, nan where the files are 0
+        """
+        flat = np.ravel_multi_index((np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)), self.Shape)
+        return tuple(self._to_native(np.ravel(m)[flat]) for m in self.maps)
+
+    def window(self, rows=slice(None), cols=slice(None)):
+        """
+        latitude and longitude of a window of the lat/lon files
+
+        Args:
+            rows (slice, optional): lines of the window. Defaults to all lines.
+            cols (slice, optional): columns of the window. Defaults to all columns.
+
+        Returns:
+            lat, lon: float64 arrays of the window, nan where the files are 0
+        """
+        return tuple(self._to_native(m[rows, cols]) for m in self.maps)
@@ -0,0 +1,34 @@
+def get_tiles(n_rows, halo, row_bytes, memory_budget=None):
+    """
+    divides the rows of a grid into tiles with halo overlap so that the
+    data needed to process a tile fits in a memory budget
+
+    Args:
+        n_rows (int): number of rows of the grid
+        halo (int): number of rows of overlap needed on both sides of a tile
+                    (e.g. half the window size of a moving window operation)
+        row_bytes (int): number of bytes needed to process a single row of the grid
+        memory_budget (int, optional): maximum number of bytes used per tile.
+                                       Defaults to None, process the grid as one tile.
+
+    Returns:
+        tiles: list of (read_start, read_stop, write_start, write_stop) row limits.
+               data is read from rows read_start:read_stop (tile + halo) and the
+               results for rows write_start:write_stop are valid.
+    """
+    if memory_budget is None:
+        return [(0, n_rows, 0, n_rows)]
+
+    tile_rows = int(memory_budget // row_bytes) - 2 * halo
+    if tile_rows < 1:
+        raise ValueError(
+            f"memory budget of {memory_budget} bytes is too small for a tile of 1 row with a halo of {halo} rows"
+        )
+
+    tiles = []
+    for write_start in range(0, n_rows, tile_rows):
+        write_stop = min(write_start + tile_rows, n_rows)
+        read_start = max(write_start - halo, 0)
+        read_stop = min(write_stop + halo, n_rows)
+        tiles.append((read_start, read_stop, write_start, write_stop))
+    return tiles
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+from .roi import read_offsets
+
+# columns of an offset text file that are used for the stack
+OFFSET_COLUMNS = {"rng": 0, "azi": 1, "ccp": 6, "r_off": 7, "a_off": 8}
+
+# grids of a kernel, in the order of the data of SingleKernel (without ccs)
+STACK_GRIDS = ["R_idx", "A_idx", "R_off", "A_off", "Ccp_off", "Lat_off", "Lon_off"]
+
+
+def offset_dtype(dtype=np.float32):
+    """structured dtype of the offsets of a kernel: integer pixel positions and values in dtype"""
+    return np.dtype([("rng", np.int64), ("azi", np.int64), ("ccp", dtype), ("r_off", dtype), ("a_off", dtype)])
+
+
+def offsets_to_array(d, dtype=np.float32):
+    """
+    converts the offsets of a kernel (pd.DataFrame with the columns of the offset text file)
+    to a structured array with the fields of offset_dtype
+    """
+    offsets = np.empty(len(d), dtype=offset_dtype(dtype))
+    for field, column in OFFSET_COLUMNS.items():
+        offsets[field] = d[column].to_numpy()
+    return offsets
+
+
+def read_offset_array(path, bounds=None, dtype=np.float32):
+    """
+    reads the used columns of an offset text file into a structured array
+
+    Args:
+        path (str): offset text file
+        bounds (tuple, optional): (rng_min, rng_max, azi_min, azi_max) pixel bounds of a region
+                                  of interest, see read_offsets. Defaults to None, whole file.
+        dtype (np.dtype, optional): data type of ccp and the offsets. Defaults to np.float32.
+
+    Returns:
+        np.ndarray: structured array with the fields of offset_dtype
+    """
+    if bounds is not None:
+        return offsets_to_array(read_offsets(path, bounds), dtype)
+    # parsed as pd.read_csv of all columns (int64/float64), so the values are rounded to dtype in the same way
+    d = pd.read_csv(path, header=None, sep=r"\s+", usecols=list(OFFSET_COLUMNS.values()))
+    return offsets_to_array(d, dtype)
+
+
+def offset_ends(offsets):
+    """(rng_first, rng_last, azi_first, azi_last) of the offsets of a kernel, see read_offset_ends"""
+    return (offsets["rng"][0], offsets["rng"][-1], offsets["azi"][0], offsets["azi"][-1])
+
+
+def common_limits(ends):
+    """
+    inner range and azimuth limits of the offsets of all kernels (as crop_stack_ccs)
+
+    Args:
+        ends (list of tuples): (rng_first, rng_last, azi_first, azi_last) of the offsets of every
+                               kernel, see offset_ends and read_offset_ends
+
+    Returns:
+        (rng_min, rng_max, azi_min, azi_max): common grid limits
+    """
+    ends = np.array(ends)
+    return (ends[:, 0].max(), ends[:, 1].min(), ends[:, 2].max(), ends[:, 3].min())
+
+
+def scatter_stack(offsets, limits, r_step, a_step, coordinates, dtype=np.float32):
+    """
+    scatters the offsets of all kernels within the common limits into preallocated
+    (kernel, range, azimuth) cubes, as crop_stack_ccs and assign_data_to_stack do per kernel
+
+    Args:
+        offsets (list of np.ndarray): offsets of every kernel, see read_offset_array
+        limits (tuple): (rng_min, rng_max, azi_min, azi_max) common grid limits, see common_limits
+        r_step (int): range step size in original radar coordinates
+        a_step (int): azimuth step size in original radar coordinates
+        coordinates (callable): function (rng, azi) -> (lat, lon) of offset pixel positions
+        dtype (np.dtype, optional): data type of the cubes, except latitude and longitude
+                                    (float64). Defaults to np.float32.
+
+    Returns:
+        cubes: dict with R_idx, A_idx, R_off, A_off, Ccp_off, Lat_off and Lon_off cubes
+               (nan where a kernel has no offset)
+    """
+    rng_min, rng_max, azi_min, azi_max = limits
+    # +1 to go from number of intervals to number of observations
+    shape = (len(offsets), int((rng_max - rng_min) / r_step) + 1, int((azi_max - azi_min) / a_step) + 1)
+    # lat/lon in float64, everything else in dtype
+    cubes = {name: np.full(shape, np.nan, dtype=np.float64 if name in ["Lat_off", "Lon_off"] else dtype) for name in STACK_GRIDS}
+    for k, o in enumerate(offsets):
+        inside = (o["rng"] >= rng_min) & (o["azi"] >= azi_min) & (o["rng"] <= rng_max) & (o["azi"] <= azi_max)
+        o = o[inside]
+        if o.size == 0:
+            continue
+        # grid index relative to the first offset within the limits
+        i = ((o["rng"] - o["rng"][0]) / r_step).astype(np.int64)
+        j = ((o["azi"] - o["azi"][0]) / a_step).astype(np.int64)
+        cubes["R_idx"][k, i, j] = o["rng"]
+        cubes["A_idx"][k, i, j] = o["azi"]
+        cubes["R_off"][k, i, j] = o["r_off"]
+        cubes["A_off"][k, i, j] = o["a_off"]
+        cubes["Ccp_off"][k, i, j] = o["ccp"]
+        cubes["Lat_off"][k, i, j], cubes["Lon_off"][k, i, j] = coordinates(o["rng"], o["azi"])
+    return cubes
@@ -0,0 +1,48 @@
+import numpy as np
+from sklearn.neighbors import NearestNeighbors
+
+
+def lof_sweep(X, n_neighbors_list, algorithm="auto", leaf_size=30, contamination="auto"):
+    """
+    local outlier factor for several numbers of neighbours from one k-nearest neighbour search.
+    the neighbours of every point are found once for the largest number of neighbours, the
+    k nearest neighbours for a smaller k are the first k of them. the local reachability
+    densities and outlier factors are then computed for each k with array operations, as in
+    sklearn.neighbors.LocalOutlierFactor (fit_predict and negative_outlier_factor_).
+
+    Args:
+        X (np.ndarray): (N, n_features) data
+        n_neighbors_list (list of int): numbers of neighbours
+        algorithm (str, optional): nearest neighbour algorithm (auto, ball_tree, kd_tree, brute). Defaults to "auto".
+        leaf_size (int, optional): leaf size of the ball tree or KD tree. Defaults to 30.
+        contamination (str|float, optional): 'auto' or the fraction of outliers [0-0.5], sets
+                                             the threshold of the labels. Defaults to "auto".
+
+    Returns:
+        results: dict with (labels, negative_outlier_factor) per number of neighbours,
+                 labels are -1 for outliers and 1 for inliers
+    """
+    n_samples = np.shape(X)[0]
+    # as LocalOutlierFactor, at most all other points are neighbours
+    ks = {k: max(1, min(int(k), n_samples - 1)) for k in n_neighbors_list}
+    k_max = max(ks.values())
+    nn = NearestNeighbors(n_neighbors=k_max, algorithm=algorithm, leaf_size=leaf_size).fit(X)
+    # without X the points themselves are not included in their neighbours
+    distances, indices = nn.kneighbors()
+
+    results = {}
+    for n_neighbors, k in ks.items():
+        dist_k = distances[:, :k]
+        ind_k = indices[:, :k]
+        # reachability distance: distance to the neighbour, at least the k-distance of the neighbour
+        reach_dist = np.maximum(dist_k, dist_k[ind_k, -1])
+        lrd = 1.0 / (np.mean(reach_dist, axis=1) + 1e-10)
+        negative_outlier_factor = -np.mean(lrd[ind_k] / lrd[:, np.newaxis], axis=1)
+        if contamination == "auto":
+            offset = -1.5
+        else:
+            offset = np.percentile(negative_outlier_factor, 100.0 * contamination)
+        labels = np.ones(n_samples, dtype=int)
+        labels[negative_outlier_factor < offset] = -1
+        results[n_neighbors] = (labels, negative_outlier_factor)
+    return results
@@ -0,0 +1,312 @@
+import hashlib
+
+import numpy as np
+
+from .fast_MKA import fast_MKA
+from .get_tiles import get_tiles
+
+# percentiles of the trim of the multi-kernel average
+TRIM_PERCENTILES = (2.5, 97.5)
+
+
+def tail_capacity(n_kernels):
+    """
+    number of smallest (and largest) values per pixel needed for the trimmed mean of n_kernels
+    values: the values below the 2.5% percentile and the two values it interpolates between,
+    plus one spare value for the rounding of the percentile index of the largest values
+    """
+    return int((n_kernels - 1) * (TRIM_PERCENTILES[0] / 100.0)) + 3
+
+
+class _TailStats:
+    """
+    per-pixel count, sum and the smallest and largest values of one offset component.
+    Low holds the smallest values ascending and High the negated largest values ascending
+    (both padded with inf), so both tails are updated in the same way.
+    """
+
+    def __init__(self, shape, dtype, capacity):
+        self.Count = np.zeros(shape, dtype=np.int32)
+        self.Sum = np.zeros(shape, dtype=np.float64)
+        self.Low = np.full((capacity,) + shape, np.inf, dtype=dtype)
+        self.High = np.full((capacity,) + shape, np.inf, dtype=dtype)
+
+    @property
+    def Capacity(self):
+        return self.Low.shape[0]
+
+    @staticmethod
+    def _insert(tail, values):
+        """inserts one value per pixel in place, values larger than the tail (and nan) are dropped"""
+        pos = np.sum(tail <= values, axis=0)
+        pos[np.isnan(values)] = tail.shape[0]
+        for k in range(tail.shape[0] - 1, 0, -1):
+            np.copyto(tail[k], tail[k - 1], where=pos < k)
+            np.copyto(tail[k], values, where=pos == k)
+        np.copyto(tail[0], values, where=pos == 0)
+
+    @staticmethod
+    def _remove(tail, values):
+        """
+        removes one value per pixel in place where it is within the tail,
+        returns the mask of the pixels where the tail lost a value
+        """
+        in_tail = ~np.isnan(values) & (values <= tail[-1])
+        # position of the first occurrence of the value
+        pos = np.sum(tail < values, axis=0)
+        for k in range(tail.shape[0] - 1):
+            np.copyto(tail[k], tail[k + 1], where=in_tail & (pos <= k))
+        tail[-1][in_tail] = np.inf
+        return in_tail
+
+    def add(self, values):
+        valid = ~np.isnan(values)
+        self.Count += valid
+        self.Sum += np.where(valid, values, 0.0)
+        self._insert(self.Low, values)
+        self._insert(self.High, -values)
+
+    def remove(self, values):
+        """
+        removes the values of a kernel, returns the masks of the pixels whose
+        Low and High tails must be refilled
+        """
+        valid = ~np.isnan(values)
+        self.Count -= valid
+        self.Sum -= np.where(valid, values, 0.0)
+        # a full tail that lost a value misses a value that is only known to the kernels
+        full = self.Count >= self.Capacity
+        return self._remove(self.Low, values) & full, self._remove(self.High, -values) & full
+
+    @staticmethod
+    def fill(tail, values, index):
+        """sets a tail at index (tuple of pixel indices) to the smallest of all values (n_kernels, pixels) there"""
+        smallest = np.sort(np.where(np.isnan(values), np.inf, values), axis=0)[: tail.shape[0]]
+        tail[(slice(None),) + index] = np.inf
+        tail[(slice(None, smallest.shape[0]),) + index] = smallest
+
+
+class MKAAccumulator:
+    """
+    incremental multi-kernel average: kernels are added to and removed from per-pixel
+    statistics, so that the MKA map of a different selection of kernels does not
+    need all kernels to be stacked and averaged again.
+
+    per pixel and offset component the number of non-nan values (Count), their sum (Sum) and
+    only the tails of the distribution that the 2.5/97.5% trim needs are kept: the
+    tail_capacity smallest and largest values. adding or removing a kernel updates these in
+    place with one value per pixel, so the cost does not grow with the number of kernels.
+    only when a removed value leaves a full tail short, that tail is refilled from the values
+    of the remaining kernels at those pixels (about the trimmed fraction of the pixels).
+    the MKA map of window_size 1 follows from the sum minus the trimmed values. larger
+    windows need all values of a window and run fast_MKA on the stack of the added kernels.
+
+    Attr
+    ----------
+    Kernels : list
+        added SingleKernel objects, in order of adding
+    Checksums : list
+        hashes of the offsets of the added kernels, a kernel can only be removed as long as its
+        offsets did not change since it was added
+    Stats_R : _TailStats
+        count, sum and tails of the range offsets per pixel
+    Stats_A : _TailStats
+        count, sum and tails of the azimuth offsets per pixel
+    Memory_budget : int
+        maximum number of bytes used per spatial tile when reading the MKA map (None for no limit)
+    """
+
+    def __init__(self, memory_budget=None):
+        self.Kernels = []
+        self.Checksums = []
+        self.Stats_R = None
+        self.Stats_A = None
+        self.Memory_budget = memory_budget
+
+    @staticmethod
+    def checksum(obj):
+        """hash of the range and azimuth offsets of a kernel"""
+        h = hashlib.sha1()
+        for data in [obj.R_off, obj.A_off]:
+            h.update(np.ascontiguousarray(data).tobytes())
+        return h.hexdigest()
+
+    def _find(self, obj):
+        for i, kernel in enumerate(self.Kernels):
+            if kernel is obj:
+                return i
+        return None
+
+    def _components(self):
+        return [(self.Stats_R, "R_off"), (self.Stats_A, "A_off")]
+
+    def _rebuild(self, capacity):
+        """sets the tails of all pixels from the added kernels, in row tiles within the memory budget"""
+        for stats, attr in self._components():
+            shape = stats.Count.shape
+            stats.Low = np.full((capacity,) + shape, np.inf, dtype=stats.Low.dtype)
+            stats.High = np.full((capacity,) + shape, np.inf, dtype=stats.High.dtype)
+            row_bytes = 2 * len(self.Kernels) * shape[1] * np.dtype(np.float64).itemsize
+            for start, stop, _, _ in get_tiles(shape[0], 0, row_bytes, self.Memory_budget):
+                values = np.stack([np.asarray(getattr(obj, attr))[start:stop] for obj in self.Kernels], axis=0)
+                stats.fill(stats.Low, values, (slice(start, stop),))
+                stats.fill(stats.High, -values, (slice(start, stop),))
+
+    def _refill(self, tail, attr, refill, sign):
+        """sets a tail at the pixels of the refill mask from the values (times sign) of the added kernels"""
+        flat = np.flatnonzero(refill)
+        if flat.size == 0:
+            return
+        rows, cols = np.unravel_index(flat, refill.shape)
+        values = []
+        for obj in self.Kernels:
+            data = np.asarray(getattr(obj, attr))
+            # take on the flat index is faster than indexing rows and columns
+            values.append(data.take(flat) if data.flags.c_contiguous else data[rows, cols])
+        _TailStats.fill(tail, sign * np.stack(values, axis=0), (rows, cols))
+
+    def add(self, obj):
+        """
+        adds the range and azimuth offsets of a kernel to the per-pixel statistics
+
+        Args:
+            obj (SingleKernel): kernel to add, with the grid of the kernels already added
+        """
+        if self._find(obj) is not None:
+            raise ValueError(f"kernel {obj.Name} is already added")
+        R_off = np.asarray(obj.R_off)
+        A_off = np.asarray(obj.A_off)
+        if self.Stats_R is None:
+            self.Stats_R = _TailStats(R_off.shape, R_off.dtype, tail_capacity(1))
+            self.Stats_A = _TailStats(A_off.shape, A_off.dtype, tail_capacity(1))
+        elif R_off.shape != self.Stats_R.Count.shape:
+            raise ValueError(f"kernel {obj.Name} has shape {R_off.shape}, not {self.Stats_R.Count.shape}")
+        # same dtype as the added kernels, so values are found again when removed
+        R_off = R_off.astype(self.Stats_R.Low.dtype, copy=False)
+        A_off = A_off.astype(self.Stats_A.Low.dtype, copy=False)
+        self.Stats_R.add(R_off)
+        self.Stats_A.add(A_off)
+        self.Kernels.append(obj)
+        self.Checksums.append(self.checksum(obj))
+        capacity = tail_capacity(len(self.Kernels))
+        if capacity > self.Stats_R.Capacity:
+            # the trim of more kernels needs longer tails (once every 40 kernels)
+            self._rebuild(capacity)
+
+    def remove(self, obj):
+        """
+        removes the range and azimuth offsets of an added kernel from the per-pixel statistics
+
+        Args:
+            obj (SingleKernel): kernel to remove
+        """
+        i = self._find(obj)
+        if i is None:
+            raise ValueError(f"kernel {obj.Name} is not added")
+        if self.checksum(obj) != self.Checksums[i]:
+            raise ValueError(f"offsets of kernel {obj.Name} changed since it was added, create a new MKAAccumulator")
+        del self.Kernels[i]
+        del self.Checksums[i]
+        for stats, attr in self._components():
+            values = np.asarray(getattr(obj, attr)).astype(stats.Low.dtype, copy=False)
+            refill_low, refill_high = stats.remove(values)
+            self._refill(stats.Low, attr, refill_low, 1)
+            self._refill(stats.High, attr, refill_high, -1)
+
+    def set_kernels(self, kernels):
+        """
+        adds and removes kernels so that exactly the given kernels are added,
+        kernels that are already added are not touched
+
+        Args:
+            kernels (list of SingleKernel): kernels of the MKA map
+        """
+        for obj in list(self.Kernels):
+            if not any(obj is kernel for kernel in kernels):
+                self.remove(obj)
+        for obj in kernels:
+            if self._find(obj) is None:
+                self.add(obj)
+
+    @staticmethod
+    def _trimmed_mean(stats, rows, n_stack, comp_lim):
+        """
+        MKA of a single pixel window from the statistics of rows: completion limit, linear 2.5
+        and 97.5 percentiles (as np.nanpercentile) from the tails and the sum minus the values
+        outside them
+        """
+        count = stats.Count[rows]
+        count = np.where((n_stack - count) / n_stack <= comp_lim, count, 0)
+        low = stats.Low[:, rows].astype(np.float64)
+        # largest values descending
+        high = -stats.High[:, rows].astype(np.float64)
+        capacity = low.shape[0]
+        bounds = []
+        for q in TRIM_PERCENTILES:
+            virtual_index = (count - 1) * (q / 100.0)
+            prev_f = np.floor(virtual_index)
+            prev_idx = np.clip(prev_f, 0, None).astype(np.intp)
+            next_idx = np.minimum(prev_idx + 1, np.maximum(count - 1, 0))
+            if q < 50:
+                tail = low
+            else:
+                # sorted index i is the (count - 1 - i)-th largest value
+                tail = high
+                prev_idx = np.clip(count - 1 - prev_idx, 0, capacity - 1)
+                next_idx = np.clip(count - 1 - next_idx, 0, capacity - 1)
+            gamma = virtual_index - prev_f
+            a = np.take_along_axis(tail, prev_idx[np.newaxis], axis=0)[0]
+            b = np.take_along_axis(tail, next_idx[np.newaxis], axis=0)[0]
+            diff_b_a = b - a
+            bounds.append(np.where(gamma >= 0.5, b - diff_b_a * (1 - gamma), a + diff_b_a * gamma))
+        # the values outside the percentiles are all within the tails
+        k = np.arange(capacity).reshape((-1,) + (1,) * count.ndim)
+        below = (k < count) & (low < bounds[0])
+        above = (k < count) & (high > bounds[1])
+        n_inside = count - np.sum(below, axis=0) - np.sum(above, axis=0)
+        total = stats.Sum[rows] - np.sum(np.where(below, low, 0.0), axis=0) - np.sum(np.where(above, high, 0.0), axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where((count > 0) & (n_inside > 0), total / n_inside, np.nan)
+
+    def MKA(self, window_size=1, comp_lim=0.5):
+        """
+        multi-kernel average of the added kernels, as MultiKernel.Run_MKA of the same kernels
+        (up to the rounding of the sums for window_size 1)
+
+        Args:
+            window_size (int, optional): window dimension for MKA, odd numbers
+                                         prefered because of pixel centering.
+                                         Defaults to 1.
+            comp_lim (float, optional): completion limit between [0.0, 1.0]
+                                        Only take data for MKA if more than
+                                        comp_lim of the stack is not nan.
+                                        Defaults to 0.5.
+
+        Returns:
+            MKA_R_off: Multi-kernel Average map of range offsets
+            MKA_A_off: Multi-kernel Average map of azimuth offsets
+        """
+        if len(self.Kernels) == 0:
+            raise ValueError("no kernels added")
+        map_shape = self.Stats_R.Count.shape
+        MKA_R_off = np.full(map_shape, np.nan, dtype=self.Stats_R.Low.dtype)
+        MKA_A_off = np.full(map_shape, np.nan, dtype=self.Stats_A.Low.dtype)
+        if window_size == 1:
+            # float64 copies of the tails and the masks of the trimmed mean
+            row_bytes = 2 * (2 * self.Stats_R.Capacity + 2) * map_shape[1] * np.dtype(np.float64).itemsize * 2
+        else:
+            # fast_MKA works on float64 copies of the stack
+            row_bytes = 2 * (len(self.Kernels) + 1) * map_shape[1] * np.dtype(np.float64).itemsize
+        for read_start, read_stop, write_start, write_stop in get_tiles(map_shape[0], window_size // 2, row_bytes, self.Memory_budget):
+            if window_size == 1:
+                rows = slice(read_start, read_stop)
+                MKA_R = self._trimmed_mean(self.Stats_R, rows, len(self.Kernels), comp_lim)
+                MKA_A = self._trimmed_mean(self.Stats_A, rows, len(self.Kernels), comp_lim)
+            else:
+                # a window needs all values, not only the tails of every pixel
+                stack_R = np.stack([np.asarray(obj.R_off)[read_start:read_stop] for obj in self.Kernels], axis=0)
+                stack_A = np.stack([np.asarray(obj.A_off)[read_start:read_stop] for obj in self.Kernels], axis=0)
+                MKA_R, MKA_A = fast_MKA(stack_R, stack_A, window_size, comp_lim)
+            MKA_R_off[write_start:write_stop] = MKA_R[write_start - read_start:write_stop - read_start]
+            MKA_A_off[write_start:write_stop] = MKA_A[write_start - read_start:write_stop - read_start]
+        return MKA_R_off, MKA_A_off
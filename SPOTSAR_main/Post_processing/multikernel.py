@@ -1,5 +1,7 @@
 import pandas as pd
 import numpy as np
+import os
+import h5py
 from inpoly import inpoly2
 from shapely.geometry import Polygon
 from shapely.geometry.point import Point
@@ -13,12 +15,24 @@ from shapely.ops import transform
 
 
 from .singlekernel import SingleKernel
+from .fast_MKA import fast_MKA
+from .get_tiles import get_tiles
+from .run_kernel_tasks import run_kernel_tasks
+from .result_cache import ResultCache
+from .stack_cache import VERSION as CACHE_VERSION, source_fingerprint, sources_changed, params_changed, write_stack_cache, read_stack_header, read_stack_cache
 from .geodetic2enu import geodetic2enu
 from .query_point import query_point
+from .query_index import QueryIndex, circle_coordinates
+from .window_plane_fit import window_plane_fit
+from .mka_accumulator import MKAAccumulator
+from .geometry import Geometry
+from .roi import roi_bounds, read_offsets, read_offset_ends, read_ccs
+from .ingest import STACK_GRIDS, read_offset_array, offsets_to_array, offset_ends, common_limits, scatter_stack
 
 class MultiKernel:
 
-    def __init__(self,file_dir,filenames,file_dir_ccs,filenames_ccs,lat_file,lon_file,heading,mean_inc,lines_ccs,width_ccs):
+    def __init__(self,file_dir,filenames,file_dir_ccs,filenames_ccs,lat_file,lon_file,heading,mean_inc,lines_ccs,width_ccs,store_dir=None,memory_budget=None,dtype=np.float32,
+                 roi=None,width=None,r_start=1,a_start=1,ingest='pandas'):
         """
         Object that contains multi kernel stack to prepare for multi-kernel averaging
 
@@ -33,21 +47,210 @@ class MultiKernel:
             mean_inc (float): mean incidence angle of satellite acquisitions 
             lines_ccs (int): number of lines in CCS data from CCS files
             width_ccs (int): width of CCS data in CCS files
+            store_dir (str, optional): directory for out-of-core storage. If given, CCS files
+                                       are memory mapped, every offset file is only parsed when
+                                       its kernel is assigned to the stack (assign_data_to_stack,
+                                       ingest_stack) and the grids of every SingleKernel are
+                                       stored as memory mapped .npy files in this directory.
+                                       Defaults to None, keep all data in memory.
+            memory_budget (int, optional): maximum number of bytes used per spatial tile by
+                                           Run_MKA and median filtering. Defaults to None,
+                                           process whole maps at once.
+            dtype (str/np.dtype, optional): floating point type of the offset, CCP and CCS maps
+                                            and everything derived from them. latitude and longitude
+                                            are always float64. Defaults to np.float32 (the precision
+                                            of the source data).
+            roi (dict, optional): region of interest, {'rng': [min, max], 'azi': [min, max]} in radar
+                                  pixels of the offset files, {'lon': lon_lims, 'lat': lat_lims} or
+                                  {'polygon': [(lon, lat), ...]}. only the offsets within the pixel
+                                  bounds of the region are parsed and only the lines of the CCS files
+                                  within them are read (in crop_stack_ccs). Defaults to None, whole frame.
+            width (int, optional): width of the lat/lon files, needed for lon/lat regions of interest.
+                                   Defaults to None.
+            r_start (int, optional): first range pixel of the offset data, for lon/lat regions of
+                                     interest. Defaults to 1.
+            a_start (int, optional): first azimuth pixel of the offset data, for lon/lat regions of
+                                     interest. Defaults to 1.
+            ingest (str, optional): 'pandas' (default) keeps the offsets of every file as DataFrame in
+                                    Data for add_lat_lon_to_data, crop_stack_ccs and assign_data_to_stack.
+                                    'numpy' only parses the used columns into structured arrays for
+                                    ingest_stack.
         """
+        self.File_dir = file_dir
+        self.File_dir_ccs = file_dir_ccs
         self.Filenames = filenames
         self.Filenames_ccs = filenames_ccs
         self.Lat_file = lat_file
         self.Lon_file = lon_file
         self.Heading = heading
         self.Mean_inc = mean_inc
+        self.Store_dir = store_dir
+        self.Memory_budget = memory_budget
+        # stored as name so the stack cache can keep it
+        self.Dtype = np.dtype(dtype).name
+        if ingest not in ['pandas','numpy']:
+            raise ValueError(f"ingest must be either 'pandas' or 'numpy', not {ingest}")
+        self.Ingest = ingest
+        self.Lines_ccs = lines_ccs
+        self.Width_ccs = width_ccs
+        # set by get_latlon_from_file
+        self.Geometry = None
 
         #intitialise Stack as empty list 
         self.Stack = []
 
-        self.Data = [pd.read_csv(file_dir + disp_file, header  =None, sep = '\s+') for disp_file in self.Filenames]
-        self.Data_ccs = [np.fromfile(file_dir_ccs+'/'+ccs_file, dtype='>f', count=-1) for ccs_file in self.Filenames_ccs]
-        self.Ccs_maps = [np.transpose(np.reshape(d,(lines_ccs,width_ccs))) for d in self.Data_ccs]
+        if roi is not None:
+            geometry = None if width is None else Geometry.open(lat_file,lon_file,width)
+            self.Roi_bounds = roi_bounds(roi,geometry,r_start,a_start)
+        else:
+            self.Roi_bounds = None
+        if self.Store_dir is None:
+            self.Data = [self.read_offset_file(i) for i in range(len(self.Filenames))]
+        else:
+            # out-of-core: the offsets of a kernel are parsed when it is assigned to the stack
+            self.Data = [None for _ in self.Filenames]
+        if roi is not None:
+            # CCS windows are read once the common grid is known
+            self.Data_ccs = None
+            self.Ccs_maps = None
+            return
+
+        if self.Store_dir is None:
+            # big-endian on disk, converted to native byte order once
+            self.Data_ccs = [np.fromfile(file_dir_ccs+'/'+ccs_file, dtype='>f', count=-1).astype(self.Dtype) for ccs_file in self.Filenames_ccs]
+            self.Ccs_maps = [np.transpose(np.reshape(d,(lines_ccs,width_ccs))) for d in self.Data_ccs]
+        else:
+            # read-only memory maps, pages are only read when the data is accessed
+            self.Data_ccs = [np.memmap(file_dir_ccs+'/'+ccs_file, dtype='>f', mode='r', shape=(lines_ccs,width_ccs)) for ccs_file in self.Filenames_ccs]
+            self.Ccs_maps = [np.transpose(d) for d in self.Data_ccs]
+
+
+    def read_offset_file(self,i):
+        """
+            parses the offset file of kernel i (within the region of interest), as DataFrame
+            (ingest='pandas') or structured array (ingest='numpy')
+        """
+        path = self.File_dir + self.Filenames[i]
+        if self.Ingest == 'numpy':
+            return read_offset_array(path, self.Roi_bounds, self.Dtype)
+        if self.Roi_bounds is not None:
+            return read_offsets(path, self.Roi_bounds)
+        return pd.read_csv(path, header  =None, sep = '\s+')
+
+    def get_source_files(self):
+        """
+            returns the paths of all files the stack is read from (offsets, ccs, lat, lon)
+        """
+        return self._source_files(self.File_dir,self.Filenames,self.File_dir_ccs,self.Filenames_ccs,self.Lat_file,self.Lon_file)
+
+    @staticmethod
+    def _source_files(file_dir,filenames,file_dir_ccs,filenames_ccs,lat_file,lon_file):
+        """paths of the offset, ccs, lat and lon files of a stack (see MultiKernel for the arguments)"""
+        return ([file_dir + disp_file for disp_file in filenames]
+                + [file_dir_ccs + '/' + ccs_file for ccs_file in filenames_ccs]
+                + [lat_file, lon_file])
+
+    def to_cache(self,cache_file,hash_sources=False,params=None):
+        """
+        writes the parsed and cropped stack (all SingleKernel arrays and the metadata of the
+        stack and kernels) to a single binary cache file that can be loaded with from_cache.
+        the cache is keyed by the size and modification time (and optionally the hash) of
+        all source files and the parameters the stack was built with.
+
+        Args:
+            cache_file (str): path of the cache file
+            hash_sources (bool, optional): also store the sha1 hash of the source files, the cache
+                                           then stays valid when files are touched or copied.
+                                           Defaults to False.
+            params (dict, optional): parameters the stack was built with (see build_cache),
+                                     compared by from_cache. Defaults to None.
+        """
+        sources = source_fingerprint(self.get_source_files(),hash_sources)
+        # raw text data and full frame geometry are not needed once the stack is assigned
+        write_stack_cache(cache_file,self,sources,exclude=['Lat','Lon','Lat_vec','Lon_vec'],params=params)
+
+    @classmethod
+    def from_cache(cls,cache_file,params=None):
+        """
+        loads a stack written by to_cache. arrays are memory mapped copy-on-write,
+        so no data is copied until it is used or changed.
+
+        Args:
+            cache_file (str): path of the cache file
+            params (dict, optional): parameters the stack should be built with, a cache built
+                                     with other parameters is not loaded. Defaults to None, any.
+
+        Returns:
+            MultiKernel object, or None if the cache file does not exist, any of the source
+            files has changed since the cache was written or it was built with other parameters.
+        """
+        if not os.path.exists(cache_file):
+            return None
+        header, _ = read_stack_header(cache_file)
+        if header['version'] != CACHE_VERSION:
+            print(f'cache {cache_file} was written by another version (cache version {header["version"]})')
+            return None
+        changed = sources_changed(header['sources'])
+        if len(changed) > 0:
+            print(f'cache {cache_file} is outdated, changed source files: {changed}')
+            return None
+        if params is not None:
+            changed = params_changed(header['params'],params)
+            if len(changed) > 0:
+                print(f'cache {cache_file} was built with other parameters: {changed}')
+                return None
+
+        header, stack_state, kernel_states = read_stack_cache(cache_file)
+        stack_obj = cls.__new__(cls)
+        stack_obj.__dict__.update(stack_state)
+        stack_obj.Stack = []
+        for kernel_state in kernel_states:
+            kernel = SingleKernel.__new__(SingleKernel)
+            kernel.__dict__.update(kernel_state)
+            stack_obj.Stack.append(kernel)
+        return stack_obj
 
+    @classmethod
+    def build_cache(cls,cache_file,file_dir,filenames,file_dir_ccs,filenames_ccs,lat_file,lon_file,heading,mean_inc,lines_ccs,width_ccs,
+                    width,r_start,a_start,r_step,a_step,hash_sources=False,roi=None,dtype=np.float32):
+        """
+        one-time conversion of GAMMA offset files into a stack cache. loads the stack from
+        cache_file if it is up to date and was built from the same files with the same parameters
+        (width, starts, steps, dtype, region of interest, ...), otherwise reads the files
+        (get_params_from_file_name, get_latlon_from_file, ingest_stack) and writes the cache.
+
+        Args:
+            cache_file (str): path of the cache file
+            file_dir ... width_ccs: see MultiKernel
+            width (int): width of the lat/lon files
+            r_start (int): first range pixel of the offset data
+            a_start (int): first azimuth pixel of the offset data
+            r_step (int): range step size in original radar coordinates
+            a_step (int): azimuth step size in original radar coordinates
+            hash_sources (bool, optional): see to_cache. Defaults to False.
+            roi (dict, optional): region of interest, see MultiKernel. Defaults to None, whole frame.
+            dtype (np.dtype, optional): data type of the kernel arrays, see MultiKernel.
+                                        Defaults to np.float32.
+
+        Returns:
+            MultiKernel object with assigned Stack
+        """
+        bounds = None if roi is None else roi_bounds(roi,Geometry.open(lat_file,lon_file,width),r_start,a_start)
+        params = {'heading':heading,'mean_inc':mean_inc,'lines_ccs':lines_ccs,'width_ccs':width_ccs,'width':width,
+                  'r_start':r_start,'a_start':a_start,'r_step':r_step,'a_step':a_step,
+                  'dtype':np.dtype(dtype).name,'roi_bounds':bounds,
+                  # the requested files, sources_changed only checks the files stored in the cache
+                  'sources':[os.path.abspath(path) for path in cls._source_files(file_dir,filenames,file_dir_ccs,filenames_ccs,lat_file,lon_file)]}
+        stack_obj = cls.from_cache(cache_file,params)
+        if stack_obj is not None:
+            return stack_obj
+        stack_obj = cls(file_dir,filenames,file_dir_ccs,filenames_ccs,lat_file,lon_file,heading,mean_inc,lines_ccs,width_ccs,
+                        dtype=dtype,roi=roi,width=width,r_start=r_start,a_start=a_start,ingest='numpy')
+        stack_obj.get_params_from_file_name()
+        stack_obj.get_latlon_from_file(width)
+        stack_obj.ingest_stack(r_start,a_start,r_step,a_step)
+        stack_obj.to_cache(cache_file,hash_sources,params)
+        return stack_obj
 
     def get_params_from_file_name(self):
         """
@@ -67,15 +270,33 @@ class MultiKernel:
             self.R_win.append(int(strings[3]))
             self.A_win.append(int(strings[4][0:-4]))
         
-    def get_latlon_from_file(self,width):
+    def get_latlon_from_file(self,width,method='memmap'):
         """
             extracts latitude and longitude of data from .lat and .lon file
             result is stored in np array with size width,n_lines
             n_lines is calculated from width and size of the data.
+
+        Args:
+            width (int): width of the lat/lon files
+            method (str, optional): 'memmap' (default) opens the files as read-only memory maps
+                                    in a Geometry shared by all stacks of the frame, coordinates
+                                    are only read for the pixels that are used. 'load' reads
+                                    both files into Lat/Lon (and Lat_vec/Lon_vec).
+
+        Returns:
+            LAT, LON: latitude and longitude maps ('load'), or the Geometry ('memmap')
         """
-        # get latitude and longitude data from file
-        lon_vec = np.fromfile(self.Lon_file, dtype='>f', count=-1)
-        lat_vec = np.fromfile(self.Lat_file, dtype='>f', count=-1)
+        if method == 'memmap':
+            self.Geometry = Geometry.open(self.Lat_file,self.Lon_file,width)
+            return self.Geometry
+        elif method != 'load':
+            raise ValueError(f"method must be either 'memmap' or 'load', not {method}")
+        self.Geometry = None
+
+        # get latitude and longitude data from file (big-endian float32), 
+        # converted once to native float64 for the geodesy
+        lon_vec = np.fromfile(self.Lon_file, dtype='>f', count=-1).astype(np.float64)
+        lat_vec = np.fromfile(self.Lat_file, dtype='>f', count=-1).astype(np.float64)
         # set 0,0 coordinates to nan
         lon_vec[lon_vec == 0] = np.nan
         lat_vec[lat_vec == 0] = np.nan
@@ -95,9 +316,27 @@ class MultiKernel:
     
 
     def add_lat_lon_to_data(self,r_start,a_start):
+        """
+            adds latitude (column 9) and longitude (column 10) of every offset to the data
+
+        Args:
+            r_start (int): first range pixel of the offset data
+            a_start (int): first azimuth pixel of the offset data
+        """
+        self.R_start = r_start
+        self.A_start = a_start
         for file in self.Data:
-            file[9]  = self.Lat[file[1]+a_start-1,file[0]+r_start-1]
-            file[10] = self.Lon[file[1]+a_start-1,file[0]+r_start-1]
+            # out-of-core files are not parsed yet, see assign_data_to_stack
+            if file is not None:
+                self._add_lat_lon(file)
+
+    def _add_lat_lon(self,file):
+        if self.Geometry is not None:
+            # gather from the memory maps, only the pages of the offset positions are read
+            file[9], file[10] = self.Geometry.gather(file[1].to_numpy()+self.A_start-1,file[0].to_numpy()+self.R_start-1)
+            return
+        file[9]  = self.Lat[file[1]+self.A_start-1,file[0]+self.R_start-1]
+        file[10] = self.Lon[file[1]+self.A_start-1,file[0]+self.R_start-1]
     
     
     def crop_stack_ccs(self,r_step,a_step):
@@ -114,11 +353,16 @@ class MultiKernel:
         end_azi   = []
 
         # collect starting and ending measurement
-        for d in self.Data:
-            start_rng.append(d.iloc[0,0])
-            end_rng.append(d.iloc[-1,0])
-            start_azi.append(d.iloc[0,1])
-            end_azi.append(d.iloc[-1,1])
+        for disp_file, d in zip(self.Filenames, self.Data):
+            if d is None:
+                # out-of-core: only the first and last lines of the file are read
+                ends = read_offset_ends(self.File_dir + disp_file, self.Roi_bounds)
+            else:
+                ends = (d.iloc[0,0], d.iloc[-1,0], d.iloc[0,1], d.iloc[-1,1])
+            start_rng.append(ends[0])
+            end_rng.append(ends[1])
+            start_azi.append(ends[2])
+            end_azi.append(ends[3])
 
         # get inner limits
         rng_min = np.max(start_rng)
@@ -128,30 +372,52 @@ class MultiKernel:
         self.Limits = (rng_min,rng_max,azi_min,azi_max)
 
         # crop_ccs maps
-        common_mask_data_ccs = []
-        for d_ccs in zip(self.Ccs_maps):
-            d_crop_0 = d_ccs[0][int((rng_min/r_step)):int((rng_max/r_step+1)),int((azi_min/a_step)):int((azi_max/a_step)+1)]
-            common_mask_data_ccs.append(d_crop_0)
-
-        # make new list of data that has common bounds 
-        common_mask_data = []
-        for d in self.Data:
-            d_crop = d.loc[(d[0] >= rng_min) & (d[1] >= azi_min) & (d[0] <= rng_max) & (d[1] <= azi_max)].reset_index(drop=True)
-            common_mask_data.append(d_crop)
+        common_mask_data_ccs = self._crop_ccs(r_step,a_step)
+
+        # make new list of data that has common bounds (out-of-core files are cropped in assign_data_to_stack)
+        common_mask_data = [None if d is None else self._crop_data(d,ccs_file,r_step,a_step) for d,ccs_file in zip(self.Data,self.Ccs_maps)]
         
         # assign data lists to Stack object
         self.Mask_data_ccs = common_mask_data_ccs
         self.Mask_data = common_mask_data
-
-        for file,ccs_file in zip(self.Mask_data,self.Ccs_maps):
-            file[11] = (file[0]-file[0][0])/r_step
-            file[12] = (file[1]-file[1][0])/a_step
-            file[11] = file[11].astype('int64')
-            file[12] = file[12].astype('int64')
-            file[13] = ccs_file[file[11],file[12]]
         
         return self.Mask_data, self.Mask_data_ccs, self.Limits
 
+    def _crop_data(self,d,ccs_file,r_step,a_step):
+        """
+            crops the offsets of a kernel to the common grid (Limits),
+            appends column and row index (columns 11, 12) and ccs (column 13)
+        """
+        rng_min,rng_max,azi_min,azi_max = self.Limits
+        file = d.loc[(d[0] >= rng_min) & (d[1] >= azi_min) & (d[0] <= rng_max) & (d[1] <= azi_max)].reset_index(drop=True)
+        file[11] = (file[0]-file[0][0])/r_step
+        file[12] = (file[1]-file[1][0])/a_step
+        file[11] = file[11].astype('int64')
+        file[12] = file[12].astype('int64')
+        file[13] = ccs_file[file[11],file[12]]
+        return file
+
+    def _crop_ccs(self,r_step,a_step):
+        """
+            crops the CCS maps to the common grid (Limits), in a region of interest
+            only the window of the common grid is read from the CCS files
+        """
+        rng_min,rng_max,azi_min,azi_max = self.Limits
+        common_mask_data_ccs = []
+        if self.Roi_bounds is not None:
+            # only read the window of the common grid from the CCS files
+            rng_index = slice(int((rng_min/r_step)),int((rng_max/r_step+1)))
+            azi_index = slice(int((azi_min/a_step)),int((azi_max/a_step)+1))
+            for ccs_file in self.Filenames_ccs:
+                common_mask_data_ccs.append(read_ccs(self.File_dir_ccs+'/'+ccs_file,self.Lines_ccs,self.Width_ccs,rng_index,azi_index,
+                                                     self.Dtype,memmap=self.Store_dir is not None))
+            self.Ccs_maps = common_mask_data_ccs
+        else:
+            for d_ccs in zip(self.Ccs_maps):
+                d_crop_0 = d_ccs[0][int((rng_min/r_step)):int((rng_max/r_step+1)),int((azi_min/a_step)):int((azi_max/a_step)+1)]
+                common_mask_data_ccs.append(d_crop_0)
+        return common_mask_data_ccs
+
     def assign_data_to_stack(self,r_step,a_step):
         """
         collects data from files and filenames and loads them as 
@@ -165,6 +431,9 @@ class MultiKernel:
             self.Stack: list of SingleKernel objects that are cropped 
                         to the shared data extend and have nans removed. 
         """
+        # grid step sizes are needed to compute the window overlap in the outlier detection methods
+        self.R_step = r_step
+        self.A_step = a_step
         # define grid of range and azimuth pixel where offset is measured (+1 to go from number of intervals to number of observations)
         rng = np.linspace(self.Limits[0],self.Limits[1],int((self.Limits[1]-self.Limits[0])/r_step)+1)
         azi = np.linspace(self.Limits[2],self.Limits[3],int((self.Limits[3]-self.Limits[2])/a_step)+1)
@@ -172,16 +441,21 @@ class MultiKernel:
 
 
         # find number of range estimates
-        for d, file, date_1, date_2, r__win, a__win, ccs_map in zip(self.Mask_data, self.Filenames, self.Date1, self.Date2, self.R_win, self.A_win,self.Mask_data_ccs):
-            # initiate arrays
-            r_off   = np.full(np.shape(RNG)[::-1], np.nan)
-            a_off   = np.full(np.shape(RNG)[::-1], np.nan)    
-            ccp_off = np.full(np.shape(RNG)[::-1], np.nan)
+        dtype = self.Dtype
+        for i, (d, file, date_1, date_2, r__win, a__win, ccs_map) in enumerate(zip(self.Mask_data, self.Filenames, self.Date1, self.Date2, self.R_win, self.A_win,self.Mask_data_ccs)):
+            if d is None:
+                # out-of-core: parse the file of this kernel only now, it is released once stored
+                d = self.read_offset_file(i)
+                self._add_lat_lon(d)
+                d = self._crop_data(d,self.Ccs_maps[i],r_step,a_step)
+            # initiate arrays (lat/lon in float64, everything else in the dtype of the stack)
+            r_off   = np.full(np.shape(RNG)[::-1], np.nan, dtype=dtype)
+            a_off   = np.full(np.shape(RNG)[::-1], np.nan, dtype=dtype)    
+            ccp_off = np.full(np.shape(RNG)[::-1], np.nan, dtype=dtype)
             lat_off = np.full(np.shape(RNG)[::-1], np.nan)
             lon_off = np.full(np.shape(RNG)[::-1], np.nan)
-            r_idx   = np.full(np.shape(RNG)[::-1], np.nan)
-            a_idx   = np.full(np.shape(RNG)[::-1], np.nan)
-            ccs_off = np.full(np.shape(RNG)[::-1], np.nan)
+            r_idx   = np.full(np.shape(RNG)[::-1], np.nan, dtype=dtype)
+            a_idx   = np.full(np.shape(RNG)[::-1], np.nan, dtype=dtype)
             # fill arrays form indexes 
             r_off[d[11],d[12]] = d[7]
             a_off[d[11],d[12]] = d[8]
@@ -191,52 +465,152 @@ class MultiKernel:
             r_idx[d[11],d[12]] = d[0]
             a_idx[d[11],d[12]] = d[1]
             # ccs_off[d[11],d[12]] = d[13]
-            ccs_off = ccs_map
+            if self.Store_dir is None:
+                ccs_off = ccs_map
+            else:
+                # copy from read-only (big-endian) memory map, SingleKernel sets ccs == 0 to nan
+                ccs_off = np.array(ccs_map, dtype=dtype)
 
             # make object
-            offset_data = SingleKernel(file,[date_1,date_2],[r__win,a__win],self.Heading,[r_idx,a_idx,r_off,a_off,ccp_off,lat_off,lon_off,ccs_off])
-            # do pre-stacking processing
-            offset_data.calc_SNR()
-            offset_data.calc_Mag()
-            offset_data.calc_phase()
-            offset_data.rotate_with_heading()
+            offset_data = SingleKernel(file,[date_1,date_2],[r__win,a__win],self.Heading,[r_idx,a_idx,r_off,a_off,ccp_off,lat_off,lon_off,ccs_off],dtype=dtype)
+            # do pre-stacking processing (SNR, Mag, Phase, X_off and Y_off are computed when first used)
             offset_data.mask_nan_data()
             offset_data.rem_nans()
-            
+
+            if self.Store_dir is not None:
+                # move kernel to disk and release the parsed text data of this kernel
+                offset_data.to_memmap(os.path.join(self.Store_dir,os.path.splitext(file)[0]))
+                self.Mask_data[i] = None
+                self.Data[i] = None
+            del d
+
             self.Stack.append(offset_data)
 
         return self.Stack
     
-    def Run_MKA(self,indeces=[],window_size=1,comp_lim=0.5):
-        # """
-        # Run Multi-kernel averaging where user can define seleced indices from the stack, 
-        # desired window size, and a completion factor as a high pass filter
-
-        # Args:
-        #     indices (list, optional): indices of slices from datastack used for MKA. Defaults to [], use all data.
-        #     window_size (int, optional): window dimension for MKA, odd numbers 
-        #                                  prefered because of pixel centering. 
-        #                                  Defaults to 1.
-        #     comp_lim (float, optional): completion limit between [0.0, 1.0]
-        #                                 Only take data for MKA if more than 
-        #                                 comp_lim of the stack is not nan. 
-        #                                 Defaults to 0.5.
-
-        # Returns:
-        #     avg_map: Multi-kernel Average map
-        # """
+    def ingest_stack(self,r_start,a_start,r_step,a_step):
+        """
+        numpy ingest of the offsets into the Stack, the same as add_lat_lon_to_data, crop_stack_ccs
+        and assign_data_to_stack without DataFrame copies per kernel: the common grid limits of all
+        kernels are computed at once and the offsets, coordinates and indices of every kernel are
+        scattered into preallocated (kernel, range, azimuth) cubes. the maps of every SingleKernel
+        are views of the cubes. works on the structured arrays of ingest='numpy' as well as on DataFrames.
+        out-of-core (store_dir), the common grid is found from the first and last lines of the files
+        and every file is parsed, scattered and stored one at a time.
+
+        Args:
+            r_start (int): first range pixel of the offset data
+            a_start (int): first azimuth pixel of the offset data
+            r_step (int): range step size in original radar coordinates
+            a_step (int): azimuth step size in original radar coordinates
+
+        Returns:
+            self.Stack: list of SingleKernel objects that are cropped
+                        to the shared data extend and have nans removed.
+        """
+        dtype = self.Dtype
+        self.R_start = r_start
+        self.A_start = a_start
+        self.R_step = r_step
+        self.A_step = a_step
+        if self.Store_dir is None:
+            offsets = [d if isinstance(d,np.ndarray) else offsets_to_array(d,dtype) for d in self.Data]
+            self.Limits = common_limits([offset_ends(o) for o in offsets])
+        else:
+            self.Limits = common_limits([read_offset_ends(self.File_dir + file, self.Roi_bounds) for file in self.Filenames])
+        self.Mask_data_ccs = self._crop_ccs(r_step,a_step)
+
+        if self.Geometry is not None:
+            coordinates = lambda rng, azi: self.Geometry.gather(azi+a_start-1,rng+r_start-1)
+        else:
+            coordinates = lambda rng, azi: (self.Lat[azi+a_start-1,rng+r_start-1],self.Lon[azi+a_start-1,rng+r_start-1])
+        if self.Store_dir is None:
+            cubes = scatter_stack(offsets,self.Limits,r_step,a_step,coordinates,dtype)
+            del offsets
+
+        for i, (file, date_1, date_2, r__win, a__win, ccs_map) in enumerate(zip(self.Filenames, self.Date1, self.Date2, self.R_win, self.A_win, self.Mask_data_ccs)):
+            if self.Store_dir is None:
+                ccs_off = ccs_map
+                data = [cubes[name][i] for name in STACK_GRIDS] + [ccs_off]
+            else:
+                # out-of-core: parse and scatter the file of this kernel only now
+                offsets = self.read_offset_file(i)
+                if not isinstance(offsets,np.ndarray):
+                    offsets = offsets_to_array(offsets,dtype)
+                kernel_cubes = scatter_stack([offsets],self.Limits,r_step,a_step,coordinates,dtype)
+                del offsets
+                # copy from read-only (big-endian) memory map, SingleKernel sets ccs == 0 to nan
+                ccs_off = np.array(ccs_map, dtype=dtype)
+                data = [kernel_cubes[name][0] for name in STACK_GRIDS] + [ccs_off]
+                del kernel_cubes
+            offset_data = SingleKernel(file,[date_1,date_2],[r__win,a__win],self.Heading,data,dtype=dtype)
+            del data
+            offset_data.mask_nan_data()
+            offset_data.rem_nans()
+
+            if self.Store_dir is not None:
+                # move kernel to disk and release its grids
+                offset_data.to_memmap(os.path.join(self.Store_dir,os.path.splitext(file)[0]))
+                self.Data[i] = None
+
+            self.Stack.append(offset_data)
+
+        return self.Stack
+
+    def Run_MKA(self,indeces=[],window_size=1,comp_lim=0.5,method='numba'):
+        """
+        Run Multi-kernel averaging where user can define seleced indices from the stack, 
+        desired window size, and a completion factor as a high pass filter
+
+        Args:
+            indices (list, optional): indices of slices from datastack used for MKA. Defaults to [], use all data.
+            window_size (int, optional): window dimension for MKA, odd numbers 
+                                         prefered because of pixel centering. 
+                                         Defaults to 1.
+            comp_lim (float, optional): completion limit between [0.0, 1.0]
+                                        Only take data for MKA if more than 
+                                        comp_lim of the stack is not nan. 
+                                        Defaults to 0.5.
+            method (str, optional): 'numba' (default) for the compiled engine that
+                                    processes R and A in one pass, 'incremental' to only
+                                    add and remove the kernels that differ from the previous
+                                    call in the MKA accumulator (see get_MKA_accumulator),
+                                    'loop' for the original per-window python loop.
+
+        Returns:
+            MKA_R_off: Multi-kernel Average map of range offsets
+            MKA_A_off: Multi-kernel Average map of azimuth offsets
+        """
         # get stack data
         if indeces==[]:
-            stack_R = [obj.R_off for obj in self.Stack]
-            stack_A = [obj.A_off for obj in self.Stack]
-            stack_ccp = [obj.Ccp_off for obj in self.Stack]
-            stack_ccs = [obj.Ccs_off for obj in self.Stack]
+            substack = self.Stack
         else:
             substack = [self.Stack[i] for i in indeces]
-            stack_R = np.stack([obj.R_off for obj in substack],axis=0)
-            stack_A = np.stack([obj.A_off for obj in substack],axis=0)
-            stack_ccp = np.stack([obj.Ccp_off for obj in substack],axis=0)
-            stack_ccs = np.stack([obj.Ccs_off for obj in substack],axis=0)
+
+        if method == 'numba':
+            # process row tiles with a halo of half the window size to stay within the memory budget
+            map_shape = np.shape(substack[0].R_off)
+            self.MKA_R_off = np.full(map_shape, np.nan, dtype=substack[0].R_off.dtype)
+            self.MKA_A_off = np.full(map_shape, np.nan, dtype=substack[0].A_off.dtype)
+            # fast_MKA works on float64 copies of the tiles
+            row_bytes = 2 * (len(substack) + 1) * map_shape[1] * np.dtype(np.float64).itemsize
+            for read_start, read_stop, write_start, write_stop in get_tiles(map_shape[0],window_size//2,row_bytes,getattr(self,'Memory_budget',None)):
+                stack_R = np.stack([obj.R_off[read_start:read_stop] for obj in substack],axis=0)
+                stack_A = np.stack([obj.A_off[read_start:read_stop] for obj in substack],axis=0)
+                MKA_R, MKA_A = fast_MKA(stack_R,stack_A,window_size,comp_lim)
+                self.MKA_R_off[write_start:write_stop] = MKA_R[write_start-read_start:write_stop-read_start]
+                self.MKA_A_off[write_start:write_stop] = MKA_A[write_start-read_start:write_stop-read_start]
+            return self.MKA_R_off, self.MKA_A_off
+        elif method == 'incremental':
+            accumulator = self.get_MKA_accumulator()
+            accumulator.set_kernels(substack)
+            self.MKA_R_off, self.MKA_A_off = accumulator.MKA(window_size,comp_lim)
+            return self.MKA_R_off, self.MKA_A_off
+        elif method != 'loop':
+            raise ValueError(f"method must be either 'numba', 'incremental' or 'loop', not {method}")
+
+        stack_R = np.stack([obj.R_off for obj in substack],axis=0)
+        stack_A = np.stack([obj.A_off for obj in substack],axis=0)
 
         # create list of maps to make 
         avg_maps = []
@@ -254,7 +628,8 @@ class MultiKernel:
             nan_frac = nan_frac/np.shape(win_data)[2]
             nan_frac[nan_frac > comp_lim] = np.nan
             nan_frac[nan_frac <= comp_lim] = 1
-            win_data = np.multiply(win_data, nan_frac[..., np.newaxis])
+            # broadcast the per-pixel completion mask over the stack axis
+            win_data = np.multiply(win_data, nan_frac[:, :, np.newaxis])
 
             # define shape of multi-kernel averaged map (same as input data), filled with nan
             Avg_map = np.full(stack.shape[1:], np.nan)
@@ -283,55 +658,94 @@ class MultiKernel:
         return self.MKA_R_off, self.MKA_A_off
     
 
-    def Run_RSS(self,indeces=[],window_size=5,deramp=True):
-        # """
-        # Calculate residual sum of squares. user can specify window size and can turn off deramping if desired
-
-        # Args:
-        #     indices (list, optional): indices of slices from datastack used for MKA. Defaults to [], use all data.
-        #     window_size (int, optional): window dimension for MKA, odd numbers 
-        #                                  prefered because of pixel centering. 
-        #                                  Defaults to 5.
-        #     deramp (bool, optional): flag for deramping data in map coordinates 
-        #                              to allow for better estimates in gradual displacement 
-        #                              fields. deramping in map coordinates does not do local 
-        #                              transformation to ortholinear projection so there may 
-        #                              be inaccuracies. 
-        # Returns:
-        #     RSS_list: list of resisual sum of squares
-        # """
+    def get_MKA_accumulator(self):
+        """
+        returns the incremental multi-kernel average of the stack, created once and reused by
+        Run_MKA(method='incremental'). kernels can also be added and removed directly to explore
+        subsets of the stack, e.g. get_MKA_accumulator().add(self.Stack[i]) followed by .MKA().
+
+        Returns:
+            MKAAccumulator: per-pixel counts, sums and trim tails of the added kernels
+        """
+        if getattr(self,'MKA_accumulator',None) is None:
+            self.MKA_accumulator = MKAAccumulator(getattr(self,'Memory_budget',None))
+        return self.MKA_accumulator
+
+    def Run_RSS(self,indeces=[],window_size=5,deramp=True,method='vectorized'):
+        """
+        Calculate residual sum of squares. user can specify window size and can turn off deramping if desired.
+        per window, data outside the 95% confidence interval of range or azimuth offsets is removed, 
+        a plane in map coordinates is removed and the variance of the residual is stored at the window centre.
+
+        Args:
+            indices (list, optional): indices of slices from datastack used for MKA. Defaults to [], use all data.
+            window_size (int, optional): window dimension for MKA, odd numbers 
+                                         prefered because of pixel centering. 
+                                         Defaults to 5.
+            deramp (bool, optional): flag for deramping data in map coordinates 
+                                     to allow for better estimates in gradual displacement 
+                                     fields. deramping in map coordinates does not do local 
+                                     transformation to ortholinear projection so there may 
+                                     be inaccuracies. 
+            method (str, optional): 'vectorized' solves the plane fits of all windows at once from 
+                                    their moments (see window_plane_fit), 'loop' fits a LinearRegression 
+                                    per window. Defaults to 'vectorized'.
+        Returns:
+            RSS_list: list of resisual sum of squares (range, azimuth) per kernel, 
+                      the maps are stored in self.Rss_maps
+        """
+        if method not in ('vectorized','loop'):
+            raise ValueError(f"method should be 'vectorized' or 'loop', not {method}")
         # get stack data
         if indeces==[]:
-            stack_R = [obj.R_off for obj in self.Stack]
-            stack_A = [obj.A_off for obj in self.Stack]
-            stack_lon = [getattr(obj,'Lon_off') for obj in self.Stack]
-            stack_lat = [getattr(obj,'Lat_off') for obj in self.Stack]
-
+            substack = self.Stack
         else:
             substack = [self.Stack[i] for i in indeces]
-            stack_R = np.stack([obj.R_off for obj in substack],axis=0)
-            stack_A = np.stack([obj.A_off for obj in substack],axis=0)
-            stack_lons = np.stack([getattr(obj,'Lon_off') for obj in substack])
-            stack_lats = np.stack([getattr(obj,'Lat_off') for obj in substack])
+        stack_R = [obj.R_off for obj in substack]
+        stack_A = [obj.A_off for obj in substack]
+        stack_lons = [getattr(obj,'Lon_off') for obj in substack]
+        stack_lats = [getattr(obj,'Lat_off') for obj in substack]
 
-        # create list of rss values
+        # create list of rss values and maps
         rss_list = []
+        rss_maps = []
+        offset = window_size // 2
+
+        if method == 'vectorized':
+            # all kernels in one pass if they share the grid
+            if len(set(np.shape(r) for r in stack_R)) == 1:
+                groups = [(np.stack((stack_R,stack_A),axis=1),np.stack(stack_lons),np.stack(stack_lats))]
+            else:
+                groups = [(np.stack((r,a))[np.newaxis],lon[np.newaxis],lat[np.newaxis])
+                          for r,a,lon,lat in zip(stack_R,stack_A,stack_lons,stack_lats)]
+            for values,lons,lats in groups:
+                variance = window_plane_fit(values,lons,lats,window_size,trim=(2.5,97.5),deplane=deramp,
+                                            memory_budget=getattr(self,'Memory_budget',None))
+                for var_r,var_a in variance:
+                    Avg_map_r = np.full(values.shape[2:], np.nan)
+                    Avg_map_a = np.full(values.shape[2:], np.nan)
+                    Avg_map_r[offset:offset+var_r.shape[0],offset:offset+var_r.shape[1]] = var_r
+                    Avg_map_a[offset:offset+var_a.shape[0],offset:offset+var_a.shape[1]] = var_a
+                    rss_maps.append((Avg_map_r,Avg_map_a))
+                    rss_list.append((np.nansum(Avg_map_r),np.nansum(Avg_map_a)))
+            self.Rss_maps = rss_maps
+            self.Rss_list = rss_list
+            return self.Rss_list
 
         for stack_r,stack_a,stack_lon,stack_lat in zip(stack_R,stack_A,stack_lons,stack_lats):
             # set window size according to stack dimensions
-            window_shape = (stack_r.shape[0], window_size, window_size)
-            print(np.shape(window_shape))
+            window_shape = (window_size, window_size)
             # use np.lib.stride_tricks.sliding_window_view to devided data into windows
             # 1.2xfaster than sklearn view_as_windows
-            win_data_r = np.lib.stride_tricks.sliding_window_view(stack_r, window_shape)[0]
-            win_data_a = np.lib.stride_tricks.sliding_window_view(stack_a, window_shape)[0]
+            win_data_r = np.lib.stride_tricks.sliding_window_view(stack_r, window_shape)
+            win_data_a = np.lib.stride_tricks.sliding_window_view(stack_a, window_shape)
 
-            win_data_lon = np.lib.stride_tricks.sliding_window_view(stack_lon, window_shape)[0]
-            win_data_lat = np.lib.stride_tricks.sliding_window_view(stack_lat, window_shape)[0]
+            win_data_lon = np.lib.stride_tricks.sliding_window_view(stack_lon, window_shape)
+            win_data_lat = np.lib.stride_tricks.sliding_window_view(stack_lat, window_shape)
             
             # define shape of multi-kernel averaged map (same as input data), filled with nan
-            Avg_map_r = np.full(stack_r.shape[1:], np.nan)
-            Avg_map_a = np.full(stack_a.shape[1:], np.nan)
+            Avg_map_r = np.full(stack_r.shape, np.nan)
+            Avg_map_a = np.full(stack_a.shape, np.nan)
 
 
 
@@ -340,12 +754,12 @@ class MultiKernel:
                 if win_i % 50 == 0:
                     print('win_i', win_i)
                 for win_j in range(win_data_r.shape[1]):
-                    # extract relevant window
-                    win_r = win_data_r[win_i, win_j]
-                    win_a = win_data_a[win_i, win_j]
+                    # extract relevant window (copies, the window views are read-only)
+                    win_r = np.array(win_data_r[win_i, win_j], dtype=np.float64)
+                    win_a = np.array(win_data_a[win_i, win_j], dtype=np.float64)
                     
-                    lon_win = win_data_lon[win_i,win_j]
-                    lat_win = win_data_lat[win_i,win_j]
+                    lon_win = np.array(win_data_lon[win_i,win_j], dtype=np.float64)
+                    lat_win = np.array(win_data_lat[win_i,win_j], dtype=np.float64)
                     # calculate 95 % confidence interval
                     percentiles_r = np.nanpercentile(win_r, [2.5, 97.5])
                     percentiles_a = np.nanpercentile(win_a, [2.5, 97.5])
@@ -353,10 +767,14 @@ class MultiKernel:
                     mask_r = (win_r < percentiles_r[0]) | (win_r > percentiles_r[1])
                     mask_a = (win_a < percentiles_a[0]) | (win_a > percentiles_a[1])
                     mask = (mask_r | mask_a)
-                    win_r[mask] = np.nan
-                    win_a[mask] = np.nan
-                    lon_win[mask] = np.nan
-                    lat_win[mask] = np.nan
+                    # LinearRegression needs data without nan
+                    mask = mask | np.isnan(win_r) | np.isnan(win_a) | np.isnan(lon_win) | np.isnan(lat_win)
+                    if np.all(mask):
+                        continue
+                    win_r = win_r[~mask]
+                    win_a = win_a[~mask]
+                    lon_win = lon_win[~mask]
+                    lat_win = lat_win[~mask]
                     
                     #deramp
                     if deramp:
@@ -373,18 +791,44 @@ class MultiKernel:
                         deramped_a = win_a.flatten()
 
                     # calculate mean of window (offset by floor(window_size/2) because of border)
-                    offset = window_size // 2
                     Avg_map_r[win_i + offset, win_j + offset] = np.nanstd(deramped_r)**2
                     Avg_map_a[win_i + offset, win_j + offset] = np.nanstd(deramped_a)**2
                     
-                    rss = (np.sum(Avg_map_r),np.sum(Avg_map_a))
+            rss = (np.nansum(Avg_map_r),np.nansum(Avg_map_a))
+            rss_maps.append((Avg_map_r,Avg_map_a))
             rss_list.append(rss)
+        self.Rss_maps = rss_maps
         self.Rss_list = rss_list
 
         return self.Rss_list
     
 
-    def query_point_stack(self,data_attr_name,q_lats,q_lons,r,indeces=[]):
+    def get_query_index(self):
+        """
+        returns the spatial index over the pixel positions of the stack, reused by query_point_stack
+        and query_point_MKA until the kernels or their coordinates change (e.g. after ingesting or
+        cropping the stack again). all kernels share the same grid, pixels without coordinates in
+        one kernel are taken from the other kernels.
+
+        Returns:
+            QueryIndex: ball tree and ECEF coordinates of the grid
+        """
+        # coordinate maps the index was built from, compared by identity as in SingleKernel.neighbour_graph
+        geometry = [coords for obj in self.Stack for coords in (obj.Lat_off, obj.Lon_off)]
+        stored = getattr(self,'Query_geometry',[])
+        if (getattr(self,'Query_index',None) is None or len(stored) != len(geometry)
+                or any(a is not b for a, b in zip(geometry, stored))):
+            lats = np.array(self.Stack[0].Lat_off,dtype=np.float64)
+            lons = np.array(self.Stack[0].Lon_off,dtype=np.float64)
+            for obj in self.Stack[1:]:
+                missing = np.isnan(lats) | np.isnan(lons)
+                lats[missing] = obj.Lat_off[missing]
+                lons[missing] = obj.Lon_off[missing]
+            self.Query_index = QueryIndex(lats,lons)
+            self.Query_geometry = geometry
+        return self.Query_index
+
+    def query_point_stack(self,data_attr_name,q_lats,q_lons,r,indeces=[],method='tree'):
         """calculatess mean, median, standard deviation and 95% confidence interval 
         for attribute data within r radius of query points
 
@@ -394,6 +838,10 @@ class MultiKernel:
             q_lons (_type_): list of query point longitudes
             r (_type_): search radius in meters
             indeces (list, optional): list of stack indeces to process
+            method (str, optional): 'tree' queries all points at once using the spatial index of the
+                                    stack (get_query_index), 'polygon' uses query_point per kernel.
+                                    'tree' selects points by great circle distance, 'polygon' by a
+                                    128-gon approximation of the circle. Defaults to 'tree'.
         """
 
         ##
@@ -407,6 +855,9 @@ class MultiKernel:
         else:
             substack = [self.Stack[i] for i in indeces]
 
+        if method not in ['tree','polygon']:
+            raise ValueError(f"method should be 'tree' or 'polygon', not {method}")
+
         # pre-define stat-list for appending
         stats_list = []
 
@@ -417,16 +868,23 @@ class MultiKernel:
             lats = getattr(obj,'Lat_off_vec')
             data_attr = getattr(obj,data_attr_name)
 
-            q_mean, q_median, q_std, q_95, coordinate_circles = query_point(lats,
-                                                                            lons,
-                                                                            data_attr,
-                                                                            q_lats,
-                                                                            q_lons,
-                                                                            r)
+            if method == 'tree':
+                # put vector data back on the grid of the spatial index
+                if np.shape(data_attr) != np.shape(obj.Lat_off):
+                    data_attr = obj.vec_to_grid(data_attr)
+                q_mean, q_median, q_std, q_95, _ = self.get_query_index().stats(data_attr,q_lats,q_lons,r)
+                coordinate_circles = circle_coordinates(q_lats,q_lons,r)
+            else:
+                q_mean, q_median, q_std, q_95, coordinate_circles = query_point(lats,
+                                                                                lons,
+                                                                                data_attr,
+                                                                                q_lats,
+                                                                                q_lons,
+                                                                                r)
             stats_list.append([getattr(obj,'R_win'),getattr(obj,'A_win'),q_mean, q_median, q_std, q_95])
         return stats_list, coordinate_circles
 
-    def query_point_MKA(self,data_attr_name,q_lats,q_lons,r):
+    def query_point_MKA(self,data_attr_name,q_lats,q_lons,r,method='tree'):
         """calculatess mean, median, standard deviation and 95% confidence interval 
         for attribute data within r radius of query points
 
@@ -435,7 +893,7 @@ class MultiKernel:
             q_lats (_type_): list of query point latitudes
             q_lons (_type_): list of query point longitudes
             r (_type_): search radius in meters
-            indeces (list, optional): list of stack indeces to process
+            method (str, optional): 'tree' or 'polygon', see query_point_stack. Defaults to 'tree'.
         """
 
         ##
@@ -443,6 +901,12 @@ class MultiKernel:
         # local azimuthal projection (rect-linear with minimum local distortion)
         # then applies a buffer of desired radius in meters to that point 
         # and makes a n-gon polygonal apprixomation of a circle 
+        if method == 'tree':
+            q_mean, q_median, q_std, q_95, _ = self.get_query_index().stats(getattr(self,data_attr_name),q_lats,q_lons,r)
+            return [q_mean, q_median, q_std, q_95], circle_coordinates(q_lats,q_lons,r)
+        if method != 'polygon':
+            raise ValueError(f"method should be 'tree' or 'polygon', not {method}")
+
         nan_mask = np.isnan(self.MKA_R_off).flatten()
         p_slice = self.Stack[1]
         lons = getattr(p_slice,'Lon_off').flatten()
@@ -463,73 +927,330 @@ class MultiKernel:
         return [q_mean, q_median, q_std, q_95], coordinate_circles
 
     
-    def outlier_detection_HDBSCAN_stack(self,N_overlap,min_samples_fact,hard_lim,h5_file):
-        HDBSCAN_list = []
-        GLOSH_list = []
+    def get_result_cache(self,h5_file,max_bytes=None):
+        """
+        returns the result cache of the outlier detection methods for h5_file,
+        the same cache object (and hit/miss statistics) is reused for the same file
+
+        Args:
+            h5_file (str): hdf5 file of the cache
+            max_bytes (int, optional): maximum size of the cached results in bytes, least recently used
+                                       results are removed when exceeded. Defaults to None, no limit.
+
+        Returns:
+            ResultCache: cache object, see ResultCache.stats() for hit/miss statistics
+        """
+        cache = getattr(self,'Result_cache',None)
+        if cache is None or cache.H5_file != h5_file:
+            cache = ResultCache(h5_file,max_bytes)
+            self.Result_cache = cache
+        elif max_bytes is not None:
+            cache.Max_bytes = max_bytes
+        return cache
+
+    def _run_cached_stack(self,analysis,kernel_jobs,h5_file,n_workers,cache_max_bytes):
+        """
+        looks up the result of every kernel in the result cache and runs the missing ones
+        with run_kernel_tasks. this process is the only one writing to h5_file.
+
+        Args:
+            analysis (str): name of the analysis
+            kernel_jobs (list of tuples): (obj, task, params, input_keys, result_keys) per kernel.
+                                          task(obj, **params) is run on a cache miss, input_keys are the
+                                          attributes the result depends on, result_keys the results
+                                          returned (see SingleKernel.set_result). the cache stores the
+                                          values of the valid pixels (<key>_vec) of every result
+            h5_file (str): hdf5 file of the result cache
+            n_workers (int): number of worker processes
+            cache_max_bytes (int): maximum size of the cache in bytes
+
+        Returns:
+            results: list with a tuple of the result_keys attributes of every kernel
+        """
+        cache = self.get_result_cache(h5_file,cache_max_bytes)
+        results = [None]*len(kernel_jobs)
+        jobs = []
+        job_info = []
+        for k, (obj, task, params, input_keys, result_keys) in enumerate(kernel_jobs):
+            # parameters that do not change the result are not part of the key
+            key = cache.make_key(obj,analysis,{name:value for name,value in params.items() if name not in _NOT_IN_KEY},input_keys)
+            cached = cache.get(obj,analysis,key)
+            if cached is None or any(f'{attr_name}_vec' not in cached for attr_name in result_keys):
+                jobs.append((obj,task,params))
+                job_info.append((k,key))
+            else:
+                print(f'{analysis} {obj.Name} ({obj.R_win}, {obj.A_win}): cached')
+                for attr_name in result_keys:
+                    obj.set_result(attr_name,cached[f'{attr_name}_vec'])
+                results[k] = tuple(getattr(obj,attr_name) for attr_name in result_keys)
 
+        timing = {}
+        for i, result, seconds in run_kernel_tasks(jobs,n_workers):
+            k, key = job_info[i]
+            obj, task, params, input_keys, result_keys = kernel_jobs[k]
+            cache.put(obj,analysis,key,{f'{attr_name}_vec':obj.get_result(attr_name) for attr_name in result_keys},params)
+            results[k] = tuple(getattr(obj,attr_name) for attr_name in result_keys)
+            timing[i] = seconds
+        self._report_timing(analysis,jobs,timing)
+        stats = cache.stats()
+        print(f"result cache: {stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evictions, "
+              f"{stats['entries']} results ({stats['nbytes']/1e6:.1f} MB)")
+        return results
+
+    def _report_timing(self,method,jobs,timing):
+        self.Kernel_timing = []
+        for i in sorted(timing):
+            obj = jobs[i][0]
+            self.Kernel_timing.append({'method':method,'name':obj.Name,'R_win':obj.R_win,'A_win':obj.A_win,'seconds':timing[i]})
+            print(f'{method} {obj.Name} ({obj.R_win}, {obj.A_win}): {timing[i]:.2f} s')
+
+    def outlier_detection_HDBSCAN_stack(self,N_overlap,min_samples_fact,hard_lim,h5_file,n_workers=1,cache_max_bytes=None):
+        """
+        runs HDBSCAN (+ GLOSH) on every kernel in the stack, results are cached in h5_file
+        (see get_result_cache) and only computed for kernels without a cached result
+
+        Args:
+            N_overlap (float): minimum cluster size as a fraction of the number of overlapping windows
+            min_samples_fact (float): min_samples as a fraction of the minimum cluster size
+            hard_lim (int): lower limit of the minimum cluster size
+            h5_file (str): hdf5 file of the result cache
+            n_workers (int, optional): number of worker processes, kernels are processed in parallel
+                                       and results are written by this process only. Defaults to 1.
+            cache_max_bytes (int, optional): maximum size of the result cache in bytes. Defaults to None.
+
+        Returns:
+            HDBSCAN_list: HDBSCAN probabilities of every kernel
+            GLOSH_list: GLOSH outlier scores of every kernel
+        """
+        kernel_jobs = []
         for obj in self.Stack:
-            overlap = np.ceil((obj.R_win/R_STEP) * (obj.A_win/A_STEP))
+            overlap = np.ceil((obj.R_win/self.R_step) * (obj.A_win/self.A_step))
             print(f'current window size: {obj.R_win}, {obj.A_win}, overlap: {overlap}')
             hard_limit = hard_lim
             min_cluster_size = np.max([int(np.round(N_overlap*overlap)),hard_limit])
             min_samples = np.max([1,int(np.round(min_cluster_size*min_samples_fact))])
             print(f'min cluster size: {min_cluster_size}')
             print(f'min samples: {min_samples}')
-            # normalize data 
-            obj.prep_DBSCAN(1,1,100)
-            # perform PCA (does not do much)
-            obj.run_PCA(4)
-            # run HDBSCAN + GLOSH
-            f = h5py.File(h5_file,'a')
-            if f'HDBSCAN_labels_{int(min_cluster_size)}_{int(min_samples)}_vec' not in f:
-                f.close()
-                HDBSCAN_labels, GLOSH_probabilities, HDBSCAN_probabilities = obj.run_HDBSCAN(int(min_cluster_size),int(min_samples),False,0.0)
-                HDBSCAN_list.append( HDBSCAN_probabilities)
-                GLOSH_list.append(GLOSH_probabilities)
-                obj.to_hdf5(h5_file,[f'HDBSCAN_labels_{int(min_cluster_size)}_{int(min_samples)}_vec',
-                                    f'HDBSCAN_outlier_scores_{int(min_cluster_size)}_{int(min_samples)}_vec',
-                                    f'HDBSCAN_probabilities_{int(min_cluster_size)}_{int(min_samples)}_vec',
-                                    f'HDBSCAN_labels_{int(min_cluster_size)}_{int(min_samples)}',
-                                    f'HDBSCAN_outlier_scores_{int(min_cluster_size)}_{int(min_samples)}',
-                                    f'HDBSCAN_probabilities_{int(min_cluster_size)}_{int(min_samples)}'])
+            mcs_ms = f'{int(min_cluster_size)}_{int(min_samples)}'
+            result_keys = [f'HDBSCAN_labels_{mcs_ms}',
+                           f'HDBSCAN_outlier_scores_{mcs_ms}',
+                           f'HDBSCAN_probabilities_{mcs_ms}']
+            kernel_jobs.append((obj,_HDBSCAN_task,
+                                {'min_cluster_size':int(min_cluster_size),'min_samples':int(min_samples),'prep_mode':1,'n_comp':4},
+                                _CLUSTER_INPUT_KEYS,
+                                result_keys))
+
+        HDBSCAN_list = []
+        GLOSH_list = []
+        for HDBSCAN_labels, GLOSH_probabilities, HDBSCAN_probabilities in self._run_cached_stack('HDBSCAN',kernel_jobs,h5_file,n_workers,cache_max_bytes):
+            HDBSCAN_list.append( HDBSCAN_probabilities)
+            GLOSH_list.append(GLOSH_probabilities)
         return HDBSCAN_list, GLOSH_list
 
-    def outlier_detection_LOF_stack(self,N_overlap,hard_lim,h5_file):
-        LOF_list = []
+    def outlier_detection_HDBSCAN_sweep(self,N_overlaps,min_samples_facts,hard_lim,h5_file,n_workers=1,cache_max_bytes=None):
+        """
+        runs HDBSCAN (+ GLOSH) on every kernel in the stack for all combinations of N_overlaps and
+        min_samples_facts (as outlier_detection_HDBSCAN_stack for each combination). the single
+        linkage tree of a kernel is built once per min_samples and reused for all minimum cluster
+        sizes with that min_samples (see SingleKernel.run_HDBSCAN_sweep). results are cached in
+        h5_file (see get_result_cache) per kernel and sweep.
+
+        Args:
+            N_overlaps (list of float): minimum cluster sizes as a fraction of the number of overlapping windows
+            min_samples_facts (list of float): min_samples as a fraction of the minimum cluster size
+            hard_lim (int): lower limit of the minimum cluster size
+            h5_file (str): hdf5 file of the result cache
+            n_workers (int, optional): number of worker processes, kernels are processed in parallel
+                                       and results are written by this process only. Defaults to 1.
+            cache_max_bytes (int, optional): maximum size of the result cache in bytes. Defaults to None.
+
+        Returns:
+            sweep: dict with (HDBSCAN_list, GLOSH_list) per (N_overlap, min_samples_fact),
+                   HDBSCAN probabilities and GLOSH outlier scores of every kernel
+        """
+        kernel_jobs = []
+        combinations = []
+        for obj in self.Stack:
+            overlap = np.ceil((obj.R_win/self.R_step) * (obj.A_win/self.A_step))
+            # minimum cluster sizes per min_samples
+            sizes = {}
+            kernel_combinations = {}
+            for N_overlap in N_overlaps:
+                for min_samples_fact in min_samples_facts:
+                    min_cluster_size = int(np.max([int(np.round(N_overlap*overlap)),hard_lim]))
+                    min_samples = int(np.max([1,int(np.round(min_cluster_size*min_samples_fact))]))
+                    sizes.setdefault(min_samples,set()).add(min_cluster_size)
+                    kernel_combinations[(N_overlap,min_samples_fact)] = f'{min_cluster_size}_{min_samples}'
+            sweep = [[min_samples,sorted(sizes[min_samples])] for min_samples in sorted(sizes)]
+            print(f'current window size: {obj.R_win}, {obj.A_win}, overlap: {overlap}, '
+                  f'{len(kernel_combinations)} combinations, {len(sweep)} trees')
+            result_keys = []
+            for min_samples, min_cluster_sizes in sweep:
+                for min_cluster_size in min_cluster_sizes:
+                    result_keys += [f'HDBSCAN_labels_{min_cluster_size}_{min_samples}',
+                                    f'HDBSCAN_outlier_scores_{min_cluster_size}_{min_samples}',
+                                    f'HDBSCAN_probabilities_{min_cluster_size}_{min_samples}']
+            kernel_jobs.append((obj,_HDBSCAN_sweep_task,
+                                {'sweep':sweep,'prep_mode':1,'n_comp':4},
+                                _CLUSTER_INPUT_KEYS,
+                                result_keys))
+            combinations.append(kernel_combinations)
+
+        sweep_results = {(N_overlap,min_samples_fact):([],[]) for N_overlap in N_overlaps for min_samples_fact in min_samples_facts}
+        for k, _ in enumerate(self._run_cached_stack('HDBSCAN_sweep',kernel_jobs,h5_file,n_workers,cache_max_bytes)):
+            obj = self.Stack[k]
+            for combination, mcs_ms in combinations[k].items():
+                sweep_results[combination][0].append(getattr(obj,f'HDBSCAN_probabilities_{mcs_ms}'))
+                sweep_results[combination][1].append(getattr(obj,f'HDBSCAN_outlier_scores_{mcs_ms}'))
+        return sweep_results
+
+    def outlier_detection_LOF_stack(self,N_overlap,hard_lim,h5_file,n_workers=1,cache_max_bytes=None):
+        """
+        runs LOF on every kernel in the stack, results are cached in h5_file
+        (see get_result_cache) and only computed for kernels without a cached result
+
+        Args:
+            N_overlap (float): number of neighbours as a fraction of the number of overlapping windows
+            hard_lim (int): lower limit of the number of neighbours
+            h5_file (str): hdf5 file of the result cache
+            n_workers (int, optional): number of worker processes, kernels are processed in parallel
+                                       and results are written by this process only. Defaults to 1.
+            cache_max_bytes (int, optional): maximum size of the result cache in bytes. Defaults to None.
+
+        Returns:
+            LOF_list: LOF outlier scores of every kernel
+        """
+        kernel_jobs = []
         for obj in self.Stack:
             print(f'current window size: {obj.R_win}, {obj.A_win}')
             # get overlap
-            overlap = np.ceil((obj.R_win/R_STEP) * (obj.A_win/A_STEP))
+            overlap = np.ceil((obj.R_win/self.R_step) * (obj.A_win/self.A_step))
             hard_limit = hard_lim
             min_cluster_size = np.max([int(N_overlap*overlap),hard_limit])
             print(f'knn: {min_cluster_size}')
-            # normalize data 
-            obj.prep_DBSCAN(1,1,100)
-            # perform PCA (does not do much)
-            obj.run_PCA(4)
-            # run LOF
-            f = h5py.File(h5_file,'a')
-            if f'LOF_labels_{int(min_cluster_size)}_vec' not in f:
-                f.close()
-                LOF_labels, LOF_negative_score = obj.run_LOF(n_neighbors=int(min_cluster_size),algorithm='auto',leaf_size=30,contamination='auto')
-                
-                obj.to_hdf5(h5_file,[f'LOF_labels_{int(min_cluster_size)}_vec',
-                                    f'LOF_outlier_score_{int(min_cluster_size)}_vec',
-                                    f'LOF_labels_{int(min_cluster_size)}',
-                                    f'LOF_outlier_scores_{int(min_cluster_size)}'])
-                LOF_list.append(LOF_negative_score)
+            kernel_jobs.append((obj,_LOF_task,
+                                {'n_neighbors':int(min_cluster_size),'prep_mode':1,'n_comp':4},
+                                _CLUSTER_INPUT_KEYS,
+                                [f'LOF_labels_{int(min_cluster_size)}',
+                                 f'LOF_outlier_scores_{int(min_cluster_size)}']))
+
+        LOF_list = []
+        for LOF_labels, LOF_negative_score in self._run_cached_stack('LOF',kernel_jobs,h5_file,n_workers,cache_max_bytes):
+            LOF_list.append(LOF_negative_score)
         return LOF_list
 
-    def outlier_detection_median_stack(self,filt_rad,h5_file):
-        Median_list = []
+    def outlier_detection_LOF_sweep(self,N_overlaps,hard_lim,h5_file,n_workers=1,cache_max_bytes=None):
+        """
+        runs LOF on every kernel in the stack for all N_overlaps (as outlier_detection_LOF_stack
+        for each N_overlap) with one nearest neighbour search per kernel at the largest number of
+        neighbours (see SingleKernel.run_LOF_sweep). results are cached in h5_file (see get_result_cache)
+        per kernel and sweep.
+
+        Args:
+            N_overlaps (list of float): numbers of neighbours as a fraction of the number of overlapping windows
+            hard_lim (int): lower limit of the number of neighbours
+            h5_file (str): hdf5 file of the result cache
+            n_workers (int, optional): number of worker processes, kernels are processed in parallel
+                                       and results are written by this process only. Defaults to 1.
+            cache_max_bytes (int, optional): maximum size of the result cache in bytes. Defaults to None.
+
+        Returns:
+            sweep: dict with LOF_list (LOF outlier scores of every kernel) per N_overlap
+        """
+        kernel_jobs = []
+        n_neighbors_per_kernel = []
+        for obj in self.Stack:
+            overlap = np.ceil((obj.R_win/self.R_step) * (obj.A_win/self.A_step))
+            n_neighbors = {N_overlap:int(np.max([int(N_overlap*overlap),hard_lim])) for N_overlap in N_overlaps}
+            n_neighbors_list = sorted(set(n_neighbors.values()))
+            print(f'current window size: {obj.R_win}, {obj.A_win}, knn: {n_neighbors_list}')
+            kernel_jobs.append((obj,_LOF_sweep_task,
+                                {'n_neighbors_list':n_neighbors_list,'prep_mode':1,'n_comp':4},
+                                _CLUSTER_INPUT_KEYS,
+                                [f'{name}_{k}' for k in n_neighbors_list for name in ['LOF_labels','LOF_outlier_scores']]))
+            n_neighbors_per_kernel.append(n_neighbors)
+
+        sweep_results = {N_overlap:[] for N_overlap in N_overlaps}
+        for k, _ in enumerate(self._run_cached_stack('LOF_sweep',kernel_jobs,h5_file,n_workers,cache_max_bytes)):
+            for N_overlap, n_neighbors in n_neighbors_per_kernel[k].items():
+                sweep_results[N_overlap].append(getattr(self.Stack[k],f'LOF_outlier_scores_{n_neighbors}'))
+        return sweep_results
+
+    def outlier_detection_median_stack(self,filt_rad,h5_file,n_workers=1,cache_max_bytes=None):
+        """
+        runs the median filter on every kernel in the stack, results are cached in h5_file
+        (see get_result_cache) and only computed for kernels without a cached result
+
+        Args:
+            filt_rad (int): radius of the median filter in pixels
+            h5_file (str): hdf5 file of the result cache
+            n_workers (int, optional): number of worker processes, kernels are processed in parallel
+                                       and results are written by this process only. Defaults to 1.
+            cache_max_bytes (int, optional): maximum size of the result cache in bytes. Defaults to None.
+
+        Returns:
+            Median_list: magnitude of the difference with the median of every kernel
+        """
+        kernel_jobs = []
         for obj in self.Stack:
             print(f'current window size: {obj.R_win}, {obj.A_win}')
-            # run Med filt
-            f = h5py.File(h5_file,'a')
-            if f'Mag_off_med_diff_{filt_rad}_vec' not in f:
-                f.close()
-                R_off_med_diff, A_off_med_diff, mag_off_med_diff = obj.run_med_filt(filt_rad)
-                obj.to_hdf5(h5_file,[f'Mag_off_med_diff_{filt_rad}_vec',
-                                    f'Mag_off_med_diff_{filt_rad}'])
-                Median_list.append(mag_off_med_diff)
-        return Median_list
\ No newline at end of file
+            result_keys = [f'R_off_med_diff_{filt_rad}',
+                           f'A_off_med_diff_{filt_rad}',
+                           f'Mag_off_med_diff_{filt_rad}']
+            kernel_jobs.append((obj,_median_task,
+                                {'filt_rad':filt_rad,'memory_budget':getattr(self,'Memory_budget',None)},
+                                ['R_off','A_off','Valid_index'],
+                                result_keys))
+
+        Median_list = []
+        for R_off_med_diff, A_off_med_diff, mag_off_med_diff in self._run_cached_stack('median',kernel_jobs,h5_file,n_workers,cache_max_bytes):
+            Median_list.append(mag_off_med_diff)
+        if self.Store_dir is not None:
+            for obj in self.Stack:
+                obj.to_memmap(os.path.join(self.Store_dir,os.path.splitext(obj.Name)[0]))
+        return Median_list
+
+
+# task parameters that only affect how a result is computed (e.g. tiling), not the result itself
+_NOT_IN_KEY = ('memory_budget',)
+
+# attributes used by prep_DBSCAN + clustering, the cached clustering results depend on these
+_CLUSTER_INPUT_KEYS = ['R_off_vec','A_off_vec','Lon_off_vec','Lat_off_vec','Valid_index','R_off']
+
+# per-kernel tasks of the outlier detection stack methods, module level so they can be sent to worker processes
+def _HDBSCAN_task(obj,min_cluster_size,min_samples,prep_mode,n_comp):
+    # normalize data 
+    obj.prep_DBSCAN(prep_mode,1,100)
+    # perform PCA (does not do much)
+    obj.run_PCA(n_comp)
+    # run HDBSCAN + GLOSH
+    return obj.run_HDBSCAN(min_cluster_size,min_samples,False,0.0)
+
+def _HDBSCAN_sweep_task(obj,sweep,prep_mode,n_comp):
+    # normalize data 
+    obj.prep_DBSCAN(prep_mode,1,100)
+    # perform PCA (does not do much)
+    obj.run_PCA(n_comp)
+    # one tree per min_samples, all minimum cluster sizes from that tree
+    for min_samples, min_cluster_sizes in sweep:
+        obj.run_HDBSCAN_sweep(min_cluster_sizes,min_samples,False,0.0)
+
+def _LOF_task(obj,n_neighbors,prep_mode,n_comp):
+    # normalize data 
+    obj.prep_DBSCAN(prep_mode,1,100)
+    # perform PCA (does not do much)
+    obj.run_PCA(n_comp)
+    # run LOF
+    return obj.run_LOF(n_neighbors=n_neighbors,algorithm='auto',leaf_size=30,contamination='auto')
+
+def _LOF_sweep_task(obj,n_neighbors_list,prep_mode,n_comp):
+    # normalize data 
+    obj.prep_DBSCAN(prep_mode,1,100)
+    # perform PCA (does not do much)
+    obj.run_PCA(n_comp)
+    # run LOF for all numbers of neighbours
+    obj.run_LOF_sweep(n_neighbors_list,algorithm='auto',leaf_size=30,contamination='auto')
+
+def _median_task(obj,filt_rad,memory_budget):
+    # run Med filt
+    return obj.run_med_filt(filt_rad,memory_budget)
\ No newline at end of file
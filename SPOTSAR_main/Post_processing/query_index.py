@@ -0,0 +1,192 @@
+import numpy as np
+from sklearn.neighbors import BallTree
+
+from .geodetic2enu import lla2ecef, enu_rotation
+
+# radius of the sphere of the local azimuthal equidistant projection used by query_point
+EARTH_RADIUS = 6371000
+
+
+def _group_percentile(sorted_vals, starts, counts, q):
+    """
+    linear percentile (as np.nanpercentile) of groups of sorted values
+
+    Args:
+        sorted_vals (np.ndarray): nan free values, sorted within each group
+        starts (np.ndarray): start index of each group in sorted_vals
+        counts (np.ndarray): number of values in each group
+        q (float): percentile [0-100]
+
+    Returns:
+        percentile: percentile of each group, nan for empty groups
+    """
+    result = np.full(np.shape(counts), np.nan)
+    has_data = counts > 0
+    virtual_idx = (counts[has_data] - 1) * (q / 100)
+    lo = np.floor(virtual_idx).astype(np.int64)
+    hi = np.minimum(lo + 1, counts[has_data] - 1)
+    t = virtual_idx - lo
+    a = sorted_vals[starts[has_data] + lo]
+    b = sorted_vals[starts[has_data] + hi]
+    diff = b - a
+    result[has_data] = np.where(t >= 0.5, b - diff * (1 - t), a + diff * t)
+    return result
+
+
+def circle_coordinates(q_lats, q_lons, r, n=128):
+    """
+    lon, lat coordinates of circles of radius r around query points, approximated by
+    polygons with n segments per quarter circle (as the buffer used by query_point)
+
+    Args:
+        q_lats (array-like): query point latitudes in degrees
+        q_lons (array-like): query point longitudes in degrees
+        r (float): radius in meters
+        n (int, optional): number of segments per quarter circle. Defaults to 128.
+
+    Returns:
+        coordinate_circle_list: list of (4*n+1, 2) arrays with lon, lat of the circle vertices
+    """
+    lat1 = np.radians(np.atleast_1d(q_lats))[:, np.newaxis]
+    lon1 = np.radians(np.atleast_1d(q_lons))[:, np.newaxis]
+    # vertices start east of the query point and go clockwise (as shapely's buffer), closed
+    theta = np.append(np.arange(4 * n) * (np.pi / (2 * n)), 0)
+    bearing = np.pi / 2 + theta
+    delta = r / EARTH_RADIUS
+    lat2 = np.arcsin(np.sin(lat1) * np.cos(delta) + np.cos(lat1) * np.sin(delta) * np.cos(bearing))
+    lon2 = lon1 + np.arctan2(
+        np.sin(bearing) * np.sin(delta) * np.cos(lat1), np.cos(delta) - np.sin(lat1) * np.sin(lat2)
+    )
+    return [np.column_stack((np.degrees(lon), np.degrees(lat))) for lon, lat in zip(lon2, lat2)]
+
+
+class QueryIndex:
+    """
+    spatial index over the pixel positions of a grid for fast radius queries
+    ...
+    the ball tree (haversine metric) and the ECEF coordinates of all pixels are computed
+    once, after which statistics of any attribute on the same grid can be computed for many
+    query points in one call.
+
+    Attr
+    ----------
+    Shape : tuple
+        shape of the grid
+    Index : np.array
+        flat index of the pixels with valid coordinates
+    Lats, Lons : np.array
+        coordinates of the pixels with valid coordinates
+    Tree : sklearn.neighbors.BallTree
+        ball tree of the pixel positions (radians)
+    Ecef : np.array
+        (N,3) ECEF coordinates of the pixels (height 0)
+    """
+
+    def __init__(self, lats, lons):
+        """
+        Args:
+            lats (np.ndarray): latitude of the grid in degrees (nan where missing)
+            lons (np.ndarray): longitude of the grid in degrees (nan where missing)
+        """
+        self.Shape = np.shape(lats)
+        lats = np.ravel(lats)
+        lons = np.ravel(lons)
+        valid = np.isfinite(lats) & np.isfinite(lons)
+        self.Index = np.flatnonzero(valid)
+        self.Lats = np.asarray(lats[valid], dtype=np.float64)
+        self.Lons = np.asarray(lons[valid], dtype=np.float64)
+        self.Tree = BallTree(np.radians(np.column_stack((self.Lats, self.Lons))), metric="haversine")
+        x, y, z = lla2ecef(self.Lats, self.Lons, 0)
+        self.Ecef = np.column_stack((x, y, z))
+
+    def neighbours(self, q_lats, q_lons, r):
+        """
+        finds the pixels within r meters (great circle distance) of each query point
+
+        Returns:
+            neighbours: list with an array of positions in self.Index for every query point
+        """
+        q_ll = np.radians(np.column_stack((np.atleast_1d(q_lats), np.atleast_1d(q_lons))))
+        return list(self.Tree.query_radius(q_ll, r / EARTH_RADIUS))
+
+    def stats(self, data_attr, q_lats, q_lons, r):
+        """
+        calculates mean, median, standard deviation and 95% confidence interval of
+        deramped attribute data within r meters of each query point (see query_point)
+
+        Args:
+            data_attr (np.ndarray): attribute with the same shape as the grid (nan where missing)
+            q_lats (array-like): query point latitudes in degrees
+            q_lons (array-like): query point longitudes in degrees
+            r (float): search radius in meters
+
+        Returns:
+            q_mean, q_median, q_std: statistics of every query point
+            q_95: (N,2) 2.5 and 97.5 percentiles of every query point
+            neighbours: list with the flat grid index of the pixels of each query point
+        """
+        q_lats = np.atleast_1d(q_lats).astype(np.float64)
+        q_lons = np.atleast_1d(q_lons).astype(np.float64)
+        n_q = np.size(q_lats)
+        data = np.ravel(data_attr)[self.Index].astype(np.float64)
+
+        neighbours = self.neighbours(q_lats, q_lons, r)
+        counts = np.array([np.size(nb) for nb in neighbours], dtype=np.int64)
+        gid = np.repeat(np.arange(n_q), counts)
+        pix = np.concatenate(neighbours).astype(np.int64) if n_q > 0 else np.empty(0, dtype=np.int64)
+
+        # local east and north of all neighbours relative to their query point
+        x_org, y_org, z_org = lla2ecef(q_lats, q_lons, 0)
+        rot = enu_rotation(q_lats, q_lons)
+        d_ecef = self.Ecef[pix] - np.column_stack((x_org, y_org, z_org))[gid]
+        east = np.einsum("ij,ij->i", rot[gid, 0, :], d_ecef)
+        north = np.einsum("ij,ij->i", rot[gid, 1, :], d_ecef)
+        vals = data[pix]
+
+        # deramp: least squares plane val = a*east + b*north + c per query point (nan values excluded)
+        ok = ~np.isnan(vals)
+        n_ok = np.bincount(gid[ok], minlength=n_q)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_e = np.bincount(gid[ok], east[ok], n_q) / n_ok
+            mean_n = np.bincount(gid[ok], north[ok], n_q) / n_ok
+            mean_v = np.bincount(gid[ok], vals[ok], n_q) / n_ok
+        de = east[ok] - mean_e[gid[ok]]
+        dn = north[ok] - mean_n[gid[ok]]
+        dv = vals[ok] - mean_v[gid[ok]]
+        s_ee = np.bincount(gid[ok], de * de, n_q)
+        s_nn = np.bincount(gid[ok], dn * dn, n_q)
+        s_en = np.bincount(gid[ok], de * dn, n_q)
+        s_ev = np.bincount(gid[ok], de * dv, n_q)
+        s_nv = np.bincount(gid[ok], dn * dv, n_q)
+        det = s_ee * s_nn - s_en**2
+        coef = np.full((n_q, 2), np.nan)
+        regular = det > 1e-12 * np.maximum(s_ee * s_nn, np.finfo(float).tiny)
+        coef[regular, 0] = (s_nn * s_ev - s_en * s_nv)[regular] / det[regular]
+        coef[regular, 1] = (s_ee * s_nv - s_en * s_ev)[regular] / det[regular]
+        # (nearly) collinear neighbourhoods: minimum norm solution as LinearRegression
+        for i in np.flatnonzero(~regular & (n_ok > 0)):
+            sel = gid[ok] == i
+            coef[i] = np.linalg.lstsq(np.column_stack((de[sel], dn[sel])), dv[sel], rcond=None)[0]
+
+        deramped = vals - east * coef[gid, 0] - north * coef[gid, 1]
+
+        # statistics per query point
+        ok = ~np.isnan(deramped)
+        g = gid[ok]
+        d = deramped[ok]
+        n_d = np.bincount(g, minlength=n_q)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            q_mean = np.bincount(g, d, n_q) / n_d
+            q_std = np.sqrt(np.bincount(g, (d - q_mean[g]) ** 2, n_q) / n_d)
+        order = np.lexsort((d, g))
+        sorted_d = d[order]
+        starts = np.cumsum(n_d) - n_d
+        q_median = np.full(n_q, np.nan)
+        has_data = n_d > 0
+        lo = starts[has_data] + (n_d[has_data] - 1) // 2
+        hi = starts[has_data] + n_d[has_data] // 2
+        q_median[has_data] = np.where(lo == hi, sorted_d[lo], (sorted_d[lo] + sorted_d[hi]) / 2)
+        q_95 = np.column_stack(
+            (_group_percentile(sorted_d, starts, n_d, 2.5), _group_percentile(sorted_d, starts, n_d, 97.5))
+        )
+        return q_mean, q_median, q_std, q_95, [self.Index[nb] for nb in neighbours]
@@ -0,0 +1,132 @@
+import numpy as np
+from scipy import sparse
+from sklearn.neighbors import BallTree
+
+from .query_index import EARTH_RADIUS
+
+
+def _haversine(lat1, lon1, lat2, lon2):
+    """great circle distance in radians between points given in radians"""
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+
+def grid_halo(lats, lons, rows, cols, radius):
+    """
+    number of grid rows and columns around a point that can hold points within radius.
+    a point i rows away is at least i times the distance between neighbouring rows, measured
+    perpendicular to the rows (the height of a grid cell), so the halo is radius divided by the
+    smallest cell height along each axis. this also holds for sheared grids, as the range/azimuth
+    grid of a kernel whose axes are not perpendicular on the ground.
+
+    Args:
+        lats, lons (np.ndarray): coordinates of the points in degrees
+        rows, cols (np.ndarray): position of the points on the grid
+        radius (float): distance in meters
+
+    Returns:
+        halo: (row_halo, col_halo)
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    lookup = np.full((rows.max() + 1, cols.max() + 1), -1, dtype=np.int64)
+    lookup[rows, cols] = np.arange(np.size(rows))
+    lat = np.radians(lats)
+    lon = np.radians(lons)
+    # cells with the point, its next row and its next column
+    i = lookup[:-1, :-1].ravel()
+    j_row = lookup[1:, :-1].ravel()
+    j_col = lookup[:-1, 1:].ravel()
+    cells = (i >= 0) & (j_row >= 0) & (j_col >= 0)
+    i, j_row, j_col = i[cells], j_row[cells], j_col[cells]
+    # steps between neighbouring rows and columns in local east/north meters
+    cos_lat = np.cos(lat[i])
+    step_row = np.column_stack(((lon[j_row] - lon[i]) * cos_lat, lat[j_row] - lat[i])) * EARTH_RADIUS
+    step_col = np.column_stack(((lon[j_col] - lon[i]) * cos_lat, lat[j_col] - lat[i])) * EARTH_RADIUS
+    area = np.abs(step_row[:, 0] * step_col[:, 1] - step_row[:, 1] * step_col[:, 0])
+    halo = []
+    for step_other, size in [(step_col, lookup.shape[0]), (step_row, lookup.shape[1])]:
+        height = area / np.hypot(step_other[:, 0], step_other[:, 1])
+        height = height[np.isfinite(height) & (height > 0)]
+        if height.size == 0:
+            halo.append(size - 1)
+        else:
+            halo.append(int(min(np.ceil(radius / height.min()), size - 1)))
+    return tuple(halo)
+
+
+def radius_graph(lats, lons, radius, method="tree", rows=None, cols=None, halo=None):
+    """
+    sparse graph of the great circle distances between all pairs of points within radius
+    of each other, instead of a dense N x N distance matrix.
+
+    the graph follows sklearn's convention for precomputed neighbours (as RadiusNeighborsTransformer):
+    every point is its own neighbour at distance 0 and each row is sorted by distance. it can
+    be used with metric='precomputed' as input for DBSCAN (eps <= radius), HDBSCAN and LOF
+    (every point needs at least n_neighbors other points within radius).
+
+    Args:
+        lats, lons (np.ndarray): coordinates of the points in degrees
+        radius (float): maximum distance in meters
+        method (str, optional): 'tree' queries a ball tree (haversine) of all points, 'grid'
+                                compares every point with the points in a window of rows and
+                                columns around it, for points on a regular grid (as the range/
+                                azimuth grid of a kernel). Defaults to "tree".
+        rows, cols (np.ndarray, optional): position of the points on the grid, required for 'grid'
+        halo (tuple of int, optional): (rows, cols) around a point that are searched with 'grid'.
+                                       Defaults to None, derived from radius with grid_halo.
+
+    Returns:
+        graph: (N, N) scipy.sparse.csr_matrix with the distance in meters of the pairs within radius
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    n_points = np.size(lats)
+    if method == "tree":
+        coords = np.radians(np.column_stack((lats, lons)))
+        tree = BallTree(coords, metric="haversine")
+        neighbours, distances = tree.query_radius(coords, radius / EARTH_RADIUS, return_distance=True)
+        counts = np.array([np.size(nb) for nb in neighbours], dtype=np.int64)
+        src = np.repeat(np.arange(n_points), counts)
+        dst = np.concatenate(neighbours).astype(np.int64) if n_points > 0 else np.empty(0, dtype=np.int64)
+        dist = np.concatenate(distances) * EARTH_RADIUS if n_points > 0 else np.empty(0)
+        # the distance of a point to itself is exactly 0
+        dist[dst == src] = 0
+    elif method == "grid":
+        if rows is None or cols is None:
+            raise ValueError("method 'grid' needs the rows and cols of the points")
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        if halo is None:
+            halo = grid_halo(lats, lons, rows, cols, radius)
+        shape = (rows.max() + 1, cols.max() + 1) if n_points > 0 else (0, 0)
+        lookup = np.full(shape, -1, dtype=np.int64)
+        lookup[rows, cols] = np.arange(n_points)
+        lat = np.radians(lats)
+        lon = np.radians(lons)
+        src, dst, dist = [np.arange(n_points)], [np.arange(n_points)], [np.zeros(n_points)]
+        for d_row in range(-halo[0], halo[0] + 1):
+            for d_col in range(-halo[1], halo[1] + 1):
+                if d_row == 0 and d_col == 0:
+                    continue
+                nb_rows = rows + d_row
+                nb_cols = cols + d_col
+                i = np.flatnonzero((nb_rows >= 0) & (nb_rows < shape[0]) & (nb_cols >= 0) & (nb_cols < shape[1]))
+                j = lookup[nb_rows[i], nb_cols[i]]
+                i, j = i[j >= 0], j[j >= 0]
+                d = _haversine(lat[i], lon[i], lat[j], lon[j]) * EARTH_RADIUS
+                within = d <= radius
+                src.append(i[within])
+                dst.append(j[within])
+                dist.append(d[within])
+        src = np.concatenate(src)
+        dst = np.concatenate(dst)
+        dist = np.concatenate(dist)
+    else:
+        raise ValueError(f"method should be 'tree' or 'grid', not {method}")
+
+    # rows by point, sorted by distance within each row (the zeros are kept as explicit entries)
+    order = np.lexsort((dst, dist, src))
+    indptr = np.zeros(n_points + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n_points), out=indptr[1:])
+    return sparse.csr_matrix((dist[order], dst[order], indptr), shape=(n_points, n_points))
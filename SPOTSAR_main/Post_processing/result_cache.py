@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import time
+
+import h5py
+import numpy as np
+
+
+class ResultCache:
+    """
+    hdf5 cache for the results of SingleKernel analyses (HDBSCAN, LOF, median filter, ...)
+    ...
+    every result is stored in its own group /<kernel>/<analysis>/<key>, where key is a
+    hash of the kernel identity, the analysis name, all parameters and the content of the
+    input arrays, so results of different kernels or parameters never collide and results
+    computed from different input data are never reused.
+    when max_bytes is given, least recently used results are removed until the cached
+    results fit.
+
+    Attr
+    ----------
+    H5_file : str
+        path of the hdf5 file
+    Max_bytes : int
+        maximum total size of the cached arrays in bytes (None for no limit)
+    Hits : int
+        number of lookups that were found in the cache
+    Misses : int
+        number of lookups that were not found in the cache
+    Evictions : int
+        number of results removed to stay within Max_bytes
+    """
+
+    def __init__(self, h5_file, max_bytes=None):
+        self.H5_file = h5_file
+        self.Max_bytes = max_bytes
+        self.Hits = 0
+        self.Misses = 0
+        self.Evictions = 0
+
+    def _open(self):
+        if not os.path.exists(self.H5_file):
+            # persistent free space tracking, so space of evicted results is reused
+            return h5py.File(self.H5_file, "w-", fs_strategy="fsm", fs_persist=True)
+        return h5py.File(self.H5_file, "a")
+
+    @staticmethod
+    def kernel_group(obj):
+        """name of the hdf5 group of a kernel"""
+        return os.path.splitext(os.path.basename(str(obj.Name)))[0]
+
+    @staticmethod
+    def make_key(obj, analysis, params, input_keys):
+        """
+        hash of everything a result depends on
+
+        Args:
+            obj (SingleKernel): kernel the analysis is run on
+            analysis (str): name of the analysis
+            params (dict): all parameters of the analysis (json serialisable)
+            input_keys (list of str): attributes of obj that are used by the analysis
+
+        Returns:
+            key: hex digest
+        """
+        sha1 = hashlib.sha1()
+        identity = {
+            "name": str(obj.Name),
+            "dates": [str(obj.Date1), str(obj.Date2)],
+            "win": [int(obj.R_win), int(obj.A_win)],
+            "heading": float(obj.Heading),
+            "analysis": analysis,
+            "params": params,
+        }
+        sha1.update(json.dumps(identity, sort_keys=True, default=str).encode("utf-8"))
+        for key in input_keys:
+            arr = np.ascontiguousarray(getattr(obj, key))
+            sha1.update(f"{key}|{arr.dtype.str}|{arr.shape}".encode("utf-8"))
+            sha1.update(arr.view(np.uint8).reshape(-1).data if arr.size else b"")
+        return sha1.hexdigest()
+
+    def get(self, obj, analysis, key):
+        """
+        looks up a result
+
+        Returns:
+            arrays: dict with the cached arrays, None if the result is not in the cache
+        """
+        path = f"{self.kernel_group(obj)}/{analysis}/{key}"
+        if os.path.exists(self.H5_file):
+            with self._open() as f:
+                if path in f:
+                    group = f[path]
+                    arrays = {name: dset[()] for name, dset in group.items()}
+                    group.attrs["last_access"] = time.time_ns()
+                    self.Hits += 1
+                    return arrays
+        self.Misses += 1
+        return None
+
+    def put(self, obj, analysis, key, arrays, params=None):
+        """
+        stores a result and evicts least recently used results if the cache is too large
+
+        Args:
+            obj (SingleKernel): kernel the analysis was run on
+            analysis (str): name of the analysis
+            key (str): key as returned by make_key
+            arrays (dict): arrays to store
+            params (dict, optional): parameters, stored as attribute for reference
+        """
+        path = f"{self.kernel_group(obj)}/{analysis}/{key}"
+        with self._open() as f:
+            if path in f:
+                del f[path]
+            group = f.create_group(path)
+            for name, arr in arrays.items():
+                group.create_dataset(name, data=arr)
+            group.attrs["nbytes"] = int(sum(np.asarray(arr).nbytes for arr in arrays.values()))
+            group.attrs["last_access"] = time.time_ns()
+            group.attrs["params"] = json.dumps(params if params is not None else {}, sort_keys=True, default=str)
+            if self.Max_bytes is not None:
+                self._evict(f, keep=path)
+
+    def _entries(self, f):
+        """(path, nbytes, last_access) of all cached results"""
+        entries = []
+
+        def visit(name, item):
+            if isinstance(item, h5py.Group) and "last_access" in item.attrs:
+                entries.append((name, int(item.attrs["nbytes"]), int(item.attrs["last_access"])))
+
+        f.visititems(visit)
+        return entries
+
+    def _evict(self, f, keep=None):
+        entries = sorted(self._entries(f), key=lambda entry: entry[2])
+        total = sum(entry[1] for entry in entries)
+        for path, nbytes, _ in entries:
+            if total <= self.Max_bytes:
+                break
+            if path == keep:
+                continue
+            del f[path]
+            total -= nbytes
+            self.Evictions += 1
+            # remove analysis and kernel groups that became empty
+            parent = path.rsplit("/", 1)[0]
+            while parent and len(f[parent]) == 0:
+                del f[parent]
+                parent = parent.rsplit("/", 1)[0] if "/" in parent else ""
+
+    def stats(self):
+        """
+        returns hit/miss statistics and the size of the cache
+
+        Returns:
+            stats: dict with hits, misses, evictions, entries and nbytes
+        """
+        entries = []
+        if os.path.exists(self.H5_file):
+            with h5py.File(self.H5_file, "r") as f:
+                entries = self._entries(f)
+        return {
+            "hits": self.Hits,
+            "misses": self.Misses,
+            "evictions": self.Evictions,
+            "entries": len(entries),
+            "nbytes": sum(entry[1] for entry in entries),
+        }
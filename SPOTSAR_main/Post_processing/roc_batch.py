@@ -0,0 +1,183 @@
+import h5py
+import numpy as np
+import pandas as pd
+
+from .window_plane_fit import DEFAULT_MEMORY_BUDGET
+
+
+def hdf5_scores(filename, keys):
+    """
+    reads score arrays from an hdf5 file one at a time (e.g. written by SingleKernel.to_hdf5),
+    so that roc_batch does not need all of them in memory
+
+    Args:
+        filename (str): hdf5 file
+        keys (list of str or dict): dataset names, or {key: dataset name} to use other keys
+
+    Yields:
+        key, scores: key and array of every dataset
+    """
+    if not isinstance(keys, dict):
+        keys = {key: key for key in keys}
+    with h5py.File(filename, "r") as f:
+        for key, dataset in keys.items():
+            yield key, f[dataset][()]
+
+
+def _roc_block(y, scores, return_curves):
+    """
+    rank based ROC statistics of a block of score arrays with the same reference labels
+
+    Args:
+        y (np.ndarray): (N,) boolean reference, True for the positive class
+        scores (np.ndarray): (M, N) scores, nan where there is no score
+        return_curves (bool): also return the ROC curves
+
+    Returns:
+        stats: dict of (M,) arrays (auc, best_threshold, tpr, fpr, n_pos, n_neg)
+        curves: list of (fpr, tpr, thresholds) per score array (None if not return_curves)
+    """
+    n_scores, n_points = scores.shape
+    # ascending, nan at the end of every row
+    order = np.argsort(scores, axis=1, kind="stable")
+    s = np.take_along_axis(scores, order, axis=1)
+    valid = ~np.isnan(s)
+    is_pos = y[order] & valid
+    is_neg = ~y[order] & valid
+    n_pos = np.sum(is_pos, axis=1)
+    n_neg = np.sum(is_neg, axis=1)
+
+    # groups of tied scores: first and last position of the group of every position
+    position = np.arange(n_points)
+    first = np.ones((n_scores, n_points), dtype=bool)
+    first[:, 1:] = s[:, 1:] != s[:, :-1]
+    last = np.ones((n_scores, n_points), dtype=bool)
+    last[:, :-1] = first[:, 1:]
+    start = np.maximum.accumulate(np.where(first, position, 0), axis=1)
+    end = np.minimum.accumulate(np.where(last, position, n_points - 1)[:, ::-1], axis=1)[:, ::-1]
+
+    # AUC as Mann-Whitney U statistic with average ranks of ties (equal to the trapezoidal ROC area)
+    rank_sum = np.sum(np.where(is_pos, (start + end) / 2 + 1, 0), axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        auc = (rank_sum - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg)
+
+        # ROC point of every threshold (score >= threshold is positive): at the first position of a group
+        tpr = (n_pos[:, np.newaxis] - (np.cumsum(is_pos, axis=1) - is_pos)) / n_pos[:, np.newaxis]
+        fpr = (n_neg[:, np.newaxis] - (np.cumsum(is_neg, axis=1) - is_neg)) / n_neg[:, np.newaxis]
+    threshold_point = first & valid
+    # best threshold: maximum of Youden's J = tpr - fpr
+    youden = np.where(threshold_point, tpr - fpr, -np.inf)
+    best = np.argmax(youden, axis=1)
+    rows = np.arange(n_scores)
+    has_roc = (n_pos > 0) & (n_neg > 0)
+    stats = {
+        "auc": auc,
+        "best_threshold": np.where(has_roc, s[rows, best], np.nan),
+        "tpr": np.where(has_roc, tpr[rows, best], np.nan),
+        "fpr": np.where(has_roc, fpr[rows, best], np.nan),
+        "n_pos": n_pos,
+        "n_neg": n_neg,
+    }
+
+    curves = None
+    if return_curves:
+        curves = []
+        for row in range(n_scores):
+            # decreasing thresholds, starting at (0, 0) with an infinite threshold as sklearn's roc_curve
+            points = np.flatnonzero(threshold_point[row])[::-1]
+            curves.append(
+                (
+                    np.concatenate(([0.0], fpr[row, points])),
+                    np.concatenate(([0.0], tpr[row, points])),
+                    np.concatenate(([np.inf], s[row, points])),
+                )
+            )
+    return stats, curves
+
+
+def roc_batch(labels, scores, index=None, key_names=("name",), memory_budget=None, return_curves=False):
+    """
+    ROC curve, area under the curve and best threshold of many score arrays against the same
+    reference, e.g. outlier scores of all kernels and parameters against a map of known inliers
+    and outliers. the score arrays are evaluated in blocks: sorting, tie handling and the ROC
+    statistics of a block are computed at once, and arrays can be read one at a time from an
+    iterator (see hdf5_scores) so that not all of them need to be in memory.
+
+    the AUC is the Mann-Whitney U statistic with average ranks for ties, which equals the
+    trapezoidal area under the ROC curve (sklearn's roc_auc_score). the best threshold
+    maximises Youden's J (tpr - fpr), as picked from the curves in the AUC notebooks.
+
+    Args:
+        labels (np.ndarray): reference, 1 (True) for the positive class and 0 for the negative
+                             class, nan where the class is unknown (not evaluated)
+        scores (dict or iterable): {key: scores} or iterable of (key, scores) with arrays of the
+                                   shape of labels, higher scores for the positive class (e.g.
+                                   inlier probability for inlier labels, negate outlier scores).
+                                   nan scores are not evaluated, as in the notebooks.
+        index (np.ndarray, optional): flat index or boolean mask of the pixels to evaluate
+                                      (e.g. test points). Defaults to None, all pixels.
+        key_names (tuple of str, optional): names of the table columns of the keys, keys are
+                                            tuples of that length (e.g. ('method', 'R_win',
+                                            'min_cluster_size')). Defaults to ("name",).
+        memory_budget (int, optional): maximum number of bytes of the working arrays of a block.
+                                       Defaults to None, DEFAULT_MEMORY_BUDGET.
+        return_curves (bool, optional): also return the ROC curves. Defaults to False.
+
+    Returns:
+        table: pandas.DataFrame with the key columns and auc, best_threshold, tpr and fpr at the
+               best threshold, n_pos and n_neg per score array, e.g. for
+               table.pivot(index=..., columns=..., values='auc') heat maps
+        curves (only if return_curves): dict with (fpr, tpr, thresholds) per key
+    """
+    if memory_budget is None:
+        memory_budget = DEFAULT_MEMORY_BUDGET
+    labels = np.ravel(labels)
+    if index is None:
+        index = np.arange(labels.size)
+    index = np.asarray(index)
+    if index.dtype == bool:
+        index = np.flatnonzero(np.ravel(index))
+    known = ~np.isnan(labels[index].astype(np.float64))
+    index = index[known]
+    y = labels[index].astype(bool)
+    # scores, order, sorted scores, ranks and cumulative counts of a block
+    block_rows = max(1, int(memory_budget // max(1, 64 * index.size)))
+
+    if isinstance(scores, dict):
+        scores = scores.items()
+    keys = []
+    columns = {}
+    curves = {}
+    block_keys = []
+    block = []
+
+    def flush():
+        stats, block_curves = _roc_block(y, np.array(block, dtype=np.float64), return_curves)
+        for name, values in stats.items():
+            columns.setdefault(name, []).append(values)
+        if return_curves:
+            curves.update(zip(block_keys, block_curves))
+        keys.extend(block_keys)
+        block_keys.clear()
+        block.clear()
+
+    for key, score in scores:
+        block_keys.append(key)
+        block.append(np.ravel(score)[index])
+        if len(block) == block_rows:
+            flush()
+    if len(block) > 0:
+        flush()
+
+    if len(key_names) == 1:
+        table = pd.DataFrame({key_names[0]: keys})
+    else:
+        table = pd.DataFrame(keys, columns=list(key_names))
+    for name, values in columns.items():
+        table[name] = np.concatenate(values)
+    for name in ["n_pos", "n_neg"]:
+        if name in table:
+            table[name] = table[name].astype(np.int64)
+    if return_curves:
+        return table, curves
+    return table
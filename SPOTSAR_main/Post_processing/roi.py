@@ -0,0 +1,214 @@
+import io
+import os
+
+import numpy as np
+import pandas as pd
+from inpoly import inpoly2
+
+# number of lat/lon pixels per tile when searching the region of interest
+ROI_TILE_PIXELS = 2**20
+
+
+def roi_bounds(roi, geometry=None, r_start=1, a_start=1):
+    """
+    range and azimuth pixel bounds of a region of interest, in the pixel coordinates of the
+    offset files (columns 0 and 1)
+
+    Args:
+        roi (dict): {'rng': [min, max], 'azi': [min, max]} window in radar pixels,
+                    {'lon': lon_lims, 'lat': lat_lims} box or {'polygon': [(lon, lat), ...]}
+        geometry (Geometry, optional): geometry of the frame, needed for lon/lat regions.
+                                       Defaults to None.
+        r_start (int, optional): first range pixel of the offset data. Defaults to 1.
+        a_start (int, optional): first azimuth pixel of the offset data. Defaults to 1.
+
+    Returns:
+        (rng_min, rng_max, azi_min, azi_max): bounds of all pixels in the region
+    """
+    if "rng" in roi and "azi" in roi:
+        return (min(roi["rng"]), max(roi["rng"]), min(roi["azi"]), max(roi["azi"]))
+    if "polygon" in roi:
+        polygon = np.asarray(roi["polygon"], dtype=np.float64)
+        lon_lims = [polygon[:, 0].min(), polygon[:, 0].max()]
+        lat_lims = [polygon[:, 1].min(), polygon[:, 1].max()]
+    elif "lon" in roi and "lat" in roi:
+        polygon = None
+        lon_lims = [min(roi["lon"]), max(roi["lon"])]
+        lat_lims = [min(roi["lat"]), max(roi["lat"])]
+    else:
+        raise ValueError(f"roi must have the keys 'rng' and 'azi', 'lon' and 'lat' or 'polygon', not {list(roi)}")
+    if geometry is None:
+        raise ValueError("a geometry (lat/lon files) is needed for a lon/lat region of interest")
+
+    # search the lat/lon files in tiles of lines, only the lines of a tile are converted at once
+    lines, width = geometry.Shape
+    tile_lines = max(1, ROI_TILE_PIXELS // width)
+    rows = []
+    cols = []
+    for start in range(0, lines, tile_lines):
+        lat, lon = geometry.window(slice(start, start + tile_lines))
+        inside = (lon >= lon_lims[0]) & (lon <= lon_lims[1]) & (lat >= lat_lims[0]) & (lat <= lat_lims[1])
+        tile_rows, tile_cols = np.nonzero(inside)
+        if polygon is not None and tile_rows.size > 0:
+            isin, ison = inpoly2(np.column_stack((lon[tile_rows, tile_cols], lat[tile_rows, tile_cols])), polygon)
+            tile_rows = tile_rows[isin | ison]
+            tile_cols = tile_cols[isin | ison]
+        if tile_rows.size > 0:
+            rows += [start + tile_rows.min(), start + tile_rows.max()]
+            cols += [tile_cols.min(), tile_cols.max()]
+    if len(rows) == 0:
+        raise ValueError(f"no pixels of {geometry.Lat_file} are in the region of interest {roi}")
+    # lat/lon pixel (row, col) of offset pixel (rng, azi) is (azi + a_start - 1, rng + r_start - 1)
+    return (int(min(cols)) - r_start + 1, int(max(cols)) - r_start + 1, int(min(rows)) - a_start + 1, int(max(rows)) - a_start + 1)
+
+
+def _position(line):
+    """(azimuth, range) pixel (columns 1 and 0) of a line of an offset file, inf for empty lines"""
+    values = line.split()
+    if len(values) < 2:
+        return (np.inf, np.inf)
+    return (float(values[1]), float(values[0]))
+
+
+def _first_line(f, lo, hi, position):
+    """
+    byte offset of the first line in [lo, hi) at or after an (azimuth, range) position,
+    hi if there is none. lo must be the start of a line, lines are sorted by azimuth and range.
+    """
+    # the result is always a line start in [lo, hi]
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if mid <= lo:
+            start = lo
+        else:
+            # start of the first line after mid-1
+            f.seek(mid - 1)
+            f.readline()
+            start = f.tell()
+        if start >= hi:
+            start = lo
+        f.seek(start)
+        line = f.readline()
+        if _position(line) >= position:
+            hi = start
+        else:
+            lo = start + len(line)
+    return hi
+
+
+def _segments(f, size, bounds):
+    """byte ranges (first, last) of the lines within pixel bounds, one per azimuth line"""
+    rng_min, rng_max, azi_min, azi_max = bounds
+    start = _first_line(f, 0, size, (azi_min, -np.inf))
+    # range and azimuth pixels are integers
+    stop = _first_line(f, start, size, (np.floor(azi_max) + 1, -np.inf))
+    while start < stop:
+        f.seek(start)
+        azi = _position(f.readline())[0]
+        first = _first_line(f, start, stop, (azi, rng_min))
+        last = _first_line(f, first, stop, (azi, np.floor(rng_max) + 1))
+        yield first, last
+        # first line of the next azimuth line
+        start = _first_line(f, last, stop, (azi, np.inf))
+
+
+def read_offsets(path, bounds):
+    """
+    reads the offsets of an offset text file within pixel bounds. the lines of an offset file
+    are sorted by azimuth and then by range, so the lines within the bounds of every azimuth
+    line are found by bisection of the file and only those lines are parsed.
+
+    Args:
+        path (str): offset text file
+        bounds (tuple): (rng_min, rng_max, azi_min, azi_max) pixel bounds, see roi_bounds
+
+    Returns:
+        pd.DataFrame: offsets within the bounds, columns as pd.read_csv(path, header=None, sep='\\s+')
+    """
+    parts = []
+    with open(path, "rb") as f:
+        for first, last in _segments(f, os.path.getsize(path), bounds):
+            f.seek(first)
+            parts.append(f.read(last - first))
+    text = b"".join(parts)
+    if len(text.strip()) == 0:
+        raise ValueError(f"no offsets of {path} are in the pixel bounds {bounds}")
+    return pd.read_csv(io.BytesIO(text), header=None, sep=r"\s+")
+
+
+def _offset_line(f, start, stop, reverse=False, block_size=4096):
+    """first (last if reverse) line with a pixel position in the bytes [start, stop) of a file, None if there is none"""
+    if not reverse:
+        f.seek(start)
+        while f.tell() < stop:
+            line = f.readline()
+            if len(line.split()) >= 2:
+                return line
+        return None
+    # read blocks from the end, the first line of a block is incomplete unless it starts at start
+    end = stop
+    text = b""
+    while end > start:
+        begin = max(start, end - block_size)
+        f.seek(begin)
+        text = f.read(end - begin) + text
+        for line in reversed(text.splitlines()[(0 if begin == start else 1):]):
+            if len(line.split()) >= 2:
+                return line
+        end = begin
+    return None
+
+
+def read_offset_ends(path, bounds=None):
+    """
+    range and azimuth pixel of the first and last offset of an offset text file (within pixel
+    bounds), as the first and last row of read_offsets or pd.read_csv. only the first and last
+    lines are read, so the common grid of a stack is known before any file is parsed.
+
+    Args:
+        path (str): offset text file
+        bounds (tuple, optional): (rng_min, rng_max, azi_min, azi_max) pixel bounds, see
+                                  roi_bounds. Defaults to None, whole file.
+
+    Returns:
+        (rng_first, rng_last, azi_first, azi_last): pixel positions of the first and last offset
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        if bounds is None:
+            ranges = [(0, size)]
+        else:
+            ranges = [(first, last) for first, last in _segments(f, size, bounds) if last > first]
+        lines = [] if len(ranges) == 0 else [_offset_line(f, *ranges[0]), _offset_line(f, *ranges[-1], reverse=True)]
+    if len(lines) == 0 or lines[0] is None:
+        raise ValueError(f"no offsets of {path} are in the pixel bounds {bounds}")
+    (rng_first, azi_first), (rng_last, azi_last) = [[int(float(v)) for v in line.split()[:2]] for line in lines]
+    return (rng_first, rng_last, azi_first, azi_last)
+
+
+def read_ccs(path, lines_ccs, width_ccs, rng_index, azi_index, dtype=np.float32, memmap=False):
+    """
+    reads a window of a CCS file (big-endian float32, lines_ccs x width_ccs) by seeking to its
+    first line, only the lines of the window are read
+
+    Args:
+        path (str): CCS file
+        lines_ccs (int): number of lines in the CCS file
+        width_ccs (int): width of the CCS file
+        rng_index (slice): range (column) index of the window
+        azi_index (slice): azimuth (line) index of the window
+        dtype (np.dtype, optional): data type of the window. Defaults to np.float32.
+        memmap (bool, optional): return a read-only memory map of the window instead of
+                                 reading it. Defaults to False.
+
+    Returns:
+        np.ndarray: (range, azimuth) window, transposed as MultiKernel.Ccs_maps
+    """
+    first, last, _ = azi_index.indices(lines_ccs)
+    n_lines = max(0, last - first)
+    itemsize = np.dtype(">f4").itemsize
+    if memmap:
+        window = np.memmap(path, dtype=">f4", mode="r", offset=first * width_ccs * itemsize, shape=(n_lines, width_ccs))
+        return np.transpose(window[:, rng_index])
+    window = np.fromfile(path, dtype=">f4", count=n_lines * width_ccs, offset=first * width_ccs * itemsize)
+    return np.transpose(np.reshape(window, (n_lines, width_ccs))[:, rng_index].astype(dtype))
@@ -0,0 +1,195 @@
+import mmap
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .singlekernel import SingleKernel
+
+# caches of a kernel that are rebuilt on access instead of being passed between processes
+_NOT_SHARED = ("Masked_views", "Vec_cache", "Neighbour_graphs")
+
+# number of kernels shared ahead of the running ones, so a free worker does not wait for the next kernel
+PREFETCH = 1
+
+
+def _share_kernel(obj, blocks):
+    """
+    describes the state of a SingleKernel object for a worker process. arrays that are
+    memory mapped from .npy files (see SingleKernel.to_memmap) are described by their file,
+    other arrays are copied to shared memory once, everything else is pickled.
+
+    Args:
+        obj (SingleKernel): kernel to share
+        blocks (list): list to which the created shared memory blocks are appended
+
+    Returns:
+        attrs: dict of attributes that are pickled
+        specs: dict of array descriptions (kind, location, offset, dtype, shape)
+    """
+    attrs = {}
+    specs = {}
+    for key, value in obj.__dict__.items():
+        if key in _NOT_SHARED:
+            continue
+        if not isinstance(value, np.ndarray) or value.dtype.hasobject or value.nbytes == 0:
+            attrs[key] = value
+        elif isinstance(value, np.memmap) and isinstance(value.base, mmap.mmap) and value.flags.c_contiguous:
+            specs[key] = ("memmap", value.filename, value.offset, value.dtype.str, value.shape)
+        else:
+            shm = shared_memory.SharedMemory(create=True, size=value.nbytes)
+            blocks.append(shm)
+            np.ndarray(value.shape, dtype=value.dtype, buffer=shm.buf)[...] = value
+            specs[key] = ("shm", shm.name, 0, value.dtype.str, value.shape)
+    return attrs, specs
+
+
+def _release(blocks):
+    """closes and removes shared memory blocks"""
+    for shm in blocks:
+        shm.close()
+        shm.unlink()
+
+
+def _copy_arrays(value):
+    """copies arrays (also inside tuples/lists) so they do not point into shared memory"""
+    if isinstance(value, np.ndarray):
+        return np.array(value)
+    if isinstance(value, (list, tuple)):
+        return type(value)(_copy_arrays(v) for v in value)
+    return value
+
+
+def _init_worker():
+    # parallelism comes from the processes, avoid oversubscription by numba threads
+    try:
+        import numba
+
+        numba.set_num_threads(1)
+    except (ImportError, ValueError):
+        pass
+
+
+def worker_pool(n_workers):
+    """
+    pool of worker processes for kernel or block tasks. workers are started with the 'spawn'
+    method: forking a process in which numba or other threaded libraries already started
+    threads can deadlock. each worker runs numba single threaded, the parallelism comes from
+    the processes. as with any spawned pool, scripts using it need an
+    if __name__ == '__main__': guard.
+
+    Args:
+        n_workers (int): number of worker processes
+
+    Returns:
+        ProcessPoolExecutor: pool to be used as a context manager
+    """
+    return ProcessPoolExecutor(
+        max_workers=n_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+    )
+
+
+def _run_shared_task(task, params, attrs, specs):
+    """runs task on a SingleKernel rebuilt from shared memory in a worker process"""
+    blocks = []
+    state = dict(attrs)
+    for key, (kind, location, offset, dtype, shape) in specs.items():
+        if kind == "memmap":
+            # copy-on-write, changes made by the task are not written to the file
+            state[key] = np.memmap(location, dtype=np.dtype(dtype), mode="c", offset=offset, shape=tuple(shape))
+        else:
+            shm = shared_memory.SharedMemory(name=location)
+            blocks.append(shm)
+            state[key] = np.ndarray(tuple(shape), dtype=np.dtype(dtype), buffer=shm.buf)
+    obj = SingleKernel.__new__(SingleKernel)
+    obj.__dict__.update(state)
+
+    start = time.perf_counter()
+    result = task(obj, **params)
+    seconds = time.perf_counter() - start
+
+    # only send back attributes that were added or replaced by the task
+    changed = {
+        key: _copy_arrays(value)
+        for key, value in obj.__dict__.items()
+        if key not in _NOT_SHARED and (key not in state or value is not state[key])
+    }
+    result = _copy_arrays(result)
+    del obj, state
+    for shm in blocks:
+        try:
+            shm.close()
+        except BufferError:
+            # a view is still referenced somewhere, the block is released when the worker exits
+            pass
+    return result, changed, seconds
+
+
+def run_kernel_tasks(jobs, n_workers=1):
+    """
+    runs independent tasks on the SingleKernel objects of a stack, sequentially or in a
+    pool of worker processes. the arrays of the kernels are passed to the workers through
+    shared memory (or as memory maps for kernels stored with SingleKernel.to_memmap)
+    instead of being pickled. attributes that a task adds to a kernel are copied back to
+    the original object, so both modes leave the stack in the same state.
+
+    jobs are submitted as workers become free: at most n_workers + PREFETCH kernels are
+    copied to shared memory at a time and the shared memory of a kernel is removed as soon
+    as its task is done, so the stack is never held twice in memory.
+
+    results are yielded to the calling process one at a time, so that the caller is the
+    only process writing output files (e.g. hdf5).
+
+    workers are started with the 'spawn' method (see worker_pool), scripts using
+    n_workers > 1 need an if __name__ == '__main__': guard.
+
+    Args:
+        jobs (list of tuples): (obj, task, params) with obj a SingleKernel, task a module level
+                               function called as task(obj, **params)
+        n_workers (int, optional): number of worker processes. Defaults to 1, run the tasks
+                                   in the calling process.
+
+    Yields:
+        i: index of the job
+        result: return value of the task
+        seconds: time spent in the task
+    """
+    if n_workers is None or n_workers <= 1 or len(jobs) <= 1:
+        for i, (obj, task, params) in enumerate(jobs):
+            start = time.perf_counter()
+            result = task(obj, **params)
+            yield i, result, time.perf_counter() - start
+        return
+
+    n_workers = min(n_workers, len(jobs))
+    # future -> (index of the job, shared memory blocks of its kernel)
+    pending = {}
+    try:
+        with worker_pool(n_workers) as pool:
+            next_job = 0
+            while next_job < len(jobs) or len(pending) > 0:
+                while next_job < len(jobs) and len(pending) < n_workers + PREFETCH:
+                    obj, task, params = jobs[next_job]
+                    blocks = []
+                    try:
+                        attrs, specs = _share_kernel(obj, blocks)
+                        future = pool.submit(_run_shared_task, task, params, attrs, specs)
+                    except BaseException:
+                        _release(blocks)
+                        raise
+                    pending[future] = (next_job, blocks)
+                    next_job += 1
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i, blocks = pending.pop(future)
+                    _release(blocks)
+                    result, changed, seconds = future.result()
+                    jobs[i][0].__dict__.update(changed)
+                    yield i, result, seconds
+    finally:
+        for _, blocks in pending.values():
+            _release(blocks)
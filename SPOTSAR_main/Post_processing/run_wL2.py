@@ -59,6 +59,8 @@ from joblib import Parallel, delayed
 
 from numba import jit
 
+from .fast_wL2 import fast_wL2
+
 @jit(nopython=True)
 def fast_haversine_distances(x, y):
     diff_lat = y[:, 0] - x[:, 0]
@@ -73,7 +75,7 @@ def fast_haversine_distances(x, y):
 def calculate_weighted_sum(idx, X_off_vec, Y_off_vec, Lat_off_vec, Lon_off_vec, R_idx_vec, A_idx_vec, Row_index_vec, Col_index_vec, A_win, R_win):
     power = 2
     q_vec = (X_off_vec[idx], Y_off_vec[idx])
-    q_pos = [[Lat_off_vec[idx], Lon_off_vec[idx]]]
+    q_pos = np.radians([[Lat_off_vec[idx], Lon_off_vec[idx]]])
     q_r_idx = int(R_idx_vec[idx])
     q_a_idx = int(A_idx_vec[idx])
 
@@ -82,7 +84,7 @@ def calculate_weighted_sum(idx, X_off_vec, Y_off_vec, Lat_off_vec, Lon_off_vec,
                                 (R_idx_vec != q_r_idx) & 
                                 (A_idx_vec != q_a_idx)))
 
-    if np.sum(region_filter)==0:
+    if np.size(region_filter[0])==0:
         return np.nan
 
     Q_region_r_idx = R_idx_vec[region_filter]
@@ -92,7 +94,7 @@ def calculate_weighted_sum(idx, X_off_vec, Y_off_vec, Lat_off_vec, Lon_off_vec,
     Dx = X_off_vec[region_filter]-q_vec[0]
     Dy = Y_off_vec[region_filter]-q_vec[1]
 
-    Q_latlon = np.column_stack((lons_Q_region,lats_Q_region))
+    Q_latlon = np.radians(np.column_stack((lats_Q_region,lons_Q_region)))
     dists = fast_haversine_distances(Q_latlon, q_pos)
     # dists = 2*np.arcsin(np.sqrt(np.sin((np.deg2rad(lats_Q_region)-np.deg2rad(q_pos[1]))/2)
     #                              + np.cos(np.deg2rad(lats_Q_region))*np.cos(np.deg2rad(q_pos[1]))
@@ -100,10 +102,27 @@ def calculate_weighted_sum(idx, X_off_vec, Y_off_vec, Lat_off_vec, Lon_off_vec,
 
     weights = 1/(dists**power)
     weights = weights/weights.sum()
-    weighted_sum = weights*(np.sqrt(Dx**2 + Dy**2))
+    weighted_sum = np.sum(weights*(np.sqrt(Dx**2 + Dy**2)))
     return weighted_sum/np.shape(dists)[0]
 
-def run_wL2(X_off,X_off_vec,Y_off_vec,Lat_off_vec,Lon_off_vec,R_idx_vec,A_idx_vec,Row_index_vec,Col_index_vec,A_win,R_win):
+def run_wL2(X_off,X_off_vec,Y_off_vec,Lat_off_vec,Lon_off_vec,R_idx_vec,A_idx_vec,Row_index_vec,Col_index_vec,A_win,R_win,method='numba'):
+    """
+    calculates the weighted L2 outlier score of every point, see fast_wL2
+
+    Args:
+        see fast_wL2, Lat_off_vec and Lon_off_vec in degrees
+        method (str, optional): 'numba' gathers neighbours from the grid around each point (O(N*k), parallel),
+                                'loop' compares each point with all other points (O(N**2)).
+                                Defaults to 'numba'.
+
+    Returns:
+        wL2: 2d map of the weighted L2 score
+    """
+    if method == 'numba':
+        return fast_wL2(X_off,X_off_vec,Y_off_vec,Lat_off_vec,Lon_off_vec,R_idx_vec,A_idx_vec,Row_index_vec,Col_index_vec,A_win,R_win)
+    if method != 'loop':
+        raise ValueError(f"method should be 'numba' or 'loop', not {method}")
+
     wL2 = np.full(np.shape(X_off), np.nan)
     # results = Parallel(n_jobs=-1)(delayed(calculate_weighted_sum)(idx, X_off_vec, Y_off_vec, Lat_off_vec, Lon_off_vec, R_idx_vec, A_idx_vec, Row_index_vec, Col_index_vec, A_win, R_win) for idx in range(np.shape(X_off_vec)[0]))
     # for idx, result in enumerate(results):
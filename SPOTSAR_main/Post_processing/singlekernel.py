@@ -12,6 +12,149 @@ from sklearn.metrics import pairwise_distances
 from scipy.ndimage import generic_filter
 from skimage.morphology import disk
 import h5py
+import os
+
+from .get_tiles import get_tiles
+from .fast_med_filt import fast_med_filt
+from .fast_wL2 import fast_wL2
+from .radius_graph import radius_graph
+from .lof_sweep import lof_sweep
+from .query_index import EARTH_RADIUS
+
+
+def _native(arr, dtype=None):
+    """
+    returns arr as native byte order array of dtype (the dtype of arr if None),
+    without copying if it already is
+    """
+    arr = np.asarray(arr)
+    dtype = arr.dtype if dtype is None else np.dtype(dtype)
+    return arr.astype(dtype.newbyteorder("="), copy=False)
+
+
+# map attributes that are read through the validity mask of a kernel
+MASKED_ATTRS = ("R_off", "A_off", "Ccp_off", "Ccs_off", "Lat_off", "Lon_off", "SNR", "X_off", "Y_off", "Mag", "Phase")
+# derived map attributes and the maps they are computed from
+DERIVED_ATTRS = {
+    "SNR": ("Ccp_off", "Ccs_off"),
+    "Mag": ("R_off", "A_off"),
+    "Phase": ("R_off", "A_off"),
+    "X_off": ("R_off", "A_off"),
+    "Y_off": ("R_off", "A_off"),
+}
+# result names of earlier versions and the name they are stored under in the result registry
+RESULT_ALIASES = {"LOF_outlier_score": "LOF_outlier_scores"}
+
+
+class _MaskedAttr:
+    """
+    map attribute of SingleKernel that is read through the validity mask.
+    assigned arrays are kept unchanged as <name>_raw, reading the attribute returns the raw
+    array with nan where a mask is active. the masked copy is made on first access and
+    reused until the masks change.
+    """
+
+    def __set_name__(self, owner, name):
+        self.name = name
+        self.raw = f"{name}_raw"
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        try:
+            raw = obj.__dict__[self.raw]
+        except KeyError:
+            raise AttributeError(f"'SingleKernel' object has no attribute '{self.name}'") from None
+        invalid = obj.get_invalid_mask()
+        if invalid is None:
+            return raw
+        views = obj._masked_views()
+        cached = views.get(self.name)
+        if cached is None or cached[0] is not raw:
+            cached = (raw, np.where(invalid, np.nan, raw))
+            views[self.name] = cached
+        return cached[1]
+
+    def __set__(self, obj, value):
+        obj.__dict__[self.raw] = value
+        obj.__dict__.get("Masked_views", {}).pop(self.name, None)
+        # derived maps are recomputed from the new data when they are used again
+        for name, depends in DERIVED_ATTRS.items():
+            if self.name in depends:
+                obj.__dict__.pop(f"{name}_raw", None)
+
+    def __delete__(self, obj):
+        del obj.__dict__[self.raw]
+        obj.__dict__.get("Masked_views", {}).pop(self.name, None)
+
+
+class _DerivedAttr(_MaskedAttr):
+    """
+    map attribute that is derived from other maps (see DERIVED_ATTRS). it is computed by
+    calling the method compute on first access, kept until one of the maps it depends on is
+    assigned, and read through the validity mask as the other map attributes.
+    """
+
+    def __init__(self, compute):
+        self.compute = compute
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        if self.raw not in obj.__dict__ and all(f"{dep}_raw" in obj.__dict__ for dep in DERIVED_ATTRS[self.name]):
+            getattr(obj, self.compute)()
+        return super().__get__(obj, objtype)
+
+
+class _VecAttr:
+    """
+    nan free vector of a map attribute: its values at the valid pixels (Valid_index, see rem_nans).
+    the vector is gathered from the unmasked map, so it keeps the pixels selected by
+    rem_nans/reset_vecs when masks are added afterwards. it is gathered on first access and
+    reused until Valid_index or the map is replaced.
+    """
+
+    def __init__(self, grid):
+        self.grid = grid
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        if "Valid_index" not in obj.__dict__:
+            raise AttributeError(f"'SingleKernel' object has no attribute '{self.name}', run rem_nans first")
+        raw = f"{self.grid}_raw"
+        if self.grid in DERIVED_ATTRS and raw not in obj.__dict__:
+            getattr(obj, getattr(objtype, self.grid).compute)()
+        grid = obj.__dict__.get(raw, obj.__dict__.get(self.grid))
+        if grid is None:
+            raise AttributeError(f"'SingleKernel' object has no attribute '{self.name}'")
+        # the vector does not depend on the masks, only on the valid pixels and the map
+        vecs = obj.__dict__.setdefault("Vec_cache", {})
+        cached = vecs.get(self.name)
+        if cached is None or cached[0] is not obj.Valid_index or cached[1] is not grid:
+            cached = (obj.Valid_index, grid, obj.grid_to_vec(grid))
+            vecs[self.name] = cached
+        return cached[2]
+
+
+class _IndexVecAttr:
+    """row (axis 0) or column (axis 1) index of the valid pixels, computed from Valid_index on access"""
+
+    def __init__(self, axis):
+        self.axis = axis
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        if "Valid_index" not in obj.__dict__:
+            raise AttributeError(f"'SingleKernel' object has no attribute '{self.name}', run rem_nans first")
+        return np.unravel_index(obj.Valid_index, np.shape(obj.R_off_raw))[self.axis]
 
 
 class SingleKernel:
@@ -54,6 +197,8 @@ class SingleKernel:
 
     Calculated Attributes:
     ----------------------
+    SNR, Mag, Phase, X_off and Y_off (and their _vec versions) are computed from the offsets on
+    first access and kept until the offsets (or ccp/ccs for SNR) are assigned again.
 
     SNR : np.array
         Signal to noise ratio defined as ccp_off/ccs_off
@@ -79,11 +224,49 @@ class SingleKernel:
         Represents labels given by HDBSCAN, used for outlier removal
     HDBSCAN_outlier_scores : np.array
         Represents the likelihood a point is an outlier.
+    Masks : dict
+        named boolean masks (True for invalid data) that together form the validity mask,
+        the map attributes are read through this mask while the raw data (<name>_raw) is kept unchanged
+    Disabled_masks : tuple
+        names of masks that are not applied
+    Valid_index : np.array
+        flat index of the valid pixels (see rem_nans), the *_vec attributes are the values of the
+        maps at these pixels and are gathered on access instead of being stored
+    Results : dict
+        result registry: results of analyses (HDBSCAN, LOF, median filter) stored once as values of
+        the valid pixels, read as <name>_vec or as map <name> (see set_result)
 
 
     """
 
-    def __init__(self, name, dates, win_size, heading, data):
+    R_off = _MaskedAttr()
+    A_off = _MaskedAttr()
+    Ccp_off = _MaskedAttr()
+    Ccs_off = _MaskedAttr()
+    Lat_off = _MaskedAttr()
+    Lon_off = _MaskedAttr()
+    SNR = _DerivedAttr("calc_SNR")
+    X_off = _DerivedAttr("rotate_with_heading")
+    Y_off = _DerivedAttr("rotate_with_heading")
+    Mag = _DerivedAttr("calc_Mag")
+    Phase = _DerivedAttr("calc_phase")
+    R_off_vec = _VecAttr("R_off")
+    A_off_vec = _VecAttr("A_off")
+    R_idx_vec = _VecAttr("R_idx")
+    A_idx_vec = _VecAttr("A_idx")
+    Ccp_off_vec = _VecAttr("Ccp_off")
+    Ccs_off_vec = _VecAttr("Ccs_off")
+    Lat_off_vec = _VecAttr("Lat_off")
+    Lon_off_vec = _VecAttr("Lon_off")
+    SNR_vec = _VecAttr("SNR")
+    X_off_vec = _VecAttr("X_off")
+    Y_off_vec = _VecAttr("Y_off")
+    Mag_vec = _VecAttr("Mag")
+    Phase_vec = _VecAttr("Phase")
+    Row_index_vec = _IndexVecAttr(0)
+    Col_index_vec = _IndexVecAttr(1)
+
+    def __init__(self, name, dates, win_size, heading, data, dtype=None):
         """
         initialise class
 
@@ -101,29 +284,49 @@ class SingleKernel:
             data[5] = latitude
             data[6] = longitude
             data[7] = cross-correlation standard deviation
+            dtype (str/np.dtype, optional): floating point type of the index, offset, ccp and ccs
+                                            maps (and the maps derived from them), latitude and
+                                            longitude are kept in float64. all maps are converted to
+                                            native byte order. Defaults to None, keep the dtype of the data.
         """
+        self.Masks = {}
+        self.Disabled_masks = ()
+        self.Mask_version = 0
+        self.Results = {}
         self.Name = name
         self.Date1 = dates[0]
         self.Date2 = dates[1]
         self.R_win = win_size[0]
         self.A_win = win_size[1]
-        self.R_idx = data[0]
-        self.A_idx = data[1]
-        self.R_off = data[2]
-        self.A_off = data[3]
-        self.Ccp_off = data[4]
-        self.Lat_off = data[5]
-        self.Lon_off = data[6]
-
-        data[7][data[7] == 0] = np.nan
-        self.Ccs_off = data[7]
+        self.R_idx = _native(data[0], dtype)
+        self.A_idx = _native(data[1], dtype)
+        self.R_off = _native(data[2], dtype)
+        self.A_off = _native(data[3], dtype)
+        self.Ccp_off = _native(data[4], dtype)
+        self.Lat_off = _native(data[5], None if dtype is None else np.float64)
+        self.Lon_off = _native(data[6], None if dtype is None else np.float64)
+
+        ccs_off = _native(data[7], dtype)
+        ccs_off[ccs_off == 0] = np.nan
+        self.Ccs_off = ccs_off
         self.Heading = heading
 
+    def is_computed(self, name):
+        """
+        Returns whether a derived map (SNR, Mag, Phase, X_off, Y_off) has been computed
+        (attribute access computes it when needed)
+        """
+        return f"{name}_raw" in self.__dict__
+
     def get_attr_list(self):
         """
         returns list of attribute keys of this object
         """
-        return self.__dict__.keys()
+        return [
+            key[: -len("_raw")] if key.endswith("_raw") and key[: -len("_raw")] in MASKED_ATTRS else key
+            for key in self.__dict__.keys()
+            if key not in ("Masked_views", "Vec_cache", "Neighbour_graphs")
+        ] + list(self.__dict__.get("Results", {}))
 
     def get_dates(self):
         """
@@ -153,66 +356,129 @@ class SingleKernel:
         """
         Returns Cross-correlation standard deviation
         """
-        self.SNR = np.divide(self.Ccp_off, self.Ccs_off)
+        self.SNR = np.divide(self.Ccp_off_raw, self.Ccs_off_raw)
         return self.SNR
 
     def calc_Mag(self):
         """
         Stores and returns magnitude of displacement in the slant-range azimuth plane
         """
-        self.Mag = np.hypot(self.R_off, self.A_off)
+        self.Mag = np.hypot(self.R_off_raw, self.A_off_raw)
         return self.Mag
 
+    def add_mask(self, name, mask, active=True):
+        """
+        adds (or replaces) a named mask to the validity mask of the kernel. the raw data is not
+        changed, the map attributes (R_off, A_off, ... see MASKED_ATTRS) read nan where any
+        active mask is True.
+
+        Args:
+            name (str): name of the mask, e.g. 'nan', 'median_7', 'HDBSCAN_50_10'
+            mask (np.ndarray): boolean mask, True for invalid data. a mask of the nan free data
+                               (same length as the *_vec attributes) is placed on the grid
+                               with vec_to_grid
+            active (bool, optional): apply the mask. Defaults to True.
+        """
+        mask = np.asarray(mask, dtype=bool)
+        arr_shape = np.shape(self.R_off_raw)
+        if mask.shape != arr_shape:
+            if mask.ndim == 1 and mask.size == np.size(self.__dict__.get("Valid_index", [])):
+                mask = self.vec_to_grid(mask, fill_value=False)
+            else:
+                mask = np.reshape(mask, arr_shape)
+        # new dict instead of updating in place, so run_kernel_tasks sees the change
+        self.Masks = {**getattr(self, "Masks", {}), name: mask}
+        self.set_mask_active(name, active)
+
+    def set_mask_active(self, name, active=True):
+        """
+        switches a named mask on or off without removing it (e.g. to compare detectors)
+
+        Args:
+            name (str): name of the mask
+            active (bool, optional): apply the mask. Defaults to True.
+        """
+        if name not in getattr(self, "Masks", {}):
+            raise KeyError(f"no mask named {name}, available masks: {list(getattr(self, 'Masks', {}))}")
+        disabled = set(getattr(self, "Disabled_masks", ())) - {name}
+        if not active:
+            disabled.add(name)
+        self.Disabled_masks = tuple(sorted(disabled))
+        self.Mask_version = getattr(self, "Mask_version", 0) + 1
+
+    def remove_mask(self, name):
+        """
+        removes a named mask from the validity mask
+        """
+        if name not in getattr(self, "Masks", {}):
+            raise KeyError(f"no mask named {name}, available masks: {list(getattr(self, 'Masks', {}))}")
+        self.Masks = {key: mask for key, mask in self.Masks.items() if key != name}
+        self.Disabled_masks = tuple(key for key in getattr(self, "Disabled_masks", ()) if key != name)
+        self.Mask_version = getattr(self, "Mask_version", 0) + 1
+
+    def get_active_masks(self):
+        """
+        Returns names of the masks that are applied
+        """
+        disabled = getattr(self, "Disabled_masks", ())
+        return [name for name in getattr(self, "Masks", {}) if name not in disabled]
+
+    def _masked_views(self):
+        """cache of the masked copies for the current masks"""
+        views = self.__dict__.setdefault("Masked_views", {})
+        version = getattr(self, "Mask_version", 0)
+        if views.get("version") != version:
+            views.clear()
+            views["version"] = version
+        return views
+
+    def get_invalid_mask(self):
+        """
+        Returns combined mask of all active masks (True for invalid data), None if no mask is active
+        """
+        views = self._masked_views()
+        if "invalid" not in views:
+            active = [self.Masks[name] for name in self.get_active_masks()]
+            if len(active) == 0:
+                views["invalid"] = None
+            elif len(active) == 1:
+                views["invalid"] = active[0]
+            else:
+                views["invalid"] = np.logical_or.reduce(active)
+        return views["invalid"]
+
+    def get_valid_mask(self):
+        """
+        Returns validity mask of the data, False where any active mask is True
+        """
+        invalid = self.get_invalid_mask()
+        if invalid is None:
+            return np.ones(np.shape(self.R_off_raw), dtype=bool)
+        return ~invalid
+
     def mask_nan_data(self):
         """
         creates a common nan mask from ccp and ccs (imported from different files)
-        and masks map data accordingly
+        and adds it as mask 'nan' to the validity mask
         """
-        arr_shape = np.shape(self.R_off)
+        arr_shape = np.shape(self.R_off_raw)
         nan_mask = (
-            np.isnan(self.Ccp_off) | np.isnan(self.Ccs_off) | np.isnan(self.Lat_off)
+            np.isnan(self.Ccp_off_raw) | np.isnan(self.Ccs_off_raw) | np.isnan(self.Lat_off_raw)
         )
-        self.A_off = np.reshape(np.where(nan_mask, np.nan, self.A_off), arr_shape)
-        self.R_off = np.reshape(np.where(nan_mask, np.nan, self.R_off), arr_shape)
-        self.Ccp_off = np.reshape(np.where(nan_mask, np.nan, self.Ccp_off), arr_shape)
-        self.Ccs_off = np.reshape(np.where(nan_mask, np.nan, self.Ccs_off), arr_shape)
-        self.Lat_off = np.reshape(np.where(nan_mask, np.nan, self.Lat_off), arr_shape)
-        self.Lon_off = np.reshape(np.where(nan_mask, np.nan, self.Lon_off), arr_shape)
         self.Nan_mask = np.reshape(nan_mask, arr_shape)
-        # add optional attributes
-        if hasattr(self, "SNR"):
-            self.SNR = np.reshape(np.where(nan_mask, np.nan, self.SNR), arr_shape)
-        if hasattr(self, "Mag"):
-            self.Mag = np.reshape(np.where(nan_mask, np.nan, self.Mag), arr_shape)
-        if hasattr(self, "X_off"):
-            self.X_off = np.reshape(np.where(nan_mask, np.nan, self.X_off), arr_shape)
-            self.Y_off = np.reshape(np.where(nan_mask, np.nan, self.Y_off), arr_shape)
-        if hasattr(self, "Phase"):
-            self.Phase = np.reshape(np.where(nan_mask, np.nan, self.Phase), arr_shape)
+        self.add_mask("nan", self.Nan_mask)
         return self.Nan_mask
 
     def rotate_with_heading(self):
         """
         calculates displacement in (quasi) E-W (x component) and (quasi) N-S (y component)
         """
-        self.R_off_vec = np.ravel(self.R_off)
-        self.A_off_vec = np.ravel(self.A_off)
-        rot_mat = np.array(
-            [
-                [np.cos(np.deg2rad(self.Heading)), -np.sin(np.deg2rad(self.Heading))],
-                [np.sin(np.deg2rad(self.Heading)), np.cos(np.deg2rad(self.Heading))],
-            ]
-        )
-
-        rot_vec = np.dot(np.column_stack((self.R_off_vec.T, self.A_off_vec.T)), rot_mat)
-
-        self.X_off_vec = rot_vec[:, 0]
-        self.Y_off_vec = rot_vec[:, 1]
-        self.Row_index, self.Col_index = np.indices(np.shape(self.R_idx))
-        self.X_off = np.full(np.shape(self.R_off), np.nan)
-        self.Y_off = np.full(np.shape(self.R_off), np.nan)
-        self.X_off[np.ravel(self.Row_index), np.ravel(self.Col_index)] = self.X_off_vec
-        self.Y_off[np.ravel(self.Row_index), np.ravel(self.Col_index)] = self.Y_off_vec
+        # scalars in the dtype of the offsets, so float32 offsets give float32 components
+        cos_h = self.R_off_raw.dtype.type(np.cos(np.deg2rad(self.Heading)))
+        sin_h = self.R_off_raw.dtype.type(np.sin(np.deg2rad(self.Heading)))
+        # [R A] . [[cos, -sin], [sin, cos]]
+        self.X_off = self.R_off_raw * cos_h + self.A_off_raw * sin_h
+        self.Y_off = -self.R_off_raw * sin_h + self.A_off_raw * cos_h
 
         return self.X_off, self.Y_off
 
@@ -223,66 +489,134 @@ class SingleKernel:
         +90 to offset 0 deg. from x axis to y axis
         +heading to rotate vectors to north=0
         """
-        self.Phase = np.degrees(-np.arctan2(self.A_off, self.R_off)) + 90 + self.Heading
-        self.Phase = np.where(self.Phase < 0, self.Phase + 360, self.Phase % 360)
+        phase = np.degrees(-np.arctan2(self.A_off_raw, self.R_off_raw)) + 90 + self.Heading
+        self.Phase = np.where(phase < 0, phase + 360, phase % 360)
 
         return self.Phase
 
     def rem_nans(self):
         """
-        returns nan free data and gives index off data in class instance.
-        """
-        self.Row_index, self.Col_index = np.indices(np.shape(self.R_idx))
-        self.Nan_mask_vec = np.ravel(self.Nan_mask)
-        self.A_off_vec = np.ravel(self.A_off)[~self.Nan_mask_vec]
-        self.R_off_vec = np.ravel(self.R_off)[~self.Nan_mask_vec]
-        self.A_idx_vec = np.ravel(self.A_idx)[~self.Nan_mask_vec]
-        self.R_idx_vec = np.ravel(self.R_idx)[~self.Nan_mask_vec]
-        self.Ccp_off_vec = np.ravel(self.Ccp_off)[~self.Nan_mask_vec]
-        self.Ccs_off_vec = np.ravel(self.Ccs_off)[~self.Nan_mask_vec]
-        self.Lon_off_vec = np.ravel(self.Lon_off)[~self.Nan_mask_vec]
-        self.Lat_off_vec = np.ravel(self.Lat_off)[~self.Nan_mask_vec]
-        self.Row_index_vec = np.ravel(self.Row_index)[~self.Nan_mask_vec]
-        self.Col_index_vec = np.ravel(self.Col_index)[~self.Nan_mask_vec]
-        # add optional attributes
-        if hasattr(self, "SNR"):
-            self.SNR_vec = np.ravel(self.SNR)[~self.Nan_mask_vec]
-        if hasattr(self, "Mag"):
-            self.Mag_vec = np.ravel(self.Mag)[~self.Nan_mask_vec]
-        if hasattr(self, "X_off"):
-            self.X_off_vec = np.ravel(self.X_off)[~self.Nan_mask_vec]
-            self.Y_off_vec = np.ravel(self.Y_off)[~self.Nan_mask_vec]
-        if hasattr(self, "Phase"):
-            self.Phase_vec = np.ravel(self.Phase)[~self.Nan_mask_vec]
+        selects the pixels outside Nan_mask as the valid pixels of the nan free data (*_vec attributes)
+        """
+        self.set_valid_index(~self.Nan_mask)
 
     def reset_vecs(self):
         """
-        returns nan free data and gives index off data in class instance.
-        """
-        self.Row_index, self.Col_index = np.indices(np.shape(self.R_idx))
-        self.Nan_mask_vec = np.ravel(self.Nan_mask)
-        self.Nan_mask_vec1 = np.ravel(np.isnan(self.A_off))
-        self.Nan_mask_comb = (self.Nan_mask_vec) | (self.Nan_mask_vec1)
-        self.A_off_vec = np.ravel(self.A_off)[~self.Nan_mask_comb]
-        self.R_off_vec = np.ravel(self.R_off)[~self.Nan_mask_comb]
-        self.A_idx_vec = np.ravel(self.A_idx)[~self.Nan_mask_comb]
-        self.R_idx_vec = np.ravel(self.R_idx)[~self.Nan_mask_comb]
-        self.Ccp_off_vec = np.ravel(self.Ccp_off)[~self.Nan_mask_comb]
-        self.Ccs_off_vec = np.ravel(self.Ccs_off)[~self.Nan_mask_comb]
-        self.Lon_off_vec = np.ravel(self.Lon_off)[~self.Nan_mask_comb]
-        self.Lat_off_vec = np.ravel(self.Lat_off)[~self.Nan_mask_comb]
-        self.Row_index_vec = np.ravel(self.Row_index)[~self.Nan_mask_comb]
-        self.Col_index_vec = np.ravel(self.Col_index)[~self.Nan_mask_comb]
-        # add optional attributes
-        if hasattr(self, "SNR"):
-            self.SNR_vec = np.ravel(self.SNR)[~self.Nan_mask_comb]
-        if hasattr(self, "Mag"):
-            self.Mag_vec = np.ravel(self.Mag)[~self.Nan_mask_comb]
-        if hasattr(self, "X_off"):
-            self.X_off_vec = np.ravel(self.X_off)[~self.Nan_mask_comb]
-            self.Y_off_vec = np.ravel(self.Y_off)[~self.Nan_mask_comb]
-        if hasattr(self, "Phase"):
-            self.Phase_vec = np.ravel(self.Phase)[~self.Nan_mask_comb]
+        selects the pixels outside Nan_mask that are not masked (nan in A_off) as the valid
+        pixels of the nan free data (*_vec attributes)
+        """
+        self.set_valid_index(~(self.Nan_mask | np.isnan(self.A_off)))
+
+    def set_valid_index(self, valid):
+        """
+        sets the valid pixels of the kernel. they are stored as one flat index into the maps
+        (Valid_index), the *_vec attributes are gathered from the maps with this index and
+        the results (see set_result) are moved to the new valid pixels.
+
+        Args:
+            valid (np.ndarray): boolean map, True for valid pixels
+        """
+        index = np.flatnonzero(valid)
+        if np.size(valid) <= np.iinfo(np.int32).max:
+            index = index.astype(np.int32)
+        old_index = self.__dict__.get("Valid_index")
+        results = self.__dict__.get("Results", {})
+        if len(results) > 0 and old_index is not None and not np.array_equal(old_index, index):
+            size = np.size(valid)
+            known = np.zeros(size, dtype=bool)
+            known[old_index] = True
+            # new pixels without a value are nan (integer labels then become float)
+            missing = not np.all(known[index])
+            moved = {}
+            for name, values in results.items():
+                if missing:
+                    full = np.full(size, np.nan, dtype=np.result_type(values, np.nan))
+                else:
+                    full = np.zeros(size, dtype=values.dtype)
+                full[old_index] = values
+                moved[name] = full[index]
+            self.Results = moved
+        self.Valid_index = index
+        self.__dict__.pop("Vec_cache", None)
+
+    def grid_to_vec(self, grid):
+        """
+        Returns the values of a map at the valid pixels (as the *_vec attributes)
+        """
+        return np.ravel(grid)[self.Valid_index]
+
+    def vec_to_grid(self, values, fill_value=np.nan):
+        """
+        places the values of the valid pixels on the grid of the kernel
+
+        Args:
+            values (np.ndarray): one value per valid pixel (as the *_vec attributes)
+            fill_value (optional): value of the other pixels. Defaults to np.nan.
+
+        Returns:
+            grid: map of the values
+        """
+        values = np.asarray(values)
+        grid = np.full(np.shape(self.R_off_raw), fill_value, dtype=np.result_type(values, fill_value))
+        grid.reshape(-1)[self.Valid_index] = values
+        return grid
+
+    def set_result(self, name, values):
+        """
+        adds (or replaces) an analysis result in the result registry (Results). a result is
+        stored once, as its values at the valid pixels in their own dtype (e.g. integer labels).
+        <name>_vec returns the values and <name> the map, made with vec_to_grid on access.
+
+        Args:
+            name (str): name of the result, e.g. 'HDBSCAN_labels_50_10'
+            values (np.ndarray): one value per valid pixel
+        """
+        values = np.asarray(values)
+        if values.shape != np.shape(self.Valid_index):
+            raise ValueError(
+                f"result {name} has shape {values.shape}, expected one value per valid pixel {np.shape(self.Valid_index)}"
+            )
+        # new dict instead of updating in place, so run_kernel_tasks sees the change
+        self.Results = {**self.__dict__.get("Results", {}), name: values}
+
+    def get_result(self, name, as_grid=False):
+        """
+        Returns the values of a result at the valid pixels, or its map if as_grid
+        """
+        results = self.__dict__.get("Results", {})
+        if name not in results:
+            raise KeyError(f"no result named {name}, available results: {list(results)}")
+        if as_grid:
+            return self.vec_to_grid(results[name])
+        return results[name]
+
+    def __getattr__(self, name):
+        # only called for attributes that are not found otherwise: results of the registry
+        results = self.__dict__.get("Results", {})
+        key = name[: -len("_vec")] if name.endswith("_vec") else name
+        prefix, _, suffix = key.rpartition("_")
+        if prefix in RESULT_ALIASES:
+            key = f"{RESULT_ALIASES[prefix]}_{suffix}"
+        if key in results:
+            if name.endswith("_vec"):
+                return results[key]
+            return self.vec_to_grid(results[key])
+        raise AttributeError(f"'SingleKernel' object has no attribute '{name}'")
+
+    @property
+    def Nan_mask_vec(self):
+        """Nan_mask as vector (view)"""
+        return np.ravel(self.Nan_mask)
+
+    @property
+    def Row_index(self):
+        """row index (axis 0) of every pixel"""
+        return np.indices(np.shape(self.R_off_raw))[0]
+
+    @property
+    def Col_index(self):
+        """column index (axis 1) of every pixel"""
+        return np.indices(np.shape(self.R_off_raw))[1]
 
     def get_Row_col_idx(self):
         """retrieve row and column index of 2d array data
@@ -337,85 +671,146 @@ class SingleKernel:
             "Col_index_vec",
         ]
         # add optional attributes
-        if hasattr(self, "SNR_vec"):
+        if self.is_computed("SNR"):
             data_to_return.append(self.SNR_vec)
             attr_list.append("SNR_vec")
 
-        if hasattr(self, "Mag_vec"):
+        if self.is_computed("Mag"):
             data_to_return.append(self.Mag_vec)
             attr_list.append("Mag_vec")
 
-        if hasattr(self, "X_off_vec"):
+        if self.is_computed("X_off"):
             data_to_return.append(self.X_off_vec)
             data_to_return.append(self.Y_off_vec)
             attr_list.append("X_off_vec")
             attr_list.append("Y_off_vec")
 
-        if hasattr(self, "Phase_vec"):
+        if self.is_computed("Phase"):
             data_to_return.append(self.Phase_vec)
             attr_list.append("Phase_vec")
 
         return data_to_return, attr_list
 
-    def comp_ll_dist_matrix(self):
+    def comp_ll_dist_matrix(self, radius=None, method="tree"):
         """
         Computes distance matrix from lat lon data.
-        it uses the haversine function to compute great circle distances accurately
-        can be very slow...
+        it uses the haversine function to compute great circle distances accurately.
+        the dense matrix (radius None) needs N x N memory and is very slow for many points,
+        with a radius only the distances within radius are kept (see neighbour_graph)
+
+        Args:
+            radius (float, optional): maximum distance in meters. Defaults to None, all distances.
+            method (str, optional): 'tree' or 'grid', see neighbour_graph. Defaults to "tree".
+
+        Returns:
+            Dist_mat: (N, N) distances in meters, scipy.sparse.csr_matrix if radius is given
         """
-        ll = np.column_stack((self.Lat_off_vec, self.Lon_off_vec))
-        self.Dist_mat = pairwise_distances(ll, ll, metric="haversine")
+        if radius is not None:
+            self.Dist_mat = self.neighbour_graph(radius, method=method)
+            return self.Dist_mat
+        ll = np.radians(np.column_stack((self.Lat_off_vec, self.Lon_off_vec)))
+        self.Dist_mat = pairwise_distances(ll, ll, metric="haversine") * EARTH_RADIUS
         return self.Dist_mat
+
+    def neighbour_graph(self, radius, method="tree", halo=None):
+        """
+        sparse graph of the great circle distances between the valid pixels within radius of
+        each other (see radius_graph), e.g. as precomputed input for DBSCAN, HDBSCAN or LOF.
+        graphs are kept per radius and method until the valid pixels or the coordinates change.
+
+        Args:
+            radius (float): maximum distance in meters
+            method (str, optional): 'tree' (ball tree of all pixels) or 'grid' (window of rows and
+                                    columns around each pixel). Defaults to "tree".
+            halo (tuple of int, optional): (rows, cols) searched by 'grid'. Defaults to None,
+                                           derived from radius.
+
+        Returns:
+            graph: (N, N) scipy.sparse.csr_matrix, distances in meters between valid pixels
+        """
+        geometry = (self.Valid_index, self.Lat_off_raw, self.Lon_off_raw)
+        graphs = self.__dict__.get("Neighbour_graphs")
+        if graphs is None or any(a is not b for a, b in zip(graphs["geometry"], geometry)):
+            graphs = {"geometry": geometry}
+            self.Neighbour_graphs = graphs
+        key = (method, float(radius), None if halo is None else tuple(halo))
+        if key not in graphs:
+            graphs[key] = radius_graph(
+                self.Lat_off_vec,
+                self.Lon_off_vec,
+                radius,
+                method=method,
+                rows=self.Row_index_vec if method == "grid" else None,
+                cols=self.Col_index_vec if method == "grid" else None,
+                halo=halo,
+            )
+        return graphs[key]
     
     def run_med_filt(
-        self, filt_radius, 
+        self, filt_radius, memory_budget=None, method="numba",
         ):
         """
         function to perform median filter
+
+        Args:
+            filt_radius (int): radius of the disk shaped filter footprint in pixels
+            memory_budget (int, optional): maximum number of bytes per tile, the maps are
+                                           filtered in row tiles with a halo of filt_radius.
+                                           Defaults to None, filter the whole map at once.
+            method (str, optional): 'numba' (default) for the compiled sorted-window filter
+                                    that filters R and A in one pass, 'generic_filter' for
+                                    scipy.ndimage.generic_filter with np.nanmedian.
         """
+        if method not in ["numba", "generic_filter"]:
+            raise ValueError(f"method must be either 'numba' or 'generic_filter', not {method}")
         footprint = disk(radius=filt_radius)
-        R_off_med = generic_filter(self.R_off, np.nanmedian, footprint=footprint)
-        A_off_med = generic_filter(self.A_off, np.nanmedian, footprint=footprint)
+        R_off_med = np.empty(np.shape(self.R_off), dtype=self.R_off.dtype)
+        A_off_med = np.empty(np.shape(self.A_off), dtype=self.A_off.dtype)
+        # input and filtered R and A per row
+        row_bytes = 4 * np.shape(self.R_off)[1] * R_off_med.itemsize
+        for read_start, read_stop, write_start, write_stop in get_tiles(
+            np.shape(self.R_off)[0], filt_radius, row_bytes, memory_budget
+        ):
+            valid = slice(write_start - read_start, write_stop - read_start)
+            if method == "numba":
+                R_tile_med, A_tile_med = fast_med_filt(
+                    self.R_off[read_start:read_stop], self.A_off[read_start:read_stop], filt_radius
+                )
+            else:
+                R_tile_med = generic_filter(
+                    self.R_off[read_start:read_stop], np.nanmedian, footprint=footprint
+                )
+                A_tile_med = generic_filter(
+                    self.A_off[read_start:read_stop], np.nanmedian, footprint=footprint
+                )
+            R_off_med[write_start:write_stop] = R_tile_med[valid]
+            A_off_med[write_start:write_stop] = A_tile_med[valid]
         R_off_med_diff = np.abs(self.R_off-R_off_med)
         A_off_med_diff = np.abs(self.A_off-A_off_med)
-        setattr(self,f'R_off_med_diff_{filt_radius}',R_off_med_diff)
-        setattr(self,f'A_off_med_diff_{filt_radius}',A_off_med_diff)
-        setattr(self,f'Mag_off_med_diff_{filt_radius}',np.hypot(R_off_med_diff, A_off_med_diff))
-        setattr(self,f'R_off_med_diff_{filt_radius}_vec',R_off_med_diff[self.Row_index_vec, self.Col_index_vec])
-        setattr(self,f'A_off_med_diff_{filt_radius}_vec',A_off_med_diff[self.Row_index_vec, self.Col_index_vec])
-        setattr(self,f'Mag_off_med_diff_{filt_radius}_vec',np.hypot(R_off_med_diff, A_off_med_diff)[self.Row_index_vec, self.Col_index_vec])
-        
-        return R_off_med_diff, A_off_med_diff, np.hypot(R_off_med_diff, A_off_med_diff)
+        R_off_med_diff_vec = self.grid_to_vec(R_off_med_diff)
+        A_off_med_diff_vec = self.grid_to_vec(A_off_med_diff)
+        self.set_result(f'R_off_med_diff_{filt_radius}',R_off_med_diff_vec)
+        self.set_result(f'A_off_med_diff_{filt_radius}',A_off_med_diff_vec)
+        self.set_result(f'Mag_off_med_diff_{filt_radius}',np.hypot(R_off_med_diff_vec, A_off_med_diff_vec))
+
+        return (getattr(self,f'R_off_med_diff_{filt_radius}'),
+                getattr(self,f'A_off_med_diff_{filt_radius}'),
+                getattr(self,f'Mag_off_med_diff_{filt_radius}'))
     
     def rem_outliers_median(self,filt_rad,cut_off_frac):
         """
         removes outliers found using median filter difference
+        (adds mask 'median_<filt_rad>' to the validity mask)
         """
-        arr_shape = np.shape(self.R_off)
         # nan_mask = self.HDBSCAN_labels == -1  # outliers are class -1
         max_data = np.nanmax(getattr(self,f'Mag_off_med_diff_{filt_rad}'))
         cut_off = (1-cut_off_frac)*max_data
 
         nan_mask = getattr(self,f'Mag_off_med_diff_{filt_rad}')>cut_off
         nan_mask_vec = getattr(self,f'Mag_off_med_diff_{filt_rad}_vec')>cut_off
-        self.A_off = np.reshape(np.where(nan_mask, np.nan, self.A_off), arr_shape)
-
-        self.R_off = np.reshape(np.where(nan_mask, np.nan, self.R_off), arr_shape)
-        self.Ccp_off = np.reshape(np.where(nan_mask, np.nan, self.Ccp_off), arr_shape)
-        self.Ccs_off = np.reshape(np.where(nan_mask, np.nan, self.Ccs_off), arr_shape)
-        self.Lat_off = np.reshape(np.where(nan_mask, np.nan, self.Lat_off), arr_shape)
-        self.Lon_off = np.reshape(np.where(nan_mask, np.nan, self.Lon_off), arr_shape)
-        # compute for optional attributes
-        if hasattr(self, "SNR"):
-            self.SNR = np.reshape(np.where(nan_mask, np.nan, self.SNR), arr_shape)
-        if hasattr(self, "X_off"):
-            self.X_off = np.reshape(np.where(nan_mask, np.nan, self.X_off), arr_shape)
-            self.Y_off = np.reshape(np.where(nan_mask, np.nan, self.Y_off), arr_shape)
-        if hasattr(self, "Mag"):
-            self.Mag = np.reshape(np.where(nan_mask, np.nan, self.Mag), arr_shape)
-        if hasattr(self, "Phase"):
-            self.Phase = np.reshape(np.where(nan_mask, np.nan, self.Phase), arr_shape)
-        self.Nan_mask2 = np.reshape(nan_mask, arr_shape)
+        mask_name = f"median_{filt_rad}"
+        self.add_mask(mask_name, nan_mask)
+        self.Nan_mask2 = self.Masks[mask_name]
         return nan_mask, nan_mask_vec
 
     def prep_DBSCAN(self, mode, plot_hist, n_bins):
@@ -559,24 +954,12 @@ class SingleKernel:
     def rem_outliers_DBSCAN(self):
         """
         removes outliers found using DBSCAN
+        (adds mask 'DBSCAN' to the validity mask)
         """
-        arr_shape = np.shape(self.R_off)
         nan_mask = self.DBSCAN_labels == -1  # outliers are class -1
-        self.A_off = np.reshape(np.where(nan_mask, np.nan, self.A_off), arr_shape)
-        self.R_off = np.reshape(np.where(nan_mask, np.nan, self.R_off), arr_shape)
-        self.Ccp_off = np.reshape(np.where(nan_mask, np.nan, self.Ccp_off), arr_shape)
-        self.Ccs_off = np.reshape(np.where(nan_mask, np.nan, self.Ccs_off), arr_shape)
-        self.Lat_off = np.reshape(np.where(nan_mask, np.nan, self.Lat_off), arr_shape)
-        self.Lon_off = np.reshape(np.where(nan_mask, np.nan, self.Lon_off), arr_shape)
-        # compute for optional attributes
-        if hasattr(self, "SNR"):
-            self.SNR = np.reshape(np.where(nan_mask, np.nan, self.SNR), arr_shape)
-        if hasattr(self, "X_off"):
-            self.X_off = np.reshape(np.where(nan_mask, np.nan, self.X_off), arr_shape)
-            self.Y_off = np.reshape(np.where(nan_mask, np.nan, self.Y_off), arr_shape)
-        if hasattr(self, "Phase"):
-            self.Phase = np.reshape(np.where(nan_mask, np.nan, self.Phase), arr_shape)
-        self.Nan_mask2 = np.reshape(nan_mask, arr_shape)
+        mask_name = "DBSCAN"
+        self.add_mask(mask_name, nan_mask)
+        self.Nan_mask2 = self.Masks[mask_name]
 
     def run_HDBSCAN(
         self, min_cluster_size, min_samples, single_cluster=False, cluster_selection_epsilon=0.0
@@ -593,28 +976,77 @@ class SingleKernel:
         # hdb = clf_hdb.fit(self.X_pca)
         hdb = clf_hdb.fit(self.X_pre)
         # self.soft_clusters_vec = hdbscan.all_points_membership_vectors(hdb)
-        HDBSCAN_labels_vec = hdb.labels_
-        HDBSCAN_outlier_scores_vec = hdb.outlier_scores_
-        HDBSCAN_probabilities_vec = hdb.probabilities_
-        setattr(self,f'HDBSCAN_labels_{min_cluster_size}_{min_samples}_vec',HDBSCAN_labels_vec)
-        setattr(self,f'HDBSCAN_outlier_scores_{min_cluster_size}_{min_samples}_vec',HDBSCAN_outlier_scores_vec)
-        setattr(self,f'HDBSCAN_probabilities_{min_cluster_size}_{min_samples}_vec',HDBSCAN_probabilities_vec)
-        HDBSCAN_labels = np.full(np.shape(self.R_off), np.nan)
-        HDBSCAN_outlier_scores = np.full(np.shape(self.R_off), np.nan)
-        HDBSCAN_probabilities = np.full(np.shape(self.R_off), np.nan)
-        HDBSCAN_labels[self.Row_index_vec, self.Col_index_vec] = hdb.labels_
-        HDBSCAN_outlier_scores[
-            self.Row_index_vec, self.Col_index_vec
-        ] = hdb.outlier_scores_
-        HDBSCAN_probabilities[
-            self.Row_index_vec, self.Col_index_vec
-        ] = hdb.probabilities_
-        setattr(self,f'HDBSCAN_labels_{min_cluster_size}_{min_samples}',HDBSCAN_labels)
-        setattr(self,f'HDBSCAN_outlier_scores_{min_cluster_size}_{min_samples}',HDBSCAN_outlier_scores)
-        setattr(self,f'HDBSCAN_probabilities_{min_cluster_size}_{min_samples}',HDBSCAN_probabilities)
-        
+        self.set_result(f'HDBSCAN_labels_{min_cluster_size}_{min_samples}',hdb.labels_)
+        self.set_result(f'HDBSCAN_outlier_scores_{min_cluster_size}_{min_samples}',hdb.outlier_scores_)
+        self.set_result(f'HDBSCAN_probabilities_{min_cluster_size}_{min_samples}',hdb.probabilities_)
+        HDBSCAN_labels = getattr(self,f'HDBSCAN_labels_{min_cluster_size}_{min_samples}')
+        HDBSCAN_outlier_scores = getattr(self,f'HDBSCAN_outlier_scores_{min_cluster_size}_{min_samples}')
+        HDBSCAN_probabilities = getattr(self,f'HDBSCAN_probabilities_{min_cluster_size}_{min_samples}')
+
         return HDBSCAN_labels, HDBSCAN_outlier_scores, HDBSCAN_probabilities
 
+    def run_HDBSCAN_sweep(
+        self, min_cluster_sizes, min_samples, single_cluster=False, cluster_selection_epsilon=0.0
+    ):
+        """
+        function to perform HDBSCAN (+ GLOSH) for several minimum cluster sizes with the same min_samples.
+        the single linkage tree of the mutual reachability distances only depends on min_samples,
+        so it is built once and the clusters of every minimum cluster size are extracted from it.
+        the results are the same as those of run_HDBSCAN for each minimum cluster size.
+        the extraction uses private hdbscan functions (checked against hdbscan 0.8.44), if an
+        hdbscan version does not have them, run_HDBSCAN is called per minimum cluster size.
+
+        Args:
+            min_cluster_sizes (list of int): minimum cluster sizes
+            min_samples (int): number of samples in a neighbourhood for a point to be a core point
+            single_cluster (bool, optional): allow a single cluster. Defaults to False.
+            cluster_selection_epsilon (float, optional): distance threshold for merging clusters. Defaults to 0.0.
+
+        Returns:
+            results: dict with (HDBSCAN_labels, HDBSCAN_outlier_scores, HDBSCAN_probabilities) per minimum cluster size
+        """
+        min_cluster_sizes = sorted(set(int(size) for size in min_cluster_sizes))
+        try:
+            from hdbscan.hdbscan_ import _tree_to_labels
+            from hdbscan._hdbscan_tree import outlier_scores
+        except ImportError:
+            return {
+                min_cluster_size: self.run_HDBSCAN(min_cluster_size, min_samples, single_cluster, cluster_selection_epsilon)
+                for min_cluster_size in min_cluster_sizes
+            }
+        clf_hdb = hdbscan.HDBSCAN(
+            min_cluster_size=min_cluster_sizes[0],
+            min_samples=min_samples,
+            allow_single_cluster=single_cluster,
+            cluster_selection_epsilon=cluster_selection_epsilon,
+        )
+        hdb = clf_hdb.fit(self.X_pre)
+        single_linkage_tree = hdb.single_linkage_tree_.to_numpy()
+        results = {}
+        for min_cluster_size in min_cluster_sizes:
+            if min_cluster_size == min_cluster_sizes[0]:
+                labels, probabilities, scores = hdb.labels_, hdb.probabilities_, hdb.outlier_scores_
+            else:
+                labels, probabilities, _, condensed_tree, _ = _tree_to_labels(
+                    self.X_pre,
+                    single_linkage_tree,
+                    min_cluster_size=min_cluster_size,
+                    cluster_selection_method="eom",
+                    allow_single_cluster=single_cluster,
+                    cluster_selection_epsilon=cluster_selection_epsilon,
+                )
+                scores = outlier_scores(condensed_tree)
+            self.set_result(f'HDBSCAN_labels_{min_cluster_size}_{min_samples}',labels)
+            self.set_result(f'HDBSCAN_outlier_scores_{min_cluster_size}_{min_samples}',scores)
+            self.set_result(f'HDBSCAN_probabilities_{min_cluster_size}_{min_samples}',probabilities)
+            results[min_cluster_size] = (
+                getattr(self,f'HDBSCAN_labels_{min_cluster_size}_{min_samples}'),
+                getattr(self,f'HDBSCAN_outlier_scores_{min_cluster_size}_{min_samples}'),
+                getattr(self,f'HDBSCAN_probabilities_{min_cluster_size}_{min_samples}'),
+            )
+
+        return results
+
 
     # def run_med_HDBSCAN(
     #     self, filt_rad,cut_off_frac, min_cluster_size, min_samples, single_cluster=False, cluster_selection_epsilon=0.0
@@ -664,53 +1096,24 @@ class SingleKernel:
     def rem_outliers_HDBSCAN(self,min_cluster_size,min_samples):
         """
         removes outliers found using HDBSCAN
+        (adds mask 'HDBSCAN_<min_cluster_size>_<min_samples>' to the validity mask)
         """
-        arr_shape = np.shape(self.R_off)
         # nan_mask = self.HDBSCAN_labels == -1  # outliers are class -1
-        nan_mask = getattr(self,f'HDBSCAN_{min_cluster_size}_{min_samples}')== -1
-        self.A_off = np.reshape(np.where(nan_mask, np.nan, self.A_off), arr_shape)
-        self.R_off = np.reshape(np.where(nan_mask, np.nan, self.R_off), arr_shape)
-        self.Ccp_off = np.reshape(np.where(nan_mask, np.nan, self.Ccp_off), arr_shape)
-        self.Ccs_off = np.reshape(np.where(nan_mask, np.nan, self.Ccs_off), arr_shape)
-        self.Lat_off = np.reshape(np.where(nan_mask, np.nan, self.Lat_off), arr_shape)
-        self.Lon_off = np.reshape(np.where(nan_mask, np.nan, self.Lon_off), arr_shape)
-        # compute for optional attributes
-        if hasattr(self, "SNR"):
-            self.SNR = np.reshape(np.where(nan_mask, np.nan, self.SNR), arr_shape)
-        if hasattr(self, "X_off"):
-            self.X_off = np.reshape(np.where(nan_mask, np.nan, self.X_off), arr_shape)
-            self.Y_off = np.reshape(np.where(nan_mask, np.nan, self.Y_off), arr_shape)
-        if hasattr(self, "Mag"):
-            self.Mag = np.reshape(np.where(nan_mask, np.nan, self.Mag), arr_shape)
-        if hasattr(self, "Phase"):
-            self.Phase = np.reshape(np.where(nan_mask, np.nan, self.Phase), arr_shape)
-        self.Nan_mask2 = np.reshape(nan_mask, arr_shape)
+        nan_mask = getattr(self,f'HDBSCAN_labels_{min_cluster_size}_{min_samples}')== -1
+        mask_name = f"HDBSCAN_{min_cluster_size}_{min_samples}"
+        self.add_mask(mask_name, nan_mask)
+        self.Nan_mask2 = self.Masks[mask_name]
 
     def rem_outliers_GLOSH(self,min_cluster_size,min_samples,cut_off):
         """
         removes outliers found using HDBSCAN
+        (adds mask 'GLOSH_<min_cluster_size>_<min_samples>' to the validity mask)
         """
-        arr_shape = np.shape(self.R_off)
         # nan_mask = self.HDBSCAN_labels == -1  # outliers are class -1
         nan_mask = getattr(self,f'HDBSCAN_outlier_scores_{min_cluster_size}_{min_samples}')>cut_off
-        self.A_off = np.reshape(np.where(nan_mask, np.nan, self.A_off), arr_shape)
-
-        self.R_off = np.reshape(np.where(nan_mask, np.nan, self.R_off), arr_shape)
-        self.Ccp_off = np.reshape(np.where(nan_mask, np.nan, self.Ccp_off), arr_shape)
-        self.Ccs_off = np.reshape(np.where(nan_mask, np.nan, self.Ccs_off), arr_shape)
-        self.Lat_off = np.reshape(np.where(nan_mask, np.nan, self.Lat_off), arr_shape)
-        self.Lon_off = np.reshape(np.where(nan_mask, np.nan, self.Lon_off), arr_shape)
-        # compute for optional attributes
-        if hasattr(self, "SNR"):
-            self.SNR = np.reshape(np.where(nan_mask, np.nan, self.SNR), arr_shape)
-        if hasattr(self, "X_off"):
-            self.X_off = np.reshape(np.where(nan_mask, np.nan, self.X_off), arr_shape)
-            self.Y_off = np.reshape(np.where(nan_mask, np.nan, self.Y_off), arr_shape)
-        if hasattr(self, "Mag"):
-            self.Mag = np.reshape(np.where(nan_mask, np.nan, self.Mag), arr_shape)
-        if hasattr(self, "Phase"):
-            self.Phase = np.reshape(np.where(nan_mask, np.nan, self.Phase), arr_shape)
-        self.Nan_mask2 = np.reshape(nan_mask, arr_shape)
+        mask_name = f"GLOSH_{min_cluster_size}_{min_samples}"
+        self.add_mask(mask_name, nan_mask)
+        self.Nan_mask2 = self.Masks[mask_name]
 
     def run_LOF(
         self, n_neighbors=20, algorithm="auto", leaf_size=30, contamination="auto"
@@ -732,31 +1135,68 @@ class SingleKernel:
             leaf_size=leaf_size,
             contamination=contamination,
         )
-        LOF_labels_vec = clf.fit_predict(self.X)
-        LOF_outlier_score_vec = clf.negative_outlier_factor_
-        setattr(self,f'LOF_labels_{n_neighbors}_vec',LOF_labels_vec)
-        setattr(self,f'LOF_outlier_score_{n_neighbors}_vec',LOF_outlier_score_vec)
-        
-        LOF_labels = np.full(np.shape(self.R_off), np.nan)
-        LOF_outlier_scores = np.full(np.shape(self.R_off), np.nan)
-        LOF_labels[self.Row_index_vec, self.Col_index_vec] = clf.fit_predict(
-            self.X
-        )
-        LOF_outlier_scores[
-            self.Row_index_vec, self.Col_index_vec
-        ] = clf.negative_outlier_factor_
-        setattr(self,f'LOF_labels_{n_neighbors}',LOF_labels)
-        setattr(self,f'LOF_outlier_scores_{n_neighbors}',LOF_outlier_scores)
+        self.set_result(f'LOF_labels_{n_neighbors}',clf.fit_predict(self.X))
+        # (also read as LOF_outlier_score_<n_neighbors>_vec, see RESULT_ALIASES)
+        self.set_result(f'LOF_outlier_scores_{n_neighbors}',clf.negative_outlier_factor_)
+        LOF_labels = getattr(self,f'LOF_labels_{n_neighbors}')
+        LOF_outlier_scores = getattr(self,f'LOF_outlier_scores_{n_neighbors}')
 
         return LOF_labels, LOF_outlier_scores
 
+    def run_LOF_sweep(
+        self, n_neighbors_list, algorithm="auto", leaf_size=30, contamination="auto"
+    ):
+        """Runs local outlier factor outlier detection for several numbers of neighbours with one
+        nearest neighbour search at the largest number of neighbours (see lof_sweep).
+        the results are the same as those of run_LOF for each number of neighbours.
+
+        Args:
+            n_neighbors_list (list of int): numbers of neighbors to use in kneighbors queries
+            algorithm (str, optional): algorithm for nearest neighbor calculations. Defaults to 'auto'. other options are ball_tree, kd_tree, and brute
+            leaf_size (int, optional): leaf size used for ball-tree and KD-tree. Defaults to 30.
+            contamination (str|float, optional): level of contamination [0-0.5]. Defaults to 'auto'.
+
+        Returns:
+            results: dict with (LOF_labels, LOF_outlier_scores) maps per number of neighbours
+        """
+        results = {}
+        for n_neighbors, (labels, scores) in lof_sweep(
+            self.X, n_neighbors_list, algorithm=algorithm, leaf_size=leaf_size, contamination=contamination
+        ).items():
+            self.set_result(f'LOF_labels_{n_neighbors}',labels)
+            self.set_result(f'LOF_outlier_scores_{n_neighbors}',scores)
+            results[n_neighbors] = (getattr(self,f'LOF_labels_{n_neighbors}'),
+                                    getattr(self,f'LOF_outlier_scores_{n_neighbors}'))
+        return results
+
+    def rem_outliers_LOF(self,n_neighbors):
+        """
+        removes outliers found using LOF
+        (adds mask 'LOF_<n_neighbors>' to the validity mask)
+        """
+        nan_mask = getattr(self,f'LOF_labels_{n_neighbors}')== -1
+        mask_name = f"LOF_{n_neighbors}"
+        self.add_mask(mask_name, nan_mask)
+        self.Nan_mask2 = self.Masks[mask_name]
+
     # @vectorize(['float64(float64,float64)'])
-    def calc_local_L2(self):
+    def calc_local_L2(self, method="numba"):
         """calculates local outlier disimilarity score
 
+        Args:
+            method (str, optional): 'numba' gathers the neighbours of each point from the grid
+                                    around it in parallel (see fast_wL2),
+                                    'loop' compares each point with all other points.
+                                    Defaults to "numba".
+
         Returns:
-            _type_: _description_
+            wL2: 2d map of the weighted L2 score
         """
+        if method == "numba":
+            self.wL2 = fast_wL2(*self.get_data_4_wL2())
+            return self.wL2
+        if method != "loop":
+            raise ValueError(f"method should be 'numba' or 'loop', not {method}")
 
         def slow_haversine_distances(x, y):
             diff_lat = y[:, 0] - x[0]
@@ -814,7 +1254,7 @@ class SingleKernel:
                     & (A_idx_vec != q_a_idx)
                 )
 
-                if np.sum(region_filter) == 0:
+                if np.size(region_filter[0]) == 0:
                     continue
                 Q_region_r_idx = R_idx_vec[region_filter]
                 Q_region_a_idx = A_idx_vec[region_filter]
@@ -826,7 +1266,7 @@ class SingleKernel:
                 Dy = Y_off_vec[region_filter] - q_vec[1]
 
                 Q_latlon = np.column_stack((lats_Q_region, lons_Q_region))
-                dists = haversine_distances(Q_latlon, q_pos)
+                dists = haversine_distances(Q_latlon, q_pos)[:, 0]
 
                 weights = 1 / (dists**power)
                 weights = weights / np.sum(weights)
@@ -878,6 +1318,22 @@ class SingleKernel:
                 f.create_dataset(qkey, data = q_attr)
         f.close()
 
+    def to_memmap(self, directory):
+        """moves all array attributes to .npy files and replaces them by memory maps,
+        so that the data of this kernel is kept on disk instead of in memory.
+        arrays that are recomputed afterwards are in memory again, call this method
+        again to move them to disk.
+
+        Args:
+            directory (str): directory to store the .npy files in (one file per attribute)
+        """
+        os.makedirs(directory, exist_ok=True)
+        for key, value in list(self.__dict__.items()):
+            if isinstance(value, np.ndarray) and not isinstance(value, np.memmap) and value.ndim > 0:
+                filename = os.path.join(directory, f'{key}.npy')
+                np.save(filename, value)
+                setattr(self, key, np.load(filename, mmap_mode='r+'))
+
     def from_hdf5(self,filename,query_keys):
         """reads data from hdf5 file and stores as object attributes to singlekernel object
 
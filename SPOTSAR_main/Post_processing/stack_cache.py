@@ -0,0 +1,232 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# file layout: magic | header length (uint64, little endian) | json header | arrays
+# every array starts at a multiple of ALIGN bytes so it can be memory mapped as is
+MAGIC = b"SPOTSARC"
+VERSION = 4
+ALIGN = 64
+
+
+def source_fingerprint(paths, hash_sources=False):
+    """returns size, modification time and optionally sha1 hash of source files
+
+    Args:
+        paths (list of str): paths of the source files (offsets, ccs, lat, lon)
+        hash_sources (bool, optional): also compute the sha1 hash of the file content.
+                                       Defaults to False.
+
+    Returns:
+        sources: list of dicts with the fingerprint of each file
+    """
+    sources = []
+    for path in paths:
+        stat = os.stat(path)
+        source = {"path": os.path.abspath(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        if hash_sources:
+            sha1 = hashlib.sha1()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(2**20), b""):
+                    sha1.update(block)
+            source["sha1"] = sha1.hexdigest()
+        sources.append(source)
+    return sources
+
+
+def sources_changed(sources):
+    """checks if any of the fingerprinted source files is missing or changed.
+    files with a stored hash are compared by content, others by size and modification time.
+
+    Args:
+        sources (list of dicts): fingerprints as returned by source_fingerprint
+
+    Returns:
+        changed: list of paths that are missing or changed
+    """
+    changed = []
+    for source in sources:
+        path = source["path"]
+        if not os.path.exists(path):
+            changed.append(path)
+            continue
+        current = source_fingerprint([path], hash_sources="sha1" in source)[0]
+        if current["size"] != source["size"]:
+            changed.append(path)
+        elif "sha1" in source:
+            if current["sha1"] != source["sha1"]:
+                changed.append(path)
+        elif current["mtime_ns"] != source["mtime_ns"]:
+            changed.append(path)
+    return changed
+
+
+def _params_to_json(params):
+    """json form of build parameters (numpy scalars as python numbers, tuples as lists)"""
+    return json.loads(json.dumps(params, default=lambda value: value.item()))
+
+
+def params_changed(stored, params):
+    """compares the build parameters stored in a cache header with the requested ones
+
+    Args:
+        stored (dict): parameters stored by write_stack_cache (None for a cache without parameters)
+        params (dict): requested build parameters
+
+    Returns:
+        changed: sorted list of the names of the parameters that differ
+    """
+    stored = {} if stored is None else stored
+    params = _params_to_json(params)
+    return sorted(key for key in set(stored) | set(params) if stored.get(key) != params.get(key))
+
+
+def _to_json(value):
+    """converts attribute values to json types, returns None for values that can not be stored"""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return {"value": value}
+    if isinstance(value, (list, tuple)):
+        items = [_to_json(v) for v in value]
+        if any(item is None for item in items):
+            return None
+        return {"value": [item["value"] for item in items], "tuple": isinstance(value, tuple)}
+    return None
+
+
+def _split_state(obj, exclude=()):
+    """splits the attributes of an object into json-able metadata and numpy arrays"""
+    attrs = {}
+    arrays = {}
+    for key, value in obj.__dict__.items():
+        if key in exclude:
+            continue
+        if isinstance(value, np.ndarray):
+            if value.dtype.hasobject:
+                continue
+            arrays[key] = value
+        elif isinstance(value, dict) and len(value) > 0 and all(isinstance(v, np.ndarray) for v in value.values()):
+            # dicts of arrays (e.g. SingleKernel.Masks, SingleKernel.Results) are stored as <key>/<name>
+            for name, arr in value.items():
+                arrays[f"{key}/{name}"] = arr
+        else:
+            item = _to_json(value)
+            if item is not None:
+                attrs[key] = item
+    return attrs, arrays
+
+
+def _restore_attrs(attrs):
+    restored = {}
+    for key, item in attrs.items():
+        value = item["value"]
+        if item.get("tuple", False):
+            value = tuple(value)
+        restored[key] = value
+    return restored
+
+
+def write_stack_cache(cache_file, stack_obj, sources, exclude=(), params=None):
+    """writes the metadata and arrays of a MultiKernel object and all SingleKernel objects
+    in its Stack to a single binary cache file
+
+    Args:
+        cache_file (str): path of the cache file
+        stack_obj (MultiKernel): stack to store
+        sources (list of dicts): fingerprints of the source files, see source_fingerprint
+        exclude (list of str, optional): MultiKernel attributes that are not stored
+        params (dict, optional): parameters the stack was built with (steps, starts, dtype, region),
+                                 see params_changed
+    """
+    states = [_split_state(stack_obj, exclude=tuple(exclude) + ("Stack",))]
+    states += [_split_state(obj) for obj in stack_obj.Stack]
+
+    # layout of the array section
+    offset = 0
+    entries = []
+    for attrs, arrays in states:
+        layout = {}
+        for key, arr in arrays.items():
+            offset = -(-offset // ALIGN) * ALIGN
+            layout[key] = {"dtype": arr.dtype.str, "shape": list(arr.shape), "offset": offset}
+            offset += arr.nbytes
+        entries.append({"attrs": attrs, "arrays": layout})
+
+    header = {
+        "version": VERSION,
+        "sources": sources,
+        "params": None if params is None else _params_to_json(params),
+        "stack": entries[0],
+        "kernels": entries[1:],
+    }
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = -(-(len(MAGIC) + 8 + len(header_bytes)) // ALIGN) * ALIGN
+
+    # write to temporary file first so an interrupted write never leaves a valid looking cache
+    tmp_file = cache_file + ".tmp"
+    with open(tmp_file, "wb") as f:
+        f.write(MAGIC)
+        f.write(np.uint64(len(header_bytes)).astype("<u8").tobytes())
+        f.write(header_bytes)
+        for (attrs, arrays), entry in zip(states, entries):
+            for key, arr in arrays.items():
+                f.seek(data_start + entry["arrays"][key]["offset"])
+                np.ascontiguousarray(arr).tofile(f)
+    os.replace(tmp_file, cache_file)
+
+
+def read_stack_header(cache_file):
+    """reads the json header of a cache file
+
+    Returns:
+        header (dict): header of the cache file
+        data_start (int): byte offset of the array section
+    """
+    with open(cache_file, "rb") as f:
+        magic = f.read(len(MAGIC))
+        if magic != MAGIC:
+            raise ValueError(f"{cache_file} is not a SPOTSAR stack cache file")
+        header_len = int(np.frombuffer(f.read(8), dtype="<u8")[0])
+        header = json.loads(f.read(header_len).decode("utf-8"))
+    data_start = -(-(len(MAGIC) + 8 + header_len) // ALIGN) * ALIGN
+    return header, data_start
+
+
+def read_stack_cache(cache_file):
+    """memory maps a cache file written by write_stack_cache. arrays are copy-on-write
+    views of the file: reading does not copy the data and changes are not written back.
+
+    Returns:
+        header (dict): header of the cache file
+        stack_state (dict): attributes of the MultiKernel object
+        kernel_states (list of dicts): attributes of each SingleKernel object
+    """
+    header, data_start = read_stack_header(cache_file)
+    if header["version"] != VERSION:
+        raise ValueError(f"cache version {header['version']} is not supported")
+
+    buffer = np.memmap(cache_file, dtype=np.uint8, mode="c")
+
+    def restore(entry):
+        state = _restore_attrs(entry["attrs"])
+        for key, layout in entry["arrays"].items():
+            if 0 in layout["shape"]:
+                arr = np.empty(tuple(layout["shape"]), dtype=np.dtype(layout["dtype"]))
+            else:
+                arr = np.ndarray(
+                    tuple(layout["shape"]),
+                    dtype=np.dtype(layout["dtype"]),
+                    buffer=buffer,
+                    offset=data_start + layout["offset"],
+                )
+            if "/" in key:
+                key, name = key.split("/", 1)
+                state.setdefault(key, {})[name] = arr
+            else:
+                state[key] = arr
+        return state
+
+    return header, restore(header["stack"]), [restore(entry) for entry in header["kernels"]]
@@ -0,0 +1,248 @@
+import numpy as np
+
+# default number of bytes of the window tensor of one block of rows (trimmed windows)
+DEFAULT_MEMORY_BUDGET = 2**28
+
+
+def box_sum(arr, window_size):
+    """
+    sums of all window_size x window_size windows over the last two axes, computed
+    from cumulative sums (summed-area table) along each axis in turn
+
+    Args:
+        arr (np.ndarray): (..., rows, cols) array without nan
+        window_size (int): window dimension
+
+    Returns:
+        sums: (..., rows - window_size + 1, cols - window_size + 1) window sums
+    """
+    w = window_size
+    c = np.cumsum(arr, axis=-2)
+    c = np.concatenate((np.zeros_like(c[..., :1, :]), c), axis=-2)
+    rows = c[..., w:, :] - c[..., :-w, :]
+    c = np.cumsum(rows, axis=-1)
+    c = np.concatenate((np.zeros_like(c[..., :1]), c), axis=-1)
+    return c[..., w:] - c[..., :-w]
+
+
+def window_percentile(sorted_vals, counts, q):
+    """
+    linear percentile (as np.nanpercentile) along the last axis of values sorted with nan last
+
+    Args:
+        sorted_vals (np.ndarray): (..., n) values sorted along the last axis, nan at the end
+        counts (np.ndarray): (...) number of non nan values
+        q (float): percentile [0-100]
+
+    Returns:
+        percentile: (...) percentile, nan where counts is 0
+    """
+    virtual_idx = np.maximum(counts - 1, 0) * (q / 100)
+    lo = np.floor(virtual_idx).astype(np.int64)
+    hi = np.minimum(lo + 1, np.maximum(counts - 1, 0))
+    t = virtual_idx - lo
+    a = np.take_along_axis(sorted_vals, lo[..., np.newaxis], axis=-1)[..., 0]
+    b = np.take_along_axis(sorted_vals, hi[..., np.newaxis], axis=-1)[..., 0]
+    diff = b - a
+    result = np.where(t >= 0.5, b - diff * (1 - t), a + diff * t)
+    return np.where(counts > 0, result, np.nan)
+
+
+def plane_moments(values, x, y, valid, axis):
+    """
+    number of points, means and centered second moments of windowed data, the input for
+    solve_plane
+
+    Args:
+        values (np.ndarray): data, broadcastable with x and y
+        x, y (np.ndarray): coordinates of the data
+        valid (np.ndarray): boolean mask of the points that are used
+        axis (int or tuple): axes that hold the points of a window
+
+    Returns:
+        moments: dict with n, mean_x, mean_y, mean_v, s_xx, s_yy, s_xy, s_xv, s_yv, s_vv
+    """
+    values, x, y, valid = np.broadcast_arrays(values, x, y, valid)
+    n = np.sum(valid, axis=axis)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = [np.sum(np.where(valid, d, 0), axis=axis, keepdims=True) / np.sum(valid, axis=axis, keepdims=True)
+                 for d in (x, y, values)]
+    dx, dy, dv = [np.where(valid, d - m, 0) for d, m in zip((x, y, values), means)]
+    return {
+        "n": n,
+        "mean_x": np.squeeze(means[0], axis=axis),
+        "mean_y": np.squeeze(means[1], axis=axis),
+        "mean_v": np.squeeze(means[2], axis=axis),
+        "s_xx": np.sum(dx * dx, axis=axis),
+        "s_yy": np.sum(dy * dy, axis=axis),
+        "s_xy": np.sum(dx * dy, axis=axis),
+        "s_xv": np.sum(dx * dv, axis=axis),
+        "s_yv": np.sum(dy * dv, axis=axis),
+        "s_vv": np.sum(dv * dv, axis=axis),
+    }
+
+
+def box_moments(values, x, y, valid, window_size):
+    """
+    moments of all window_size x window_size windows over the last two axes from summed-area
+    tables, same output as plane_moments on the window views but independent of the window size
+
+    Args:
+        values (np.ndarray): (..., rows, cols) data, broadcastable with x and y
+        x, y (np.ndarray): coordinates of the data
+        valid (np.ndarray): boolean mask of the points that are used
+        window_size (int): window dimension
+
+    Returns:
+        moments: dict with n, mean_x, mean_y, mean_v, s_xx, s_yy, s_xy, s_xv, s_yv, s_vv
+    """
+    values, x, y, valid = np.broadcast_arrays(values, x, y, valid)
+    # subtract the mean of each map first, so the sums of squares do not lose precision
+    ref = []
+    for d in (x, y, values):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            m = np.sum(np.where(valid, d, 0), axis=(-2, -1), keepdims=True) / np.sum(
+                valid, axis=(-2, -1), keepdims=True
+            )
+        ref.append(np.where(np.isfinite(m), m, 0))
+    dx, dy, dv = [np.where(valid, d - m, 0) for d, m in zip((x, y, values), ref)]
+    n = box_sum(valid.astype(np.float64), window_size)
+    s = {key: box_sum(d, window_size) for key, d in
+         (("x", dx), ("y", dy), ("v", dv), ("xx", dx * dx), ("yy", dy * dy), ("xy", dx * dy),
+          ("xv", dx * dv), ("yv", dy * dv), ("vv", dv * dv))}
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mx, my, mv = s["x"] / n, s["y"] / n, s["v"] / n
+    return {
+        "n": np.rint(n).astype(np.int64),
+        "mean_x": mx + ref[0],
+        "mean_y": my + ref[1],
+        "mean_v": mv + ref[2],
+        "s_xx": np.where(n > 0, s["xx"] - s["x"] * mx, 0),
+        "s_yy": np.where(n > 0, s["yy"] - s["y"] * my, 0),
+        "s_xy": np.where(n > 0, s["xy"] - s["x"] * my, 0),
+        "s_xv": np.where(n > 0, s["xv"] - s["x"] * mv, 0),
+        "s_yv": np.where(n > 0, s["yv"] - s["y"] * mv, 0),
+        "s_vv": np.where(n > 0, s["vv"] - s["v"] * mv, 0),
+    }
+
+
+def solve_plane(moments, deplane=True, min_count=1):
+    """
+    least squares planes v = a*x + b*y + c of many windows at once from their moments.
+    (nearly) collinear windows get the minimum norm solution, as LinearRegression.
+
+    Args:
+        moments (dict): output of plane_moments or box_moments
+        deplane (bool, optional): fit a plane, otherwise only the mean is removed. Defaults to True.
+        min_count (int, optional): minimum number of points of a window, windows with fewer
+                                   points get nan. Defaults to 1.
+
+    Returns:
+        coef: (..., 3) a, b and c of every window
+        variance: residual variance (residual sum of squares / n) of every window
+    """
+    n = moments["n"]
+    s_xx, s_yy, s_xy = moments["s_xx"], moments["s_yy"], moments["s_xy"]
+    s_xv, s_yv, s_vv = moments["s_xv"], moments["s_yv"], moments["s_vv"]
+    a = np.zeros(np.shape(n))
+    b = np.zeros(np.shape(n))
+    if deplane:
+        det = s_xx * s_yy - s_xy**2
+        regular = det > 1e-12 * np.maximum(s_xx * s_yy, np.finfo(float).tiny)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            a = np.where(regular, (s_yy * s_xv - s_xy * s_yv) / det, 0)
+            b = np.where(regular, (s_xx * s_yv - s_xy * s_xv) / det, 0)
+        singular = ~regular & (n > 0)
+        if np.any(singular):
+            S = np.stack((np.stack((s_xx[singular], s_xy[singular]), axis=-1),
+                          np.stack((s_xy[singular], s_yy[singular]), axis=-1)), axis=-2)
+            coef = np.einsum("...ij,...j->...i", np.linalg.pinv(S), np.stack((s_xv[singular], s_yv[singular]), axis=-1))
+            a[singular] = coef[..., 0]
+            b[singular] = coef[..., 1]
+    rss = s_vv - 2 * (a * s_xv + b * s_yv) + a * a * s_xx + 2 * a * b * s_xy + b * b * s_yy
+    enough = (n >= min_count) & (n > 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        variance = np.where(enough, np.maximum(rss, 0) / n, np.nan)
+    c = moments["mean_v"] - a * moments["mean_x"] - b * moments["mean_y"]
+    coef = np.stack((a, b, c), axis=-1)
+    coef[~enough] = np.nan
+    return coef, variance
+
+
+def trim_mask(windows, trim, axis=-1):
+    """
+    marks values of each window outside its [trim[0], trim[1]] percentile interval (nan ignored)
+
+    Args:
+        windows (np.ndarray): windowed data, the points of a window along axis
+        trim (tuple): lower and upper percentile
+        axis (int, optional): axis with the points of a window. Defaults to -1.
+
+    Returns:
+        outside: boolean mask, True outside the interval
+    """
+    w = np.moveaxis(windows, axis, -1)
+    counts = np.sum(~np.isnan(w), axis=-1)
+    sorted_w = np.sort(w, axis=-1)
+    lo = window_percentile(sorted_w, counts, trim[0])[..., np.newaxis]
+    hi = window_percentile(sorted_w, counts, trim[1])[..., np.newaxis]
+    return np.moveaxis((w < lo) | (w > hi), -1, axis)
+
+
+def window_plane_fit(values, x, y, window_size, trim=None, deplane=True, min_count=1, memory_budget=None):
+    """
+    residual variance after removing a least squares plane in every window_size x window_size
+    window of one or more maps, all windows solved at once from their moments. a point is only
+    used if it is finite in all maps.
+    without trim the moments come from summed-area tables (cost independent of the window size),
+    with trim values outside the percentile interval of their window are excluded first (a value
+    outside the interval of any of the maps excludes that point in all maps), which is done in
+    blocks of rows so the window tensor never exceeds memory_budget bytes.
+
+    Args:
+        values (np.ndarray): (..., n_maps, rows, cols) maps that share coordinates
+        x, y (np.ndarray): (..., rows, cols) coordinates of the maps (e.g. lon, lat)
+        window_size (int): window dimension
+        trim (tuple, optional): lower and upper percentile, e.g. (2.5, 97.5). Defaults to None.
+        deplane (bool, optional): remove a plane, otherwise only the mean. Defaults to True.
+        min_count (int, optional): minimum number of valid points per window. Defaults to 1.
+        memory_budget (int, optional): maximum size in bytes of the window tensor of a block
+                                       of rows. Defaults to DEFAULT_MEMORY_BUDGET.
+
+    Returns:
+        variance: (..., n_maps, rows - window_size + 1, cols - window_size + 1) residual
+                  variance of each window (nan for windows without enough points)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    x = np.asarray(x, dtype=np.float64)[..., np.newaxis, :, :]
+    y = np.asarray(y, dtype=np.float64)[..., np.newaxis, :, :]
+    w = window_size
+    # a point is used only if it is finite in all maps
+    valid = np.all(np.isfinite(values), axis=-3, keepdims=True) & np.isfinite(x) & np.isfinite(y)
+    if trim is None:
+        return solve_plane(box_moments(values, x, y, valid, w), deplane, min_count)[1]
+
+    n_rows, n_cols = values.shape[-2:]
+    out_rows, out_cols = n_rows - w + 1, n_cols - w + 1
+    variance = np.full(values.shape[:-2] + (out_rows, out_cols), np.nan)
+    if out_rows <= 0 or out_cols <= 0:
+        return variance
+    if memory_budget is None:
+        memory_budget = DEFAULT_MEMORY_BUDGET
+    # window tensors of values, x, y and the masks of one output row
+    row_bytes = values[..., 0, 0].size * out_cols * w * w * 8 * 6
+    block = int(max(1, min(out_rows, memory_budget // max(row_bytes, 1))))
+    view = np.lib.stride_tricks.sliding_window_view
+    for r0 in range(0, out_rows, block):
+        r1 = min(out_rows, r0 + block)
+        sl = (Ellipsis, slice(r0, r1 + w - 1), slice(None))
+        shape_win = values[sl].shape[:-2] + (r1 - r0, out_cols, w * w)
+        win_v = view(values[sl], (w, w), axis=(-2, -1)).reshape(shape_win)
+        win_x = view(x[sl], (w, w), axis=(-2, -1)).reshape(shape_win[:-4] + (1,) + shape_win[-3:])
+        win_y = view(y[sl], (w, w), axis=(-2, -1)).reshape(shape_win[:-4] + (1,) + shape_win[-3:])
+        win_valid = view(valid[sl], (w, w), axis=(-2, -1)).reshape(win_x.shape)
+        win_valid = win_valid & ~np.any(trim_mask(win_v, trim), axis=-4, keepdims=True)
+        variance[..., r0:r1, :] = solve_plane(
+            plane_moments(win_v, win_x, win_y, win_valid, axis=-1), deplane, min_count
+        )[1]
+    return variance
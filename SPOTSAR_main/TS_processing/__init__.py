@@ -1,4 +1,4 @@
-from .leastsquare_ts import leastsquare_ts
+from .leastsquare_ts import leastsquare_ts, pair_dates, sbas_design_matrix
 from .read_hdf5_seq import read_hdf5_seq
 from .ts_stack import ts_stack
 from .write_hdf5_seq import write_hdf5_seq
\ No newline at end of file
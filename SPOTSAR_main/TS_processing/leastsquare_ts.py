@@ -1,2 +1,137 @@
-def leastsquare_ts():
-    print('do leastsquare_ts')
\ No newline at end of file
+import re
+
+import numpy as np
+
+
+def pair_dates(pairs):
+    """
+    reference and secondary date of every pair
+
+    Args:
+        pairs (list): pair names containing two dates as yyyymmdd (e.g. 'c20200910_c20201002'
+                      from get_image_pairs) or (date1, date2) tuples
+
+    Returns:
+        dates: (n_pairs, 2) np.datetime64[D] array
+    """
+    dates = []
+    for pair in pairs:
+        if isinstance(pair, str):
+            match = re.search(r"(\d{8})\D+(\d{8})", pair)
+            if match is None:
+                raise ValueError(f"no dates found in pair name {pair}")
+            pair = match.groups()
+        dates.append([np.datetime64(f"{d[:4]}-{d[4:6]}-{d[6:8]}", "D") if isinstance(d, str) else np.datetime64(d, "D") for d in pair])
+    return np.array(dates, dtype="datetime64[D]")
+
+
+def sbas_design_matrix(pairs):
+    """
+    design matrix of a network of pairs for the mean velocities between consecutive epochs:
+    the displacement of a pair is the sum of the velocities times the time spans of the
+    intervals between its dates (Berardino et al., 2002)
+
+    Args:
+        pairs (list): pair names or date tuples, see pair_dates
+
+    Returns:
+        B: (n_pairs, n_epochs - 1) design matrix in years
+        epochs: (n_epochs,) sorted np.datetime64[D] dates of all pairs
+    """
+    dates = pair_dates(pairs)
+    epochs = np.unique(dates)
+    first = np.searchsorted(epochs, dates.min(axis=1))
+    last = np.searchsorted(epochs, dates.max(axis=1))
+    dt = np.diff(epochs).astype(np.float64) / 365.25
+    intervals = np.arange(len(epochs) - 1)
+    B = ((intervals >= first[:, np.newaxis]) & (intervals < last[:, np.newaxis])) * dt
+    # pairs from a later to an earlier date measure the negative displacement
+    sign = np.where(dates[:, 0] <= dates[:, 1], 1.0, -1.0)
+    return B * sign[:, np.newaxis], epochs
+
+
+def leastsquare_ts(pairs, displacements, weights=None, rcond=1e-10, memory_budget=None):
+    """
+    SBAS least-squares inversion of the displacements of a network of pairs (e.g. the MKA
+    maps of all c<date>_c<date> pairs) into a displacement time series per pixel.
+    the velocities between consecutive epochs are the minimum norm least-squares solution
+    (SVD), so that networks with gaps still give a solution (zero velocity over intervals
+    that are not spanned by any pair of a pixel).
+    the design matrix is built once. without weights, pixels with the same pattern of valid
+    pairs share one pseudo-inverse and are solved with a single matrix product. with weights,
+    every pixel has its own weighted system, which are solved as stacks of pseudo-inverses.
+
+    Args:
+        pairs (list): pair names containing two dates (e.g. from get_image_pairs) or
+                      (date1, date2) tuples, see pair_dates
+        displacements (np.ndarray): (n_pairs, ...) displacement maps of the pairs, nan where a
+                                    pair has no data
+        weights (np.ndarray, optional): (n_pairs, ...) weights of the displacements, e.g. 1/CCS**2.
+                                        Defaults to None, equal weights.
+        rcond (float, optional): relative cut-off of small singular values. Defaults to 1e-10.
+        memory_budget (int, optional): maximum number of bytes of the working arrays of a batch
+                                       of pixels. Defaults to None, all pixels at once.
+
+    Returns:
+        epochs: (n_epochs,) np.datetime64[D] dates
+        cum_disp: (n_epochs, ...) cumulative displacement since the first epoch, nan for pixels
+                  without valid pairs
+        velocity: (...) mean velocity per year, least-squares line through cum_disp
+    """
+    B, epochs = sbas_design_matrix(pairs)
+    n_pairs, n_intervals = B.shape
+    map_shape = np.shape(displacements)[1:]
+    if np.shape(displacements)[0] != n_pairs:
+        raise ValueError(f"displacements has {np.shape(displacements)[0]} pairs, not {n_pairs}")
+    d = np.reshape(np.asarray(displacements, dtype=np.float64), (n_pairs, -1))
+    valid = ~np.isnan(d)
+    if weights is not None:
+        w = np.reshape(np.asarray(weights, dtype=np.float64), (n_pairs, -1))
+        valid &= np.isfinite(w) & (w > 0)
+    n_pixels = d.shape[1]
+    dt = np.diff(epochs).astype(np.float64) / 365.25
+
+    # per pixel: data, weights, design matrix and pseudo-inverse of a weighted batch
+    pixel_bytes = 8 * (3 * n_pairs + 2 * n_pairs * n_intervals + n_intervals)
+    if memory_budget is None:
+        batch = max(1, n_pixels)
+    else:
+        batch = max(1, int(memory_budget // pixel_bytes))
+
+    velocities = np.full((n_intervals, n_pixels), np.nan)
+    if weights is None:
+        # pixels with the same valid pairs share the pseudo-inverse
+        patterns, inverse = np.unique(np.packbits(valid, axis=0), axis=1, return_inverse=True)
+        inverse = np.ravel(inverse)
+        order = np.argsort(inverse, kind="stable")
+        bounds = np.searchsorted(inverse[order], np.arange(patterns.shape[1] + 1))
+        for group in range(patterns.shape[1]):
+            pixels = order[bounds[group]:bounds[group + 1]]
+            rows = valid[:, pixels[0]]
+            if not np.any(rows):
+                continue
+            B_inv = np.linalg.pinv(B[rows], rcond=rcond)
+            for start in range(0, pixels.size, batch):
+                batch_pixels = pixels[start:start + batch]
+                velocities[:, batch_pixels] = B_inv @ d[np.ix_(rows, batch_pixels)]
+    else:
+        for start in range(0, n_pixels, batch):
+            stop = min(start + batch, n_pixels)
+            # invalid pairs get zero weight, which removes them from the least-squares problem
+            sqrt_w = np.sqrt(np.where(valid[:, start:stop], w[:, start:stop], 0.0)).T
+            B_w = sqrt_w[:, :, np.newaxis] * B[np.newaxis]
+            d_w = sqrt_w * np.where(valid[:, start:stop], d[:, start:stop], 0.0).T
+            velocities[:, start:stop] = np.einsum("pij,pj->ip", np.linalg.pinv(B_w, rcond=rcond), d_w)
+
+    cum_disp = np.zeros((len(epochs), n_pixels))
+    cum_disp[1:] = np.cumsum(velocities * dt[:, np.newaxis], axis=0)
+    cum_disp[:, ~np.any(valid, axis=0)] = np.nan
+
+    # mean velocity: least-squares line through the cumulative displacement of every pixel
+    t = (epochs - epochs[0]).astype(np.float64) / 365.25
+    t_centered = t - np.mean(t)
+    if len(epochs) > 1:
+        velocity = (t_centered @ cum_disp) / np.sum(t_centered**2)
+    else:
+        velocity = np.full(n_pixels, np.nan)
+    return epochs, np.reshape(cum_disp, (len(epochs),) + map_shape), np.reshape(velocity, map_shape)
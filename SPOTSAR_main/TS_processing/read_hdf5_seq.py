@@ -1,7 +1,106 @@
-import h5py
-
-def read_hdf5_seq(file_list):
-    print(f'number of files to process: {len(file_list)}')
-
-    # for file_name in file_list:
-    #     h5.read()
\ No newline at end of file
+import h5py
+import numpy as np
+
+
+def _epoch_index(labels, epochs):
+    """index of the selected epochs, given as int, slice, labels or list of ints/labels"""
+    n = len(labels)
+    if epochs is None:
+        return np.arange(n)
+    if isinstance(epochs, slice):
+        return np.arange(n)[epochs]
+    if isinstance(epochs, (str, int, np.integer)):
+        epochs = [epochs]
+    positions = {label: i for i, label in enumerate(labels)}
+    index = []
+    for epoch in epochs:
+        if isinstance(epoch, str):
+            if epoch not in positions:
+                raise KeyError(f"no map with label {epoch}")
+            index.append(positions[epoch])
+        else:
+            epoch = int(epoch)
+            if epoch < -n or epoch >= n:
+                raise IndexError(f"map index {epoch} is out of range for {n} maps")
+            # negative indices count from the end
+            index.append(epoch + n if epoch < 0 else epoch)
+    return np.array(index, dtype=np.intp)
+
+
+def _pixel_index(index, n, axis):
+    """row or column index of pixels as intp, negative indices count from the end"""
+    index = np.ravel(index).astype(np.intp)
+    outside = (index < -n) | (index >= n)
+    if np.any(outside):
+        raise IndexError(f"{axis} index {index[outside][0]} is out of range for {n} {axis}s")
+    return np.where(index < 0, index + n, index)
+
+
+def _read_epochs(dset, index, *selection):
+    """reads the selected epochs, hdf5 selections need increasing unique indices"""
+    unique, inverse = np.unique(index, return_inverse=True)
+    if unique.size == 0:
+        return np.empty((0,) + dset[(slice(0, 0),) + selection].shape[1:], dtype=dset.dtype)
+    if unique.size == unique[-1] - unique[0] + 1:
+        data = dset[(slice(unique[0], unique[-1] + 1),) + selection]
+    else:
+        data = dset[(unique,) + selection]
+    return data[np.ravel(inverse)]
+
+
+def read_hdf5_seq(h5_file, name="cube", epochs=None, rows=None, cols=None):
+    """
+    reads maps or pixel time series from a (time, row, col) dataset written by write_hdf5_seq,
+    only the chunks that contain the selection are read.
+
+    Args:
+        h5_file (str): hdf5 file
+        name (str, optional): name of the dataset. Defaults to "cube".
+        epochs (int|str|slice|list, optional): index, label, slice or list of indices/labels of
+                                               the maps to read. Defaults to None, all maps.
+        rows (slice|np.ndarray, optional): row slice of a window, or row index of pixels.
+                                           Defaults to None, all rows.
+        cols (slice|np.ndarray, optional): column slice of a window, or column index of pixels
+                                           (same length as rows). Defaults to None, all columns.
+                                           negative pixel indices count from the end.
+
+    Returns:
+        labels: labels of the selected maps
+        data: (n_epochs, rows, cols) maps or windows, or (n_epochs, n_pixels) time series
+              when rows and cols are pixel indices
+        metadata: dict with the metadata columns of the selected maps
+    """
+    with h5py.File(h5_file, "r") as f:
+        dset = f[name]
+        all_labels = f[name + "_labels"].asstr()[()]
+        index = _epoch_index(list(all_labels), epochs)
+        labels = all_labels[index]
+        metadata = {}
+        if name + "_meta" in f:
+            for key, column in f[name + "_meta"].items():
+                values = column.asstr()[()] if column.dtype.kind == "O" else column[()]
+                metadata[key] = values[index]
+
+        rows = slice(None) if rows is None else rows
+        cols = slice(None) if cols is None else cols
+        if isinstance(rows, slice) and isinstance(cols, slice):
+            return labels, _read_epochs(dset, index, rows, cols), metadata
+
+        # pixel time series: one read of the bounding box of the pixels per chunk
+        rows = _pixel_index(rows, dset.shape[1], "row")
+        cols = _pixel_index(cols, dset.shape[2], "column")
+        if rows.shape != cols.shape:
+            raise ValueError(f"rows and cols of pixels must have the same length, not {rows.size} and {cols.size}")
+        data = np.empty((index.size, rows.size), dtype=dset.dtype)
+        chunk_rows, chunk_cols = dset.chunks[1:]
+        chunk_id = (rows // chunk_rows) * (-(-dset.shape[2] // chunk_cols)) + cols // chunk_cols
+        order = np.argsort(chunk_id, kind="stable")
+        bounds = np.flatnonzero(np.diff(chunk_id[order])) + 1
+        for pixels in np.split(order, bounds):
+            if pixels.size == 0:
+                continue
+            r0, r1 = rows[pixels].min(), rows[pixels].max() + 1
+            c0, c1 = cols[pixels].min(), cols[pixels].max() + 1
+            box = _read_epochs(dset, index, slice(r0, r1), slice(c0, c1))
+            data[:, pixels] = box[:, rows[pixels] - r0, cols[pixels] - c0]
+        return labels, data, metadata
@@ -1,2 +1,116 @@
-def write_hdf5_seq():
-    print('do write_hdf5_seq')
\ No newline at end of file
+import h5py
+import numpy as np
+
+# (time, row, col) chunk shape per layout: 'map' for fast reads of single epochs, 'pixel' for
+# fast reads of the time series of single pixels, 'balanced' in between
+CHUNK_LAYOUTS = {
+    "map": (1, 512, 512),
+    "balanced": (4, 128, 128),
+    "pixel": (16, 32, 32),
+}
+
+
+def chunk_shape(layout, map_shape):
+    """
+    chunk shape of a (time, row, col) cube
+
+    Args:
+        layout (str|tuple): 'map', 'balanced', 'pixel' (see CHUNK_LAYOUTS) or a (time, row, col) chunk shape
+        map_shape (tuple): (rows, cols) of the maps
+
+    Returns:
+        chunks: (time, row, col) chunk shape, at most the size of the maps
+    """
+    if isinstance(layout, str):
+        if layout not in CHUNK_LAYOUTS:
+            raise ValueError(f"layout must be one of {list(CHUNK_LAYOUTS)} or a chunk shape, not {layout}")
+        layout = CHUNK_LAYOUTS[layout]
+    return (int(layout[0]),) + tuple(int(max(1, min(c, s))) for c, s in zip(layout[1:], map_shape))
+
+
+def _append(dset, values):
+    n = dset.shape[0]
+    dset.resize(n + len(values), axis=0)
+    dset[n:] = values
+
+
+def write_hdf5_seq(h5_file, items, name="cube", layout="balanced", compression="gzip", compression_opts=4, dtype=np.float32):
+    """
+    writes maps one epoch/pair at a time to a chunked and compressed (time, row, col) dataset,
+    e.g. the MKA maps of all pairs. maps are buffered for one chunk along time so that every chunk
+    is written and compressed once, the whole cube is never in memory. when the dataset
+    already exists the maps are appended.
+    the label of every map is stored in <name>_labels and metadata in the table <name>_meta
+    (one dataset per column, nan or '' for maps without a value).
+
+    Args:
+        h5_file (str): hdf5 file, created if it does not exist
+        items (iterable): (label, map) or (label, map, metadata dict) per epoch/pair, e.g. a generator
+                          that reads or computes one map at a time
+        name (str, optional): name of the dataset. Defaults to "cube".
+        layout (str|tuple, optional): chunk layout for a new dataset, 'map' for fast map reads,
+                                      'pixel' for fast time series reads, 'balanced' or a
+                                      (time, row, col) chunk shape. Defaults to "balanced".
+        compression (str, optional): hdf5 compression filter. Defaults to "gzip".
+        compression_opts (int, optional): compression level. Defaults to 4.
+        dtype (np.dtype, optional): data type of a new dataset. Defaults to np.float32.
+
+    Returns:
+        n_frames: number of maps in the dataset
+    """
+    with h5py.File(h5_file, "a") as f:
+        dset = f.get(name)
+        buffer = []
+        labels = []
+        metadata = []
+
+        def flush():
+            _append(dset, np.array(buffer, dtype=dset.dtype))
+            _append(f[name + "_labels"], labels)
+            meta = f.require_group(name + "_meta")
+            n = dset.shape[0]
+            for key in set(k for m in metadata for k in m) | set(meta.keys()):
+                values = [m.get(key) for m in metadata]
+                if key not in meta:
+                    samples = [v for v in values if v is not None]
+                    if len(samples) == 0:
+                        # the type of the column is not known yet, created when a value is seen
+                        continue
+                    sample = samples[0]
+                    if isinstance(sample, str):
+                        meta.create_dataset(key, shape=(n - len(buffer),), maxshape=(None,), dtype=h5py.string_dtype(), chunks=True)
+                    else:
+                        meta.create_dataset(key, shape=(n - len(buffer),), maxshape=(None,), dtype=np.float64, chunks=True, fillvalue=np.nan)
+                column = meta[key]
+                missing = "" if column.dtype.kind == "O" else np.nan
+                _append(column, [missing if v is None else v for v in values])
+            buffer.clear()
+            labels.clear()
+            metadata.clear()
+
+        for item in items:
+            data = np.asarray(item[1])
+            if dset is None:
+                dset = f.create_dataset(
+                    name,
+                    shape=(0,) + data.shape,
+                    maxshape=(None,) + data.shape,
+                    dtype=dtype,
+                    chunks=chunk_shape(layout, data.shape),
+                    compression=compression,
+                    compression_opts=compression_opts,
+                    shuffle=True,
+                    fillvalue=np.nan,
+                )
+                f.create_dataset(name + "_labels", shape=(0,), maxshape=(None,), dtype=h5py.string_dtype(), chunks=True)
+            elif data.shape != dset.shape[1:]:
+                raise ValueError(f"map of {item[0]} has shape {data.shape}, not {dset.shape[1:]}")
+            buffer.append(data)
+            labels.append(str(item[0]))
+            metadata.append(item[2] if len(item) > 2 else {})
+            # full chunk along time (counted from the start of the dataset)
+            if (dset.shape[0] + len(buffer)) % dset.chunks[0] == 0:
+                flush()
+        if len(buffer) > 0:
+            flush()
+        return 0 if dset is None else dset.shape[0]
@@ -0,0 +1,26 @@
+import numpy as np
+import time
+
+from synthetic_data import synthetic_kernel
+
+
+obj = synthetic_kernel(150, 120)
+min_samples = 10
+min_cluster_sizes = [20, 40, 60, 80, 100, 150, 200, 300]
+print(f"{np.size(obj.Valid_index)} points, min_samples {min_samples}, {len(min_cluster_sizes)} minimum cluster sizes")
+
+# one HDBSCAN fit per minimum cluster size
+start_time = time.time()
+separate = {size: obj.run_HDBSCAN(size, min_samples) for size in min_cluster_sizes}
+separate_time = time.time() - start_time
+print(f"run_HDBSCAN per minimum cluster size: {separate_time:.2f} s")
+
+# one tree for all minimum cluster sizes
+start_time = time.time()
+sweep = obj.run_HDBSCAN_sweep(min_cluster_sizes, min_samples)
+sweep_time = time.time() - start_time
+print(f"run_HDBSCAN_sweep: {sweep_time:.2f} s ({separate_time / sweep_time:.1f}x faster)")
+
+for size in min_cluster_sizes:
+    same = all(np.array_equal(a, b, equal_nan=True) for a, b in zip(separate[size], sweep[size]))
+    print(f"min_cluster_size {size}: {int(np.nanmax(sweep[size][0])) + 1} clusters, same labels, scores and probabilities: {same}")
@@ -0,0 +1,35 @@
+import numpy as np
+import time
+from sklearn.neighbors import LocalOutlierFactor
+
+from SPOTSAR_main.Post_processing.lof_sweep import lof_sweep
+
+# normalised features as used for LOF (lon, lat, offsets), with some outliers
+rng = np.random.default_rng(0)
+n = 20000
+X = rng.normal(0, 1, (n, 4))
+X[: n // 50] += rng.normal(0, 6, (n // 50, 4))
+n_neighbors_list = [20, 50, 100, 150, 200, 300]
+print(f"{n} points, n_neighbors {n_neighbors_list}")
+
+# one LocalOutlierFactor fit per number of neighbours
+start_time = time.time()
+separate = {}
+for n_neighbors in n_neighbors_list:
+    clf = LocalOutlierFactor(n_neighbors=n_neighbors)
+    separate[n_neighbors] = (clf.fit_predict(X), clf.negative_outlier_factor_)
+separate_time = time.time() - start_time
+print(f"LocalOutlierFactor per number of neighbours: {separate_time:.2f} s")
+
+# one neighbour search for all numbers of neighbours
+start_time = time.time()
+sweep = lof_sweep(X, n_neighbors_list)
+sweep_time = time.time() - start_time
+print(f"lof_sweep: {sweep_time:.2f} s ({separate_time / sweep_time:.1f}x faster)")
+
+for n_neighbors in n_neighbors_list:
+    labels, scores = sweep[n_neighbors]
+    print(
+        f"n_neighbors {n_neighbors}: {np.sum(labels == -1)} outliers, same labels: {np.array_equal(labels, separate[n_neighbors][0])}, "
+        f"max score difference {np.max(np.abs(scores - separate[n_neighbors][1])):.2e}"
+    )
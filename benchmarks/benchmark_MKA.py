@@ -0,0 +1,36 @@
+import numpy as np
+import time
+import warnings
+
+from synthetic_data import synthetic_stack
+
+# nanpercentile/nanmean warn for all-nan windows in the loop version
+warnings.filterwarnings("ignore", category=RuntimeWarning)
+
+
+LINES = 200
+WIDTH = 150
+WINDOW_SIZE = 1
+
+# compile once so the timings do not include numba compilation
+synthetic_stack(2, 10, 10).Run_MKA(window_size=WINDOW_SIZE, method="numba")
+
+for n_kernels in [10, 20, 40]:
+    stack = synthetic_stack(n_kernels, LINES, WIDTH)
+
+    start_time = time.time()
+    loop_R, loop_A = stack.Run_MKA(window_size=WINDOW_SIZE, method="loop")
+    loop_R, loop_A = loop_R.copy(), loop_A.copy()
+    loop_time = time.time() - start_time
+
+    start_time = time.time()
+    numba_R, numba_A = stack.Run_MKA(window_size=WINDOW_SIZE, method="numba")
+    numba_time = time.time() - start_time
+
+    identical = np.array_equal(loop_R, numba_R, equal_nan=True) and np.array_equal(
+        loop_A, numba_A, equal_nan=True
+    )
+    print(f"kernels: {n_kernels}, map size: {LINES}x{WIDTH}")
+    print(f"    Execution time for loop MKA: {loop_time:.6f} seconds")
+    print(f"    Execution time for numba MKA: {numba_time:.6f} seconds")
+    print(f"    speed up: {loop_time / numba_time:.1f}x, identical: {identical}")
@@ -0,0 +1,55 @@
+import numpy as np
+import time
+
+from synthetic_data import synthetic_stack
+
+
+LINES = 1000
+WIDTH = 800
+N_KERNELS = 12
+
+# cost of adding and removing one kernel for a growing number of added kernels
+SIZE = 500
+stack = synthetic_stack(64, SIZE, SIZE, dtype=np.float32)
+kernels = stack.Stack
+accumulator = stack.get_MKA_accumulator()
+print(f"map size: {SIZE}x{SIZE}")
+for n_kernels in [1, 8, 32, 63]:
+    for obj in kernels[len(accumulator.Kernels) : n_kernels]:
+        accumulator.add(obj)
+    start_time = time.time()
+    accumulator.add(kernels[n_kernels])
+    add_time = time.time() - start_time
+    start_time = time.time()
+    accumulator.remove(kernels[n_kernels])
+    remove_time = time.time() - start_time
+    print(f"    {n_kernels} kernels added: add {add_time:.3f} s, remove {remove_time:.3f} s")
+
+# compile once so the timings do not include numba compilation
+synthetic_stack(2, 10, 10, dtype=np.float32).Run_MKA(method="numba")
+
+stack = synthetic_stack(N_KERNELS, LINES, WIDTH, dtype=np.float32)
+# leave-one-out exploration of the kernel subsets
+subsets = [[i for i in range(N_KERNELS) if i != left_out] for left_out in range(N_KERNELS)]
+print(f"kernels: {N_KERNELS}, map size: {LINES}x{WIDTH}, {len(subsets)} leave-one-out subsets")
+
+start_time = time.time()
+numba_maps = [tuple(m.copy() for m in stack.Run_MKA(subset, method="numba")) for subset in subsets]
+numba_time = time.time() - start_time
+
+start_time = time.time()
+stack.Run_MKA(method="incremental")
+build_time = time.time() - start_time
+start_time = time.time()
+incremental_maps = [tuple(m.copy() for m in stack.Run_MKA(subset, method="incremental")) for subset in subsets]
+incremental_time = time.time() - start_time
+
+# the trimmed mean of the accumulator is the sum minus the trimmed values, numba sums the values inside
+max_diff = max(np.nanmax(np.abs(a - b)) for maps in zip(numba_maps, incremental_maps) for a, b in zip(*maps))
+same_nans = all(
+    np.array_equal(np.isnan(a), np.isnan(b)) for maps in zip(numba_maps, incremental_maps) for a, b in zip(*maps)
+)
+print(f"    Execution time for numba MKA of every subset: {numba_time:.3f} seconds")
+print(f"    Execution time for adding all kernels to the accumulator: {build_time:.3f} seconds")
+print(f"    Execution time for incremental MKA of every subset: {incremental_time:.3f} seconds")
+print(f"    speed up: {numba_time / incremental_time:.1f}x, same nans: {same_nans}, max difference: {max_diff:.2e}")
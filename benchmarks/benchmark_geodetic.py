@@ -0,0 +1,73 @@
+import numpy as np
+import pyproj
+import scipy.spatial.transform
+import time
+
+from SPOTSAR_main.Post_processing.geodetic2enu import geodetic2enu
+from SPOTSAR_main.Post_processing.enu2geodetic import enu2geodetic
+
+
+def uncached_geodetic2enu(lat, lon, alt, lat_org, lon_org, alt_org):
+    """
+    previous implementation: creates a new transformer and rotations on every call
+    """
+    transformer = pyproj.Transformer.from_crs(
+        {"proj": "latlong", "ellps": "WGS84", "datum": "WGS84"},
+        {"proj": "geocent", "ellps": "WGS84", "datum": "WGS84"},
+    )
+    x, y, z = transformer.transform(lon, lat, alt, radians=False)
+    x_org, y_org, z_org = transformer.transform(lon_org, lat_org, alt_org, radians=False)
+    vec = np.array([[x - x_org, y - y_org, z - z_org]]).T
+    rot1 = scipy.spatial.transform.Rotation.from_euler("x", -(90 - lat_org), degrees=True).as_matrix()
+    rot3 = scipy.spatial.transform.Rotation.from_euler("z", -(90 + lon_org), degrees=True).as_matrix()
+    rotMatrix = rot1.dot(rot3)
+    enu = rotMatrix.dot(vec).T.ravel()
+    return enu.T
+
+
+# Generate random points around an origin
+n = 10**6
+n_single = 1000
+rng = np.random.default_rng(0)
+lat_org, lon_org, alt_org = -7.54, 110.44, 0.0
+lat = lat_org + rng.uniform(-0.5, 0.5, n)
+lon = lon_org + rng.uniform(-0.5, 0.5, n)
+alt = rng.uniform(0, 3000, n)
+
+# previous implementation, one call per point (as in a loop over query points)
+start_time = time.time()
+enu_single = np.array(
+    [uncached_geodetic2enu(lat[i], lon[i], alt[i], lat_org, lon_org, alt_org) for i in range(n_single)]
+)
+single_time = (time.time() - start_time) / n_single
+print(f"previous geodetic2enu, one call per point: {single_time * 1e6:.2f} us per point")
+
+# previous implementation, all points in one call
+start_time = time.time()
+enu_old = np.reshape(uncached_geodetic2enu(lat, lon, alt, lat_org, lon_org, alt_org), (n, 3))
+old_time = (time.time() - start_time) / n
+print(f"previous geodetic2enu, {n} points in one call: {old_time * 1e6:.3f} us per point")
+
+for method in ["pyproj", "numpy"]:
+    geodetic2enu(lat[:10], lon[:10], alt[:10], lat_org, lon_org, alt_org, method=method)
+    start_time = time.time()
+    enu = geodetic2enu(lat, lon, alt, lat_org, lon_org, alt_org, method=method)
+    new_time = (time.time() - start_time) / n
+    print(
+        f"geodetic2enu method={method}, {n} points: {new_time * 1e6:.3f} us per point, "
+        f"max difference {np.max(np.abs(enu - enu_old)):.2e} m"
+    )
+
+    # one origin per point
+    start_time = time.time()
+    enu_org = geodetic2enu(lat, lon, alt, lat, lon, np.zeros(n), method=method)
+    print(f"    with {n} origins: {(time.time() - start_time) / n * 1e6:.3f} us per point")
+
+    # round trip
+    start_time = time.time()
+    lat_rt, lon_rt, alt_rt = enu2geodetic(enu[:, 0], enu[:, 1], enu[:, 2], lat_org, lon_org, alt_org, method=method)
+    rt_time = (time.time() - start_time) / n
+    print(
+        f"enu2geodetic method={method}, {n} points: {rt_time * 1e6:.3f} us per point, "
+        f"max round trip error {np.max(np.abs(lat_rt - lat)):.2e} deg, {np.max(np.abs(alt_rt - alt)):.2e} m"
+    )
@@ -0,0 +1,42 @@
+import numpy as np
+import os
+import pandas as pd
+import tempfile
+import time
+import tracemalloc
+
+from SPOTSAR_main.Post_processing.multikernel import MultiKernel
+
+# full frame lat/lon files (big-endian float32) and offsets of a small region of interest
+LINES = 6000
+WIDTH = 4000
+rng = np.random.default_rng(0)
+with tempfile.TemporaryDirectory() as tmp_dir:
+    lat_file = os.path.join(tmp_dir, "frame.lat")
+    lon_file = os.path.join(tmp_dir, "frame.lon")
+    rows, cols = np.indices((LINES, WIDTH), dtype=np.float32)
+    (-7.5 + rows * 1e-5).astype(">f4").tofile(lat_file)
+    (110.4 + cols * 1e-5).astype(">f4").tofile(lon_file)
+    del rows, cols
+    print(f"frame of {LINES}x{WIDTH}, lat/lon files of {os.path.getsize(lat_file) / 1e6:.0f} MB each")
+
+    # 8 kernels of offsets on a 4 pixel grid in a 600x400 pixel region
+    rng_pix, azi_pix = np.meshgrid(np.arange(2000, 2400, 4), np.arange(3000, 3600, 4))
+    data = [pd.DataFrame({0: rng_pix.ravel(), 1: azi_pix.ravel()}) for _ in range(8)]
+
+    for method in ["load", "memmap"]:
+        stack = MultiKernel.__new__(MultiKernel)
+        stack.Lat_file = lat_file
+        stack.Lon_file = lon_file
+        stack.Data = [d.copy() for d in data]
+        tracemalloc.start()
+        start_time = time.time()
+        stack.get_latlon_from_file(WIDTH, method=method)
+        stack.add_lat_lon_to_data(1, 1)
+        elapsed = time.time() - start_time
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        if method == "load":
+            reference = [d[[9, 10]].to_numpy() for d in stack.Data]
+        same = all(np.array_equal(d[[9, 10]].to_numpy(), r) for d, r in zip(stack.Data, reference))
+        print(f"{method}: {elapsed:.3f} s, peak memory {peak / 1e6:.0f} MB, same coordinates: {same}")
@@ -0,0 +1,46 @@
+import numpy as np
+import os
+import tempfile
+import time
+
+from SPOTSAR_main.TS_processing import read_hdf5_seq, write_hdf5_seq
+
+# MKA maps of a sequence of pairs, generated one at a time
+N_MAPS = 48
+SHAPE = (1000, 800)
+rng = np.random.default_rng(0)
+
+
+def maps():
+    for i in range(N_MAPS):
+        yield f"c{20200101 + i}_c{20200201 + i}", rng.normal(0, 1, SHAPE).astype(np.float32)
+
+
+rows = rng.integers(0, SHAPE[0], 200)
+cols = rng.integers(0, SHAPE[1], 200)
+print(f"{N_MAPS} maps of {SHAPE}")
+with tempfile.TemporaryDirectory() as tmp_dir:
+    for layout in ["map", "balanced", "pixel"]:
+        h5_file = os.path.join(tmp_dir, f"{layout}.h5")
+        start_time = time.time()
+        write_hdf5_seq(h5_file, maps(), layout=layout)
+        write_time = time.time() - start_time
+
+        start_time = time.time()
+        for epoch in range(0, N_MAPS, 8):
+            read_hdf5_seq(h5_file, epochs=epoch)
+        map_time = (time.time() - start_time) / len(range(0, N_MAPS, 8))
+
+        start_time = time.time()
+        for r, c in zip(rows[:20], cols[:20]):
+            read_hdf5_seq(h5_file, rows=[r], cols=[c])
+        pixel_time = (time.time() - start_time) / 20
+
+        start_time = time.time()
+        read_hdf5_seq(h5_file, rows=rows, cols=cols)
+        pixels_time = time.time() - start_time
+        print(
+            f"{layout}: write {write_time:.2f} s ({os.path.getsize(h5_file) / 1e6:.0f} MB), "
+            f"one map {1000 * map_time:.1f} ms, one pixel time series {1000 * pixel_time:.1f} ms, "
+            f"{rows.size} pixel time series {pixels_time:.2f} s"
+        )
@@ -0,0 +1,82 @@
+import numpy as np
+import os
+import tempfile
+import time
+import tracemalloc
+
+from SPOTSAR_main.Post_processing.multikernel import MultiKernel
+from synthetic_data import write_synthetic_frame
+
+# full frame of offsets (GAMMA text files with 11 columns), CCS and lat/lon files, see write_synthetic_frame
+R_STEP = 4
+A_STEP = 4
+WIDTH = 2400
+LINES = 3000
+WIDTH_CCS = WIDTH // R_STEP
+LINES_CCS = LINES // A_STEP
+
+
+def load_pandas(store_dir=None):
+    stack = MultiKernel(data_dir, files, data_dir, ccs_files, lat_file, lon_file, -170.0, 35.0, LINES_CCS, WIDTH_CCS, store_dir=store_dir)
+    stack.get_params_from_file_name()
+    stack.get_latlon_from_file(WIDTH)
+    stack.add_lat_lon_to_data(1, 1)
+    stack.crop_stack_ccs(R_STEP, A_STEP)
+    stack.assign_data_to_stack(R_STEP, A_STEP)
+    return stack
+
+
+def load_numpy(store_dir=None):
+    stack = MultiKernel(
+        data_dir, files, data_dir, ccs_files, lat_file, lon_file, -170.0, 35.0, LINES_CCS, WIDTH_CCS, store_dir=store_dir, ingest="numpy"
+    )
+    stack.get_params_from_file_name()
+    stack.get_latlon_from_file(WIDTH)
+    stack.ingest_stack(1, 1, R_STEP, A_STEP)
+    return stack
+
+
+def measure(load):
+    start_time = time.time()
+    stack = load()
+    run_time = time.time() - start_time
+    del stack
+    # peak memory in a separate run, tracing slows down the allocations
+    tracemalloc.start()
+    stack = load()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return stack, run_time, peak
+
+
+with tempfile.TemporaryDirectory() as data_dir:
+    data_dir = data_dir + "/"
+    files, ccs_files, lat_file, lon_file = write_synthetic_frame(data_dir, LINES, WIDTH, R_STEP, A_STEP, [32, 64, 96, 128])
+    print(f"{len(files)} kernels of {os.path.getsize(data_dir + files[0]) / 1e6:.0f} MB offset text, frame of {LINES}x{WIDTH}")
+
+    legacy, pandas_time, pandas_peak = measure(load_pandas)
+    print(f"pandas: {pandas_time:.2f} s, peak {pandas_peak / 1e6:.0f} MB")
+    stack, numpy_time, numpy_peak = measure(load_numpy)
+    print(f"numpy: {numpy_time:.2f} s ({pandas_time / numpy_time:.1f}x faster), peak {numpy_peak / 1e6:.0f} MB ({pandas_peak / numpy_peak:.1f}x less)")
+
+    same = all(
+        np.array_equal(np.asarray(getattr(a, k)), np.asarray(getattr(b, k)), equal_nan=True)
+        for a, b in zip(legacy.Stack, stack.Stack)
+        for k in ["R_off", "A_off", "Ccp_off", "Ccs_off", "Lat_off", "Lon_off", "R_idx", "A_idx"]
+    )
+    print(f"same stack: {same}")
+
+    # out-of-core: every file is parsed, scattered and stored one at a time
+    for name, load in [("pandas", load_pandas), ("numpy", load_numpy)]:
+        with tempfile.TemporaryDirectory() as store_dir:
+            tracemalloc.start()
+            stack = load(store_dir)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            same = all(
+                np.array_equal(np.asarray(getattr(a, k)), np.asarray(getattr(b, k)), equal_nan=True)
+                for a, b in zip(legacy.Stack, stack.Stack)
+                for k in ["R_off", "A_off", "Ccp_off", "Ccs_off", "Lat_off", "Lon_off"]
+            )
+            del stack
+        print(f"{name} out-of-core: peak {peak / 1e6:.0f} MB, same stack: {same}")
@@ -0,0 +1,41 @@
+import numpy as np
+import time
+
+from SPOTSAR_main.TS_processing.leastsquare_ts import leastsquare_ts, sbas_design_matrix
+
+# network of pairs between 12 acquisitions, every acquisition paired with the next three
+rng = np.random.default_rng(0)
+dates = [str(d).replace("-", "") for d in np.datetime64("2020-01-01") + 11 * np.arange(12)]
+pairs = [f"c{a}_c{b}" for i, a in enumerate(dates) for b in dates[i + 1 : i + 4]]
+B, epochs = sbas_design_matrix(pairs)
+shape = (300, 300)
+velocities = rng.normal(0, 1, (B.shape[1],) + shape)
+displacements = np.einsum("pi,i...->p...", B, velocities) + rng.normal(0, 0.05, (len(pairs),) + shape)
+# pairs without data in some pixels, mostly in the same pixels (e.g. decorrelated areas)
+displacements[:, rng.random(shape) < 0.2] = np.nan
+displacements[rng.integers(0, len(pairs), 2000), rng.integers(0, shape[0], 2000), rng.integers(0, shape[1], 2000)] = np.nan
+print(f"{len(pairs)} pairs, {len(epochs)} epochs, {shape[0] * shape[1]} pixels")
+
+# least squares per pixel
+n_test = 5000
+start_time = time.time()
+dt = np.diff(epochs).astype(np.float64) / 365.25
+test_pixels = np.unravel_index(np.arange(n_test), shape)
+reference = []
+for r, c in zip(*test_pixels):
+    valid = ~np.isnan(displacements[:, r, c])
+    v = np.linalg.lstsq(B[valid], displacements[valid, r, c], rcond=1e-10)[0]
+    reference.append(np.concatenate(([0], np.cumsum(v * dt))))
+loop_time = (time.time() - start_time) * (shape[0] * shape[1]) / n_test
+print(f"lstsq per pixel (extrapolated from {n_test} pixels): {loop_time:.2f} s")
+
+start_time = time.time()
+epochs, cum_disp, velocity = leastsquare_ts(pairs, displacements)
+batch_time = time.time() - start_time
+print(f"leastsquare_ts: {batch_time:.2f} s ({loop_time / batch_time:.1f}x faster)")
+difference = np.nanmax(np.abs(np.array(reference).T - cum_disp[:, test_pixels[0], test_pixels[1]]))
+print(f"max difference of the cumulative displacement: {difference:.2e}")
+
+start_time = time.time()
+leastsquare_ts(pairs, displacements, weights=rng.uniform(0.5, 2, displacements.shape), memory_budget=2**26)
+print(f"leastsquare_ts with weights: {time.time() - start_time:.2f} s")
@@ -0,0 +1,71 @@
+import numpy as np
+import time
+from sklearn.cluster import DBSCAN
+from sklearn.metrics import pairwise_distances
+from sklearn.neighbors import LocalOutlierFactor
+
+from SPOTSAR_main.Post_processing.radius_graph import radius_graph
+from SPOTSAR_main.Post_processing.query_index import EARTH_RADIUS
+
+
+def lattice(lines, width, spacing=50.0, heading=-170.0, missing=0.1, seed=0):
+    """
+    coordinates of a rotated regular grid (as the range/azimuth grid of a kernel) with missing points
+
+    Returns:
+        lats, lons, rows, cols: coordinates and grid position of the points that are not missing
+    """
+    rng = np.random.default_rng(seed)
+    rows, cols = np.indices((lines, width))
+    h = np.deg2rad(heading)
+    east = (cols * np.cos(h) - rows * np.sin(h)) * spacing
+    north = (cols * np.sin(h) + rows * np.cos(h)) * spacing
+    lats = -7.54 + np.degrees(north / EARTH_RADIUS)
+    lons = 110.44 + np.degrees(east / (EARTH_RADIUS * np.cos(np.radians(-7.54))))
+    keep = rng.random((lines, width)) > missing
+    return lats[keep], lons[keep], rows[keep], cols[keep]
+
+
+radius = 160.0
+
+# small grid: compare with the dense distance matrix
+lats, lons, rows, cols = lattice(60, 50)
+ll = np.radians(np.column_stack((lats, lons)))
+start_time = time.time()
+dense = pairwise_distances(ll, ll, metric="haversine") * EARTH_RADIUS
+dense_time = time.time() - start_time
+for method in ["tree", "grid"]:
+    graph = radius_graph(lats, lons, radius, method=method, rows=rows, cols=cols)
+    # explicit entries, including the points themselves at distance 0
+    in_graph = graph.toarray() > 0
+    np.fill_diagonal(in_graph, True)
+    in_radius = dense <= radius
+    print(
+        f"{method}: {np.size(lats)} points, {graph.nnz} pairs, same pairs as dense: {np.array_equal(in_graph, in_radius)}, "
+        f"max distance difference {np.max(np.abs(graph.toarray()[in_radius] - dense[in_radius])):.2e} m"
+    )
+print(f"dense matrix of {np.size(lats)} points: {dense_time:.3f} s, {dense.nbytes / 1e6:.1f} MB")
+
+# the graph as precomputed input
+eps = 120.0
+labels_graph = DBSCAN(eps=eps, min_samples=5, metric="precomputed").fit(radius_graph(lats, lons, eps)).labels_
+labels_coords = DBSCAN(eps=eps / EARTH_RADIUS, min_samples=5, metric="haversine").fit(ll).labels_
+print(f"DBSCAN labels equal to haversine metric: {np.array_equal(labels_graph, labels_coords)}")
+# the point itself is one of its neighbours in the graph
+lof_graph = LocalOutlierFactor(n_neighbors=8, metric="precomputed").fit(radius_graph(lats, lons, radius))
+lof_coords = LocalOutlierFactor(n_neighbors=8, metric="haversine").fit(ll)
+print(
+    "LOF score difference with haversine metric: "
+    f"{np.max(np.abs(lof_graph.negative_outlier_factor_ - lof_coords.negative_outlier_factor_)):.2e}"
+)
+
+# large grid: a dense matrix would need N x N x 8 bytes
+lats, lons, rows, cols = lattice(600, 500)
+n = np.size(lats)
+print(f"{n} points, dense matrix would need {n**2 * 8 / 1e9:.1f} GB")
+for method in ["tree", "grid"]:
+    start_time = time.time()
+    graph = radius_graph(lats, lons, radius, method=method, rows=rows, cols=cols)
+    graph_time = time.time() - start_time
+    graph_bytes = graph.data.nbytes + graph.indices.nbytes + graph.indptr.nbytes
+    print(f"{method}: {graph_time:.2f} s, {graph.nnz} pairs, {graph_bytes / 1e6:.1f} MB")
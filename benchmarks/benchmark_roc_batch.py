@@ -0,0 +1,42 @@
+import numpy as np
+import time
+from sklearn import metrics
+
+from SPOTSAR_main.Post_processing.roc_batch import roc_batch
+
+# reference inliers (1) and outliers (0) of a map, unknown (nan) where not labelled
+rng = np.random.default_rng(0)
+shape = (300, 300)
+labels = (rng.random(shape) > 0.1).astype(np.float64)
+labels[rng.random(shape) < 0.3] = np.nan
+# inlier probabilities of kernels and parameters, rounded to get ties, nan where there is no score
+scores = {}
+for method in ["HDBSCAN", "GLOSH", "LOF", "median"]:
+    for param in range(10):
+        score = np.round(labels * rng.uniform(0.2, 1) + rng.normal(0, 0.5, shape), 2)
+        score[rng.random(shape) < 0.05] = np.nan
+        scores[(method, param)] = score
+print(f"{len(scores)} score maps of {shape}")
+
+# sklearn per score map, as in the AUC notebooks
+start_time = time.time()
+separate = {}
+for key, score in scores.items():
+    test = ~np.isnan(labels) & ~np.isnan(score)
+    fpr, tpr, thresh = metrics.roc_curve(labels[test], score[test], drop_intermediate=False)
+    separate[key] = (metrics.roc_auc_score(labels[test], score[test]), thresh[np.argmax(tpr - fpr)], fpr, tpr, thresh)
+separate_time = time.time() - start_time
+print(f"roc_curve and roc_auc_score per score map: {separate_time:.2f} s")
+
+start_time = time.time()
+table, curves = roc_batch(labels, scores, key_names=("method", "param"), return_curves=True)
+batch_time = time.time() - start_time
+print(f"roc_batch: {batch_time:.2f} s ({separate_time / batch_time:.1f}x faster)")
+
+auc_diff = max(abs(row.auc - separate[(row.method, row.param)][0]) for row in table.itertuples())
+same_threshold = all(row.best_threshold == separate[(row.method, row.param)][1] for row in table.itertuples())
+same_curves = all(
+    all(np.allclose(a[1:], b[1:]) for a, b in zip(curves[key], separate[key][2:])) for key in scores
+)
+print(f"max AUC difference {auc_diff:.2e}, same best thresholds: {same_threshold}, same curves: {same_curves}")
+print(table.pivot(index="param", columns="method", values="auc").round(3))
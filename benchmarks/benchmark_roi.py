@@ -0,0 +1,54 @@
+import numpy as np
+import os
+import tempfile
+import time
+
+from SPOTSAR_main.Post_processing.multikernel import MultiKernel
+from synthetic_data import write_synthetic_frame
+
+# full frame of offsets (GAMMA text files sorted by azimuth), CCS and lat/lon files, see write_synthetic_frame
+R_STEP = 4
+A_STEP = 4
+WIDTH = 3200
+LINES = 4000
+WIDTH_CCS = WIDTH // R_STEP
+LINES_CCS = LINES // A_STEP
+
+
+def load(roi=None):
+    stack = MultiKernel(
+        data_dir, files, data_dir, ccs_files, lat_file, lon_file, -170.0, 35.0, LINES_CCS, WIDTH_CCS,
+        roi=roi, width=WIDTH,
+    )
+    stack.get_params_from_file_name()
+    stack.get_latlon_from_file(WIDTH)
+    stack.add_lat_lon_to_data(1, 1)
+    stack.crop_stack_ccs(R_STEP, A_STEP)
+    stack.assign_data_to_stack(R_STEP, A_STEP)
+    return stack
+
+
+with tempfile.TemporaryDirectory() as data_dir:
+    data_dir = data_dir + "/"
+    files, ccs_files, lat_file, lon_file = write_synthetic_frame(data_dir, LINES, WIDTH, R_STEP, A_STEP, [32, 64])
+    print(f"{len(files)} kernels of {os.path.getsize(data_dir + files[0]) / 1e6:.0f} MB offset text, frame of {LINES}x{WIDTH}")
+
+    start_time = time.time()
+    full = load()
+    full_time = time.time() - start_time
+    print(f"full frame: {full_time:.2f} s, grid {full.Stack[0].R_off.shape}")
+
+    # region of interest of about 500x500 pixels
+    roi = {"lon": [110.41, 110.415], "lat": [-7.58, -7.575]}
+    start_time = time.time()
+    stack = load(roi)
+    roi_time = time.time() - start_time
+    i0 = int((stack.Limits[0] - full.Limits[0]) / R_STEP)
+    j0 = int((stack.Limits[2] - full.Limits[2]) / A_STEP)
+    n, m = stack.Stack[0].R_off.shape
+    same = all(
+        np.array_equal(np.asarray(getattr(a, k))[i0 : i0 + n, j0 : j0 + m], np.asarray(getattr(b, k)), equal_nan=True)
+        for a, b in zip(full.Stack, stack.Stack)
+        for k in ["R_off", "A_off", "Ccs_off", "Lat_off", "Lon_off"]
+    )
+    print(f"region of interest: {roi_time:.2f} s ({full_time / roi_time:.1f}x faster), grid {stack.Stack[0].R_off.shape}, same as full frame: {same}")
@@ -0,0 +1,4 @@
+# pytest runs the tests under tests/ from the repository root, so that they can import
+# SPOTSAR_main and the synthetic_data helper shared with the benchmark scripts.
+# test_env.py, test_haversines.py and tests/pygmt_indonesia_test.py are scripts, not tests.
+collect_ignore = ["test_env.py", "test_haversines.py", "tests/pygmt_indonesia_test.py"]
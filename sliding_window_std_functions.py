@@ -1,6 +1,7 @@
 import numpy as np
-from numpy.linalg import lstsq
-from skimage.util import view_as_windows
+
+from SPOTSAR_main.Post_processing.run_kernel_tasks import worker_pool
+from SPOTSAR_main.Post_processing.window_plane_fit import plane_moments, solve_plane, window_plane_fit
 
 
 def remove_outliers(arr, confidence=95):
@@ -19,90 +20,99 @@ def remove_outliers(arr, confidence=95):
 
 
 def remove_plane(arr, x_coords, y_coords, deplane=False):
+    """
+    removes a least squares plane from every window, all windows are solved at once
+    from their moments (see window_plane_fit). windows with 4 or less valid points are set to nan.
+    returns the residual windows; the previous loop returned the residuals of the last window
+    reshaped to (rows, cols), which failed unless that window had rows*cols valid points.
+
+    Args:
+        arr (np.ndarray): (rows, cols, win, win) windowed data
+        x_coords, y_coords (np.ndarray): windowed coordinates, same shape as arr
+        deplane (bool, optional): remove the plane, otherwise arr is returned. Defaults to False.
+
+    Returns:
+        arr_no_plane: (rows, cols, win, win) residuals after removing the plane (nan where invalid)
+    """
+    if not deplane:
+        return arr
     print("remove plane")
-
-    # reshape data so that they are Nxwin*win
-    d_shape = np.shape(arr)
-    x_flat = x_coords.reshape((d_shape[0] * d_shape[1], d_shape[2] * d_shape[3]))
-    y_flat = y_coords.reshape((d_shape[0] * d_shape[1], d_shape[2] * d_shape[3]))
-    arr_flat = arr.reshape((d_shape[0] * d_shape[1], d_shape[2] * d_shape[3]))
-    # create ones array with same shape as data for lstsq plane fitting
-    std_no_plane = np.full(np.shape(arr_flat)[0], np.nan)
-    if deplane:
-        for i in range(np.shape(arr_flat)[0]):
-            if np.mod(i, 5000) == 0:
-                print(i)
-            win_x = x_flat[i]
-            win_y = y_flat[i]
-            win_d = arr_flat[i]
-
-            # # Fit a plane using polyfit
-            # coefficients = np.polyfit([win_x, win_y], win_d, deg=1)
-
-            # # Extract the plane coefficients
-            # a, b, c = coefficients
-
-            # # Calculate the plane values at each coordinate
-            # plane = a * X + b * Y + c
-
-            # # Remove the plane from var_d
-            # d_no_plane = win_d - plane
-            # std_no_plane[i] = np.std(
-            #     d_no_plane,
-            # )
-
-            ones = np.ones_like(win_d)
-
-            # fit plane
-            valid_indices_d = ~np.isnan(win_d)
-            valid_indices_x = ~np.isnan(win_x)
-            valid_indices_y = ~np.isnan(win_y)
-            valid_indices = (valid_indices_d) & (valid_indices_x) & (valid_indices_y)
-            if np.size(valid_indices) <= 4:
-                std_no_plane[i] = np.nan
-            else:
-                A = np.column_stack(
-                    (win_x[valid_indices], win_y[valid_indices], ones[valid_indices])
-                )
-                b = win_d[valid_indices]
-                plane_coeffs, _, _, _ = lstsq(A, b)
-                plane = np.dot(A, plane_coeffs)
-                d_no_plane = b - plane
-            arr_no_plane = np.reshape(d_no_plane, d_shape[0:2])
+    valid = ~np.isnan(arr) & ~np.isnan(x_coords) & ~np.isnan(y_coords)
+    coef, _ = solve_plane(plane_moments(arr, x_coords, y_coords, valid, axis=(2, 3)), min_count=5)
+    plane = (
+        coef[..., 0, np.newaxis, np.newaxis] * x_coords
+        + coef[..., 1, np.newaxis, np.newaxis] * y_coords
+        + coef[..., 2, np.newaxis, np.newaxis]
+    )
+    arr_no_plane = np.where(valid, arr - plane, np.nan)
     print("Plane removed")
     return arr_no_plane
 
 
-def sliding_window_std(data):
-    arr = data[0]
-    x_coords = data[1]
-    y_coords = data[2]
-    window_shape = (data[3], data[3])
-    deplane = data[4]
-    windows = view_as_windows(arr, window_shape)
-    x_windows = view_as_windows(x_coords, window_shape)
-    y_windows = view_as_windows(y_coords, window_shape)
-
-    # windows = np.lib.stride_tricks.sliding_window_view(arr, window_shape)
-    # x_windows = np.lib.stride_tricks.sliding_window_view(x_coords, window_shape)
-    # y_windows = np.lib.stride_tricks.sliding_window_view(y_coords, window_shape)
-
-    windows_no_outliers = remove_outliers(windows)
-    std_no_plane = np.empty(np.shape(windows)[0:2])
-    if deplane:
-        arr_no_plane = remove_plane(windows_no_outliers, x_windows, y_windows,deplane)
-        print("calc std")
-        std_no_plane = np.nanstd(arr_no_plane, axis=(2, 3))
-        print("std calculated")
+def _std_block(arr, x_coords, y_coords, window_size, deplane, confidence, memory_budget):
+    """
+    trimmed (deplaned) nan std of all windows of a block of rows, see sliding_window_std
+    """
+    lower_bound = (100 - confidence) / 2
+    if not deplane:
+        # coordinates are not used, avoid copies
+        x_coords = np.broadcast_to(0.0, np.shape(arr))
+        y_coords = x_coords
+    variance = window_plane_fit(
+        np.asarray(arr)[np.newaxis],
+        x_coords,
+        y_coords,
+        window_size,
+        trim=(lower_bound, 100 - lower_bound),
+        deplane=deplane,
+        min_count=5 if deplane else 1,
+        memory_budget=memory_budget,
+    )[0]
+    return np.sqrt(variance)
+
+
+def sliding_window_std(data, confidence=95, block_rows=None, n_workers=1, memory_budget=None):
+    """
+    standard deviation in every win x win window after removing values outside the confidence
+    interval of the window and (optionally) a plane in x, y. rows are processed in blocks
+    with a halo of win - 1 rows, within a block the windows are reduced in chunks of at most
+    memory_budget bytes, so the 4D window array of the whole map is never created.
+
+    Args:
+        data (tuple): (arr, x_coords, y_coords, win, deplane)
+        confidence (float, optional): confidence interval in percent. Defaults to 95.
+        block_rows (int, optional): number of output rows per block. Defaults to None,
+                                    one block, or 4 blocks per worker.
+        n_workers (int, optional): number of worker processes for the blocks. Defaults to 1.
+        memory_budget (int, optional): maximum number of bytes of the window chunks of a block.
+                                       Defaults to None (see window_plane_fit).
+
+    Returns:
+        std_no_plane: (rows - win + 1, cols - win + 1) standard deviation of each window
+    """
+    arr, x_coords, y_coords, win, deplane = data
+    out_rows = np.shape(arr)[0] - win + 1
+    if block_rows is None:
+        block_rows = out_rows if n_workers <= 1 else int(np.ceil(out_rows / (4 * n_workers)))
+    block_rows = max(1, int(block_rows))
+    starts = range(0, max(out_rows, 1), block_rows)
+    # input rows of a block: its output rows plus a halo of win - 1 rows
+    jobs = [
+        (
+            arr[r0 : r0 + block_rows + win - 1],
+            x_coords[r0 : r0 + block_rows + win - 1] if deplane else None,
+            y_coords[r0 : r0 + block_rows + win - 1] if deplane else None,
+            win,
+            deplane,
+            confidence,
+            memory_budget,
+        )
+        for r0 in starts
+    ]
+    if n_workers <= 1 or len(jobs) == 1:
+        blocks = [_std_block(*job) for job in jobs]
     else:
-        print("calc std")
-        # for i in range(np.shape(windows)[0]):
-        #     if np.mod(i, 100) == 0:
-        #         print(i)
-        #     for j in range(np.shape(windows)[1]):
-        #         win = windows_no_outliers[i, j, :, :]
-        #         std_no_plane[i, j] = np.nanstd(win)
-        std_no_plane = np.nanstd(windows_no_outliers, axis=(2, 3))
-        print("std calculated")
-
-    return std_no_plane
+        # same pool as run_kernel_tasks, numba runs single threaded in the workers
+        with worker_pool(n_workers) as pool:
+            blocks = list(pool.map(_std_block, *zip(*jobs)))
+    return np.concatenate(blocks, axis=0)
@@ -0,0 +1,122 @@
+import numpy as np
+
+from SPOTSAR_main.Post_processing.multikernel import MultiKernel
+from SPOTSAR_main.Post_processing.singlekernel import SingleKernel
+
+
+def synthetic_stack(n_kernels, lines, width, nan_frac=0.2, seed=0, dtype=np.float64):
+    """
+    Build a MultiKernel object with a smooth displacement field and noise instead of reading
+    GAMMA files. the source data is single precision big endian, as GAMMA output, and is
+    converted to dtype by SingleKernel (latitude and longitude are float64).
+
+    Args:
+        n_kernels (int): number of kernels in the stack
+        lines (int): number of lines of the offset maps
+        width (int): number of columns of the offset maps
+        nan_frac (float, optional): fraction of nan offsets. Defaults to 0.2.
+        seed (int, optional): seed of the random generator. Defaults to 0.
+        dtype (numpy dtype, optional): dtype of the offset maps. Defaults to np.float64.
+
+    Returns:
+        MultiKernel: in-memory stack with the Stack of SingleKernel objects filled in
+    """
+    rng = np.random.default_rng(seed)
+    stack = MultiKernel.__new__(MultiKernel)
+    stack.Stack = []
+    stack.Dtype = np.dtype(dtype).name
+    stack.Memory_budget = None
+    stack.Store_dir = None
+    rows, cols = np.indices((lines, width))
+    field = np.sin(rows / 15) + np.cos(cols / 20)
+    lat = -7.5 + rows * 1e-4
+    lon = 110.4 + cols * 1e-4
+    for k in range(n_kernels):
+        r_off = field + rng.normal(0, 1, (lines, width))
+        a_off = 0.5 * field + rng.normal(0, 1, (lines, width))
+        r_off[rng.random((lines, width)) < nan_frac] = np.nan
+        a_off[rng.random((lines, width)) < nan_frac] = np.nan
+        # no correlation peak where an offset is missing, so mask_nan_data masks these pixels
+        ccp = rng.uniform(0.2, 1, (lines, width))
+        ccp[np.isnan(r_off) | np.isnan(a_off)] = np.nan
+        ccs = rng.uniform(0.01, 0.1, (lines, width))
+        data = [a.astype(">f4") for a in (cols, rows, r_off, a_off, ccp, lat, lon, ccs)]
+        stack.Stack.append(
+            SingleKernel(f"synthetic_{k}", ["20200101", "20200201"], [16 + 8 * k, 16 + 8 * k], 0.0, data, dtype=dtype)
+        )
+    return stack
+
+
+def synthetic_kernel(lines, width, outlier_frac=0.02, nan_frac=0.0, seed=0):
+    """
+    SingleKernel with a smooth displacement field, noise and outliers instead of GAMMA files,
+    prepared for DBSCAN/HDBSCAN
+
+    Args:
+        lines (int): number of lines of the offset map
+        width (int): number of columns of the offset map
+        outlier_frac (float, optional): fraction of outliers in the range offsets. Defaults to 0.02.
+        nan_frac (float, optional): fraction of pixels without data (nan coherence). Defaults to 0.0.
+        seed (int, optional): seed of the random generator. Defaults to 0.
+
+    Returns:
+        SingleKernel: kernel with the nans removed and the DBSCAN input prepared
+    """
+    rng = np.random.default_rng(seed)
+    rows, cols = np.indices((lines, width)).astype(np.float64)
+    field = np.sin(rows / 15) + np.cos(cols / 20)
+    r_off = field + rng.normal(0, 0.1, (lines, width))
+    a_off = 0.5 * field + rng.normal(0, 0.1, (lines, width))
+    outliers = rng.random((lines, width)) < outlier_frac
+    r_off[outliers] += rng.normal(0, 5, np.sum(outliers))
+    lat = -7.5 + rows * 1e-4
+    lon = 110.4 + cols * 1e-4
+    ccp = rng.uniform(0.2, 1, (lines, width))
+    ccs = rng.uniform(0.01, 0.1, (lines, width))
+    if nan_frac > 0:
+        ccp[rng.random((lines, width)) < nan_frac] = np.nan
+    obj = SingleKernel("synthetic", ["20200101", "20200201"], [64, 64], -170.0, [cols, rows, r_off, a_off, ccp, lat, lon, ccs])
+    obj.mask_nan_data()
+    obj.rem_nans()
+    obj.prep_DBSCAN(1, 0, 100)
+    return obj
+
+
+def write_synthetic_frame(data_dir, lines, width, r_step, a_step, windows, seed=0):
+    """
+    Write a full frame of GAMMA-like files: offset text files (11 columns, sorted by azimuth),
+    CCS files and lat/lon files
+
+    Args:
+        data_dir (str): directory to write the files to, ending with a "/"
+        lines (int): number of lines of the frame
+        width (int): number of columns of the frame
+        r_step (int): range step of the offsets
+        a_step (int): azimuth step of the offsets
+        windows (list): kernel window sizes, one offset and CCS file per window
+        seed (int, optional): seed of the random generator. Defaults to 0.
+
+    Returns:
+        list: offset file names
+        list: CCS file names
+        str: lat file
+        str: lon file
+    """
+    rng = np.random.default_rng(seed)
+    lat_file = data_dir + "frame.lat"
+    lon_file = data_dir + "frame.lon"
+    rows, cols = np.indices((lines, width), dtype=np.float32)
+    (-7.6 + rows * 1e-5).astype(">f4").tofile(lat_file)
+    (110.4 + cols * 1e-5).astype(">f4").tofile(lon_file)
+    del rows, cols
+    files = []
+    ccs_files = []
+    for win in windows:
+        azi, rng_pix = np.mgrid[win : lines - win : a_step, win : width - win : r_step]
+        n = azi.size
+        offsets = np.column_stack((rng_pix.ravel(), azi.ravel(), rng.random((n, 9))))
+        files.append(f"c20200101_c20200113_disp_{win}_{win}.txt")
+        np.savetxt(data_dir + files[-1], offsets, fmt=["%d"] * 2 + ["%.6f"] * 9, delimiter="  ")
+        ccs_files.append(f"c20200101_c20200113_{win}_{win}.ccs")
+        rng.uniform(0.01, 0.2, (lines // a_step, width // r_step)).astype(">f4").tofile(data_dir + ccs_files[-1])
+    return files, ccs_files, lat_file, lon_file
@@ -0,0 +1,44 @@
+from types import SimpleNamespace
+
+import pytest
+
+from SPOTSAR_main.Post_processing.multikernel import MultiKernel
+from synthetic_data import write_synthetic_frame
+
+
+@pytest.fixture(scope="session")
+def frame(tmp_path_factory):
+    """small frame of GAMMA-like offset, CCS and lat/lon files with two kernels"""
+    frame = SimpleNamespace(lines=400, width=320, r_step=4, a_step=4)
+    frame.data_dir = str(tmp_path_factory.mktemp("frame")) + "/"
+    frame.files, frame.ccs_files, frame.lat_file, frame.lon_file = write_synthetic_frame(
+        frame.data_dir, frame.lines, frame.width, frame.r_step, frame.a_step, [32, 64]
+    )
+    frame.lines_ccs = frame.lines // frame.a_step
+    frame.width_ccs = frame.width // frame.r_step
+    return frame
+
+
+@pytest.fixture
+def load_frame(frame):
+    """
+    loads the frame into a MultiKernel stack, latlon_method is passed to get_latlon_from_file
+    and the other keyword arguments to MultiKernel
+    """
+
+    def load(latlon_method="memmap", **kwargs):
+        stack = MultiKernel(
+            frame.data_dir, frame.files, frame.data_dir, frame.ccs_files, frame.lat_file, frame.lon_file, -170.0, 35.0,
+            frame.lines_ccs, frame.width_ccs, width=frame.width, **kwargs,
+        )
+        stack.get_params_from_file_name()
+        stack.get_latlon_from_file(frame.width, method=latlon_method)
+        if kwargs.get("ingest") == "numpy":
+            stack.ingest_stack(1, 1, frame.r_step, frame.a_step)
+        else:
+            stack.add_lat_lon_to_data(1, 1)
+            stack.crop_stack_ccs(frame.r_step, frame.a_step)
+            stack.assign_data_to_stack(frame.r_step, frame.a_step)
+        return stack
+
+    return load
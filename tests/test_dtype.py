@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from synthetic_data import synthetic_stack
+
+GRIDS = ("R_idx", "A_idx", "R_off", "A_off", "Ccp_off", "Ccs_off", "SNR", "Mag", "X_off", "Y_off", "Phase")
+
+
+def stacks():
+    return {dtype: synthetic_stack(4, 60, 50, nan_frac=0.1, dtype=dtype) for dtype in (np.float32, np.float64)}
+
+
+def test_kernel_grids_are_float32():
+    obj = synthetic_stack(1, 20, 10, dtype=np.float32).Stack[0]
+    obj.calc_phase()
+    obj.mask_nan_data()
+    for name in GRIDS:
+        grid = getattr(obj, name)
+        assert grid.dtype == np.float32, name
+        assert grid.dtype.isnative, name
+    # geographic coordinates need double precision
+    assert obj.Lat_off.dtype == np.float64
+    assert obj.Lon_off.dtype == np.float64
+
+
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+def test_float32_MKA_equals_float64():
+    results = {dtype: stack.Run_MKA(window_size=3) for dtype, stack in stacks().items()}
+    for mka32, mka64 in zip(results[np.float32], results[np.float64]):
+        assert mka32.dtype == np.float32
+        np.testing.assert_array_equal(np.isnan(mka32), np.isnan(mka64))
+        np.testing.assert_allclose(mka32, mka64, rtol=1e-5, atol=1e-6)
+
+
+def test_float32_med_filt_equals_float64():
+    results = {}
+    for dtype, stack in stacks().items():
+        obj = stack.Stack[0]
+        obj.mask_nan_data()
+        obj.rem_nans()
+        results[dtype] = obj.run_med_filt(3)
+    for diff32, diff64 in zip(results[np.float32], results[np.float64]):
+        assert diff32.dtype == np.float32
+        np.testing.assert_array_equal(np.isnan(diff32), np.isnan(diff64))
+        np.testing.assert_allclose(diff32, diff64, rtol=1e-5, atol=1e-6)
+
+
+def test_float32_HDBSCAN_equals_float64():
+    results = {}
+    for dtype, stack in stacks().items():
+        obj = stack.Stack[0]
+        obj.mask_nan_data()
+        obj.rem_nans()
+        obj.prep_DBSCAN(1, 0, 100)
+        obj.run_HDBSCAN(50, 10)
+        results[dtype] = (obj.HDBSCAN_labels_50_10_vec, obj.HDBSCAN_outlier_scores_50_10_vec)
+    labels32, scores32 = results[np.float32]
+    labels64, scores64 = results[np.float64]
+    np.testing.assert_array_equal(labels32, labels64)
+    np.testing.assert_allclose(scores32, scores64, rtol=1e-6)
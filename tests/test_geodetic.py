@@ -0,0 +1,75 @@
+import numpy as np
+import pyproj
+import pytest
+from scipy.spatial.transform import Rotation
+
+from SPOTSAR_main.Post_processing.enu2geodetic import enu2geodetic
+from SPOTSAR_main.Post_processing.geodetic2enu import ecef2lla, geodetic2enu, lla2ecef
+
+LAT_ORG, LON_ORG, ALT_ORG = -7.54, 110.44, 100.0
+
+
+def points(n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    lat = LAT_ORG + rng.uniform(-0.5, 0.5, n)
+    lon = LON_ORG + rng.uniform(-0.5, 0.5, n)
+    alt = rng.uniform(0, 3000, n)
+    return lat, lon, alt
+
+
+def reference_geodetic2enu(lat, lon, alt, lat_org, lon_org, alt_org):
+    """previous scalar implementation: new transformer and two scipy rotations per point"""
+    transformer = pyproj.Transformer.from_crs(
+        {"proj": "latlong", "ellps": "WGS84", "datum": "WGS84"},
+        {"proj": "geocent", "ellps": "WGS84", "datum": "WGS84"},
+    )
+    x, y, z = transformer.transform(lon, lat, alt, radians=False)
+    x_org, y_org, z_org = transformer.transform(lon_org, lat_org, alt_org, radians=False)
+    vec = np.array([x - x_org, y - y_org, z - z_org])
+    rot1 = Rotation.from_euler("x", -(90 - lat_org), degrees=True).as_matrix()
+    rot3 = Rotation.from_euler("z", -(90 + lon_org), degrees=True).as_matrix()
+    return rot1.dot(rot3).dot(vec)
+
+
+@pytest.mark.parametrize("method", ["pyproj", "numpy"])
+def test_geodetic2enu_equals_per_point(method):
+    lat, lon, alt = points()
+    enu = geodetic2enu(lat, lon, alt, LAT_ORG, LON_ORG, ALT_ORG, method=method)
+    assert enu.shape == (lat.size, 3)
+    reference = np.array([reference_geodetic2enu(*p, LAT_ORG, LON_ORG, ALT_ORG) for p in zip(lat, lon, alt)])
+    np.testing.assert_allclose(enu, reference, rtol=0, atol=1e-6)
+    # a single point gives a (3,) array
+    np.testing.assert_allclose(geodetic2enu(lat[0], lon[0], alt[0], LAT_ORG, LON_ORG, ALT_ORG, method=method), reference[0], atol=1e-6)
+
+
+@pytest.mark.parametrize("method", ["pyproj", "numpy"])
+def test_one_origin_per_point(method):
+    lat, lon, alt = points()
+    lat_org, lon_org, alt_org = points(seed=1)
+    enu = geodetic2enu(lat, lon, alt, lat_org, lon_org, alt_org, method=method)
+    for i in range(0, lat.size, 20):
+        np.testing.assert_allclose(enu[i], reference_geodetic2enu(lat[i], lon[i], alt[i], lat_org[i], lon_org[i], alt_org[i]), atol=1e-6)
+
+
+@pytest.mark.parametrize("method", ["pyproj", "numpy"])
+def test_enu2geodetic_round_trip(method):
+    lat, lon, alt = points()
+    enu = geodetic2enu(lat, lon, alt, LAT_ORG, LON_ORG, ALT_ORG, method=method)
+    lat_rt, lon_rt, alt_rt = enu2geodetic(enu[:, 0], enu[:, 1], enu[:, 2], LAT_ORG, LON_ORG, ALT_ORG, method=method)
+    np.testing.assert_allclose(lat_rt, lat, rtol=0, atol=1e-10)
+    np.testing.assert_allclose(lon_rt, lon, rtol=0, atol=1e-10)
+    np.testing.assert_allclose(alt_rt, alt, rtol=0, atol=1e-6)
+    # a single point gives a list of floats
+    single = enu2geodetic(*enu[0], LAT_ORG, LON_ORG, ALT_ORG, method=method)
+    assert all(isinstance(v, float) for v in single)
+
+
+def test_numpy_ecef_equals_pyproj():
+    lat, lon, alt = points()
+    xyz = lla2ecef(lat, lon, alt, method="numpy")
+    np.testing.assert_allclose(xyz, lla2ecef(lat, lon, alt, method="pyproj"), rtol=0, atol=1e-6)
+    lla = ecef2lla(*xyz, method="numpy")
+    for a, b in zip(lla, (lat, lon, alt)):
+        np.testing.assert_allclose(a, b, rtol=0, atol=1e-6)
+    with pytest.raises(ValueError):
+        lla2ecef(lat, lon, alt, method="scipy")
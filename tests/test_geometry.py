@@ -0,0 +1,74 @@
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from SPOTSAR_main.Post_processing.geometry import Geometry
+
+
+@pytest.fixture
+def latlon(tmp_path):
+    """lat/lon files of a 30 x 20 frame with a corner outside the geocoded area (0)"""
+    rows, cols = np.indices((30, 20))
+    lat = -7.6 + rows * 1e-4
+    lon = 110.4 + cols * 1e-4
+    lat[:5, :4] = 0
+    lon[:5, :4] = 0
+    lat_file = str(tmp_path / "frame.lat")
+    lon_file = str(tmp_path / "frame.lon")
+    lat.astype(">f4").tofile(lat_file)
+    lon.astype(">f4").tofile(lon_file)
+    expected = [np.fromfile(f, dtype=">f4").astype(np.float64).reshape(30, 20) for f in (lat_file, lon_file)]
+    for values in expected:
+        values[values == 0] = np.nan
+    return lat_file, lon_file, expected
+
+
+def test_gather_and_window_equal_full_read(latlon):
+    lat_file, lon_file, expected = latlon
+    geometry = Geometry(lat_file, lon_file, 20)
+    assert geometry.Shape == (30, 20)
+    rows = np.array([[0, 4], [29, 12]])
+    cols = np.array([[0, 3], [19, 7]])
+    for values, full in zip(geometry.gather(rows, cols), expected):
+        assert values.dtype == np.float64 and values.dtype.isnative
+        assert values.shape == rows.shape
+        np.testing.assert_array_equal(values, full[rows, cols])
+    for values, full in zip(geometry.window(slice(3, 9), slice(2, 6)), expected):
+        np.testing.assert_array_equal(values, full[3:9, 2:6])
+    for values, full in zip(geometry.window(), expected):
+        np.testing.assert_array_equal(values, full)
+    # the files are opened read-only
+    assert all(isinstance(m, np.memmap) and not m.flags.writeable for m in geometry.maps)
+
+
+def test_open_shares_geometry(latlon, monkeypatch):
+    lat_file, lon_file, _ = latlon
+    monkeypatch.setattr(Geometry, "_shared", {})
+    geometry = Geometry.open(lat_file, lon_file, 20)
+    monkeypatch.chdir(os.path.dirname(lat_file))
+    assert Geometry.open("frame.lat", "frame.lon", 20) is geometry
+    assert Geometry.open(lat_file, lon_file, 10) is not geometry
+
+
+def test_pickle_reopens_maps(latlon):
+    lat_file, lon_file, expected = latlon
+    geometry = Geometry(lat_file, lon_file, 20)
+    geometry.maps
+    copy = pickle.loads(pickle.dumps(geometry))
+    assert copy._maps is None
+    assert len(pickle.dumps(geometry)) < 1000
+    for values, full in zip(copy.gather([7, 20], [5, 1]), expected):
+        np.testing.assert_array_equal(values, full[[7, 20], [5, 1]])
+
+
+def test_memmap_stack_equals_loaded_stack(load_frame):
+    memmap = load_frame(latlon_method="memmap")
+    loaded = load_frame(latlon_method="load")
+    assert isinstance(memmap.Geometry, Geometry)
+    assert loaded.Geometry is None
+    assert len(memmap.Stack) == len(loaded.Stack) == 2
+    for a, b in zip(memmap.Stack, loaded.Stack):
+        for name in ("Lat_off", "Lon_off", "R_off", "A_off", "Ccs_off"):
+            np.testing.assert_array_equal(getattr(a, name), getattr(b, name), err_msg=name)
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from SPOTSAR_main.TS_processing import read_hdf5_seq, write_hdf5_seq
+
+SHAPE = (10, 9)
+
+
+def items(first, n, seed=0):
+    rng = np.random.default_rng(seed)
+    for i in range(first, first + n):
+        data = rng.normal(0, 1, SHAPE).astype(np.float32)
+        # metadata columns that appear only in later maps
+        metadata = {}
+        if i >= 2:
+            metadata["ccs"] = 0.1 * i
+        if i % 3 == 0 and i > 0:
+            metadata["track"] = f"T{i}"
+        yield f"c{20200101 + i}_c{20200113 + i}", data, metadata
+
+
+@pytest.fixture
+def cube(tmp_path):
+    h5_file = str(tmp_path / "cube.h5")
+    # the second call appends, not a multiple of the chunk length along time
+    assert write_hdf5_seq(h5_file, items(0, 5), layout=(3, 4, 4)) == 5
+    assert write_hdf5_seq(h5_file, items(5, 4, seed=1), layout="map") == 9
+    expected = list(items(0, 5)) + list(items(5, 4, seed=1))
+    return h5_file, expected
+
+
+def test_round_trip(cube):
+    h5_file, expected = cube
+    labels, data, metadata = read_hdf5_seq(h5_file)
+    assert list(labels) == [item[0] for item in expected]
+    np.testing.assert_array_equal(data, [item[1] for item in expected])
+    # columns that were created after the first maps are nan or '' for the earlier maps
+    np.testing.assert_allclose(metadata["ccs"], [np.nan, np.nan] + [0.1 * i for i in range(2, 9)])
+    assert list(metadata["track"]) == ["", "", "", "T3", "", "", "T6", "", ""]
+
+
+def test_epoch_selection(cube):
+    h5_file, expected = cube
+    # labels, negative indices and duplicates, in any order
+    epochs = [expected[6][0], -1, 2, 2, expected[0][0]]
+    labels, data, metadata = read_hdf5_seq(h5_file, epochs=epochs)
+    assert list(labels) == [expected[i][0] for i in [6, 8, 2, 2, 0]]
+    np.testing.assert_array_equal(data, [expected[i][1] for i in [6, 8, 2, 2, 0]])
+    assert list(metadata["track"]) == ["T6", "", "", "", ""]
+    labels, data, _ = read_hdf5_seq(h5_file, epochs=slice(1, 7, 2), rows=slice(2, 8), cols=slice(None, 4))
+    np.testing.assert_array_equal(data, [expected[i][1][2:8, :4] for i in [1, 3, 5]])
+    with pytest.raises(KeyError):
+        read_hdf5_seq(h5_file, epochs="c20200101_c20200101")
+    with pytest.raises(IndexError):
+        read_hdf5_seq(h5_file, epochs=9)
+
+
+def test_pixel_time_series(cube):
+    h5_file, expected = cube
+    cube_data = np.array([item[1] for item in expected])
+    # pixels in several chunks, repeated pixels and negative indices
+    rows = np.array([0, 9, 4, 4, -1, 5])
+    cols = np.array([0, 8, 3, 3, -2, 7])
+    labels, data, _ = read_hdf5_seq(h5_file, epochs=[3, 0], rows=rows, cols=cols)
+    np.testing.assert_array_equal(data, cube_data[[3, 0]][:, rows, cols])
+    with pytest.raises(IndexError):
+        read_hdf5_seq(h5_file, rows=[10], cols=[0])
+    with pytest.raises(IndexError):
+        read_hdf5_seq(h5_file, rows=[0], cols=[-10])
+    with pytest.raises(ValueError):
+        read_hdf5_seq(h5_file, rows=[0, 1], cols=[0])
+
+
+def test_map_shape_must_match(cube):
+    h5_file, _ = cube
+    with pytest.raises(ValueError):
+        write_hdf5_seq(h5_file, [("other", np.zeros((3, 3)))])
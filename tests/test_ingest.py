@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+GRIDS = ["R_off", "A_off", "Ccp_off", "Ccs_off", "Lat_off", "Lon_off", "R_idx", "A_idx"]
+
+
+def assert_same_stack(a, b, grids=GRIDS):
+    assert len(a.Stack) == len(b.Stack)
+    for obj_a, obj_b in zip(a.Stack, b.Stack):
+        for name in grids:
+            np.testing.assert_array_equal(getattr(obj_a, name), getattr(obj_b, name), err_msg=name)
+
+
+def test_numpy_ingest_equals_pandas(load_frame):
+    assert_same_stack(load_frame(ingest="pandas"), load_frame(ingest="numpy"))
+
+
+@pytest.mark.parametrize("ingest", ["pandas", "numpy"])
+def test_store_dir_equals_in_memory(load_frame, tmp_path, ingest):
+    stack = load_frame(ingest=ingest, store_dir=str(tmp_path) + "/")
+    assert isinstance(stack.Stack[0].R_off_raw, np.memmap)
+    assert_same_stack(load_frame(ingest=ingest), stack)
+
+
+def test_numpy_ingest_roi_equals_pandas(load_frame):
+    roi = {"lon": [110.401, 110.402], "lat": [-7.5985, -7.5975]}
+    assert_same_stack(load_frame(ingest="pandas", roi=roi), load_frame(ingest="numpy", roi=roi))
+
+
+def test_unknown_ingest(load_frame):
+    with pytest.raises(ValueError):
+        load_frame(ingest="polars")
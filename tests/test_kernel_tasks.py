@@ -0,0 +1,69 @@
+import os
+
+import h5py
+import numpy as np
+import pytest
+
+from SPOTSAR_main.Post_processing.multikernel import _median_task
+from SPOTSAR_main.Post_processing.run_kernel_tasks import run_kernel_tasks
+from synthetic_data import synthetic_stack
+
+
+def prepared_stack(n_kernels=4):
+    stack = synthetic_stack(n_kernels, 30, 20)
+    for obj in stack.Stack:
+        obj.mask_nan_data()
+        obj.rem_nans()
+    return stack
+
+
+def h5_contents(h5_file):
+    """datasets and attributes of an hdf5 file, without the access times"""
+    contents = {}
+
+    def visit(name, item):
+        if isinstance(item, h5py.Dataset):
+            contents[name] = item[()]
+        for attr, value in item.attrs.items():
+            if attr != "last_access":
+                contents[f"{name}@{attr}"] = value
+
+    with h5py.File(h5_file, "r") as f:
+        f.visititems(visit)
+    return contents
+
+
+def shared_memory_blocks():
+    return set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+
+
+def test_parallel_median_stack_equals_sequential(tmp_path):
+    results = {}
+    for n_workers in [1, 2]:
+        stack = prepared_stack()
+        h5_file = str(tmp_path / f"median_{n_workers}.h5")
+        median_list = stack.outlier_detection_median_stack(2, h5_file, n_workers=n_workers)
+        results[n_workers] = (stack, median_list, h5_contents(h5_file))
+
+    sequential, parallel = results[1], results[2]
+    for a, b in zip(sequential[1], parallel[1]):
+        np.testing.assert_array_equal(b, a)
+    # the results added by the workers are copied back to the kernels
+    for obj_a, obj_b in zip(sequential[0].Stack, parallel[0].Stack):
+        assert sorted(obj_a.Results) == sorted(obj_b.Results)
+        for name in obj_a.Results:
+            np.testing.assert_array_equal(obj_b.Results[name], obj_a.Results[name])
+    assert sorted(sequential[2]) == sorted(parallel[2])
+    for name in sequential[2]:
+        np.testing.assert_array_equal(parallel[2][name], sequential[2][name])
+
+
+def test_failing_task_releases_shared_memory():
+    stack = prepared_stack(6)
+    before = shared_memory_blocks()
+    # a memory budget below one row with halo makes the median filter raise in the worker
+    jobs = [(obj, _median_task, {"filt_rad": 2, "memory_budget": 10 if i == 0 else None}) for i, obj in enumerate(stack.Stack)]
+    with pytest.raises(ValueError, match="memory budget"):
+        for _ in run_kernel_tasks(jobs, n_workers=2):
+            pass
+    assert shared_memory_blocks() - before == set()
@@ -0,0 +1,76 @@
+import numpy as np
+
+from synthetic_data import synthetic_stack
+
+DERIVED = ("SNR", "Mag", "Phase", "X_off", "Y_off")
+
+
+def kernel():
+    obj = synthetic_stack(1, 30, 20, nan_frac=0.1).Stack[0]
+    obj.Heading = -170.0
+    obj.mask_nan_data()
+    obj.rem_nans()
+    return obj
+
+
+def eager(obj):
+    # the derived maps as they were computed when loading the kernel
+    r_off, a_off = obj.R_off_raw, obj.A_off_raw
+    cos_h, sin_h = np.cos(np.deg2rad(obj.Heading)), np.sin(np.deg2rad(obj.Heading))
+    phase = np.degrees(-np.arctan2(a_off, r_off)) + 90 + obj.Heading
+    return {
+        "SNR": obj.Ccp_off_raw / obj.Ccs_off_raw,
+        "Mag": np.hypot(r_off, a_off),
+        "Phase": np.where(phase < 0, phase + 360, phase % 360),
+        "X_off": r_off * cos_h + a_off * sin_h,
+        "Y_off": -r_off * sin_h + a_off * cos_h,
+    }
+
+
+def test_derived_maps_are_computed_on_access():
+    obj = kernel()
+    for name in DERIVED:
+        assert not obj.is_computed(name)
+    # asking for the vector data does not compute the derived maps
+    _, attr_list = obj.get_vec_data()
+    assert not any(name.startswith(DERIVED) for name in attr_list)
+    assert not any(obj.is_computed(name) for name in DERIVED)
+
+    expected = eager(obj)
+    for name in DERIVED:
+        values = getattr(obj, name)
+        assert obj.is_computed(name)
+        np.testing.assert_allclose(values, np.where(obj.Nan_mask, np.nan, expected[name]), rtol=1e-12, err_msg=name)
+        np.testing.assert_allclose(getattr(obj, f"{name}_vec"), obj.grid_to_vec(expected[name]), rtol=1e-12, err_msg=name)
+    _, attr_list = obj.get_vec_data()
+    assert attr_list[-5:] == ["SNR_vec", "Mag_vec", "X_off_vec", "Y_off_vec", "Phase_vec"]
+
+
+def test_vec_computes_derived_map():
+    obj = kernel()
+    np.testing.assert_allclose(obj.Mag_vec, obj.grid_to_vec(eager(obj)["Mag"]), rtol=1e-12)
+    assert obj.is_computed("Mag")
+    assert not obj.is_computed("SNR")
+
+
+def test_assigned_offsets_recompute_derived_maps():
+    obj = kernel()
+    snr = obj.SNR.copy()
+    for name in ("Mag", "Phase", "X_off", "Y_off"):
+        getattr(obj, name)
+    obj.R_off = obj.R_off_raw * 2
+    # the maps of the offsets are dropped, SNR does not depend on them
+    assert not any(obj.is_computed(name) for name in ("Mag", "Phase", "X_off", "Y_off"))
+    assert obj.is_computed("SNR")
+    expected = eager(obj)
+    for name in ("Mag", "Phase", "X_off", "Y_off"):
+        np.testing.assert_allclose(getattr(obj, name), np.where(obj.Nan_mask, np.nan, expected[name]), rtol=1e-12, err_msg=name)
+    np.testing.assert_array_equal(obj.SNR, snr)
+
+
+def test_assigned_derived_map_is_kept():
+    obj = kernel()
+    mag = np.ones_like(obj.R_off_raw)
+    obj.Mag = mag
+    assert obj.Mag_raw is mag
+    np.testing.assert_array_equal(obj.Mag_vec, obj.grid_to_vec(mag))
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from SPOTSAR_main.TS_processing.leastsquare_ts import leastsquare_ts, sbas_design_matrix
+
+# two groups of acquisitions without a pair between them, and one pair from a later to an earlier date
+DATES = ["20200101", "20200113", "20200125", "20200206", "20200413", "20200425", "20200507"]
+PAIRS = [
+    "c20200101_c20200113",
+    "c20200101_c20200125",
+    "c20200113_c20200206",
+    "c20200206_c20200125",
+    "c20200413_c20200425",
+    "c20200413_c20200507",
+    "c20200425_c20200507",
+]
+
+
+def network(seed=0):
+    rng = np.random.default_rng(seed)
+    shape = (6, 5)
+    B, epochs = sbas_design_matrix(PAIRS)
+    velocities = rng.normal(0, 1, (B.shape[1],) + shape)
+    displacements = np.einsum("pi,i...->p...", B, velocities) + rng.normal(0, 0.05, (len(PAIRS),) + shape)
+    # random missing pairs, a pixel without data and a pixel with one pair
+    displacements[rng.random(displacements.shape) < 0.2] = np.nan
+    displacements[:, 0, 0] = np.nan
+    displacements[1:, 0, 1] = np.nan
+    weights = rng.uniform(0.5, 2, displacements.shape)
+    return displacements, weights
+
+
+def per_pixel(displacements, weights=None):
+    # minimum norm least squares of every pixel on its own
+    B, epochs = sbas_design_matrix(PAIRS)
+    dt = np.diff(epochs).astype(np.float64) / 365.25
+    cum_disp = np.full((len(epochs),) + displacements.shape[1:], np.nan)
+    for r, c in np.ndindex(displacements.shape[1:]):
+        d = displacements[:, r, c]
+        valid = ~np.isnan(d)
+        if not np.any(valid):
+            continue
+        sqrt_w = np.ones(valid.sum()) if weights is None else np.sqrt(weights[valid, r, c])
+        v = np.linalg.pinv(sqrt_w[:, np.newaxis] * B[valid], rcond=1e-10) @ (sqrt_w * d[valid])
+        cum_disp[:, r, c] = np.concatenate(([0], np.cumsum(v * dt)))
+    return cum_disp
+
+
+def test_design_matrix():
+    B, epochs = sbas_design_matrix(PAIRS)
+    np.testing.assert_array_equal(epochs, np.array([f"{d[:4]}-{d[4:6]}-{d[6:]}" for d in DATES], dtype="datetime64[D]"))
+    dt = np.diff(epochs).astype(np.float64) / 365.25
+    np.testing.assert_allclose(B[1], [dt[0], dt[1], 0, 0, 0, 0])
+    # later to earlier date
+    np.testing.assert_allclose(B[3], [0, 0, -dt[2], 0, 0, 0])
+    # no pair spans the gap
+    np.testing.assert_array_equal(B[:, 3], 0)
+    np.testing.assert_array_equal(sbas_design_matrix([(a[1:9], a[11:]) for a in PAIRS])[0], B)
+
+
+@pytest.mark.parametrize("weighted", [False, True])
+@pytest.mark.parametrize("memory_budget", [None, 2000])
+def test_leastsquare_ts_equals_per_pixel_pinv(weighted, memory_budget):
+    displacements, weights = network()
+    weights = weights if weighted else None
+    epochs, cum_disp, velocity = leastsquare_ts(PAIRS, displacements, weights=weights, memory_budget=memory_budget)
+    expected = per_pixel(displacements, weights)
+    np.testing.assert_array_equal(np.isnan(cum_disp), np.isnan(expected))
+    np.testing.assert_allclose(cum_disp, expected, rtol=0, atol=1e-14)
+    assert np.all(np.isnan(cum_disp[:, 0, 0])) and np.isnan(velocity[0, 0])
+    # the velocity is the least-squares line through the cumulative displacement
+    t = (epochs - epochs[0]).astype(np.float64) / 365.25
+    slope = np.polyfit(t, np.reshape(expected, (len(t), -1))[:, 1:], 1)[0]
+    np.testing.assert_allclose(np.ravel(velocity)[1:], slope, rtol=1e-10, atol=1e-12)
+
+
+def test_zero_weights_are_missing_pairs():
+    displacements, weights = network()
+    weights[:, 2, 2] = 0
+    masked = displacements.copy()
+    masked[:, 2, 2] = np.nan
+    cum_disp = leastsquare_ts(PAIRS, displacements, weights=weights)[1]
+    np.testing.assert_array_equal(cum_disp, leastsquare_ts(PAIRS, masked, weights=weights)[1])
+    assert np.all(np.isnan(cum_disp[:, 2, 2]))
+
+
+def test_wrong_number_of_pairs():
+    displacements, _ = network()
+    with pytest.raises(ValueError):
+        leastsquare_ts(PAIRS[:-1], displacements)
@@ -0,0 +1,72 @@
+import numpy as np
+
+from synthetic_data import synthetic_kernel
+
+MAPS = ("R_off", "A_off", "Ccp_off", "Ccs_off", "Lat_off", "Lon_off", "SNR", "Mag", "X_off", "Y_off", "Phase")
+
+
+def detected_kernel():
+    obj = synthetic_kernel(40, 30, outlier_frac=0.05, nan_frac=0.1)
+    obj.calc_SNR()
+    obj.calc_Mag()
+    obj.rotate_with_heading()
+    obj.calc_phase()
+    raw = {name: getattr(obj, f"{name}_raw").copy() for name in MAPS}
+    return obj, raw
+
+
+def old_masking(maps, mask):
+    # masking of the detectors before the mask layer: nan written into every map
+    return {name: np.where(mask, np.nan, values) for name, values in maps.items()}
+
+
+def test_chained_detectors_equal_np_where():
+    obj, raw = detected_kernel()
+    expected = old_masking(raw, obj.Nan_mask)
+
+    obj.run_HDBSCAN(20, 5)
+    obj.rem_outliers_HDBSCAN(20, 5)
+    expected = old_masking(expected, obj.get_result("HDBSCAN_labels_20_5", as_grid=True) == -1)
+
+    obj.run_LOF(n_neighbors=10)
+    obj.rem_outliers_LOF(10)
+    expected = old_masking(expected, obj.get_result("LOF_labels_10", as_grid=True) == -1)
+
+    # the median filter reads the maps with the HDBSCAN and LOF outliers masked
+    obj.run_med_filt(2)
+    mag_diff = obj.get_result("Mag_off_med_diff_2", as_grid=True)
+    obj.rem_outliers_median(2, 0.5)
+    expected = old_masking(expected, mag_diff > 0.5 * np.nanmax(mag_diff))
+
+    assert obj.get_active_masks() == ["nan", "HDBSCAN_20_5", "LOF_10", "median_2"]
+    for name in MAPS:
+        np.testing.assert_array_equal(getattr(obj, name), expected[name], err_msg=name)
+        # the raw data is not touched
+        np.testing.assert_array_equal(getattr(obj, f"{name}_raw"), raw[name], err_msg=name)
+
+
+def test_toggled_mask_restores_raw_values():
+    obj, raw = detected_kernel()
+    obj.run_LOF(n_neighbors=10)
+    obj.rem_outliers_LOF(10)
+    lof = obj.Masks["LOF_10"]
+    assert np.any(lof & ~obj.Nan_mask)
+    masked = obj.R_off.copy()
+
+    obj.set_mask_active("LOF_10", False)
+    np.testing.assert_array_equal(obj.R_off, np.where(obj.Nan_mask, np.nan, raw["R_off"]))
+    np.testing.assert_array_equal(obj.Mag, np.where(obj.Nan_mask, np.nan, raw["Mag"]))
+
+    obj.set_mask_active("nan", False)
+    for name in MAPS:
+        np.testing.assert_array_equal(getattr(obj, name), raw[name], err_msg=name)
+    # the raw arrays are returned as they are when no mask is active
+    assert obj.R_off is obj.R_off_raw
+
+    obj.set_mask_active("nan")
+    obj.set_mask_active("LOF_10")
+    np.testing.assert_array_equal(obj.R_off, masked)
+
+    obj.remove_mask("LOF_10")
+    assert obj.get_active_masks() == ["nan"]
+    np.testing.assert_array_equal(obj.R_off, np.where(obj.Nan_mask, np.nan, raw["R_off"]))
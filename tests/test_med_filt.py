@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from scipy.ndimage import generic_filter
+from skimage.morphology import disk
+
+from SPOTSAR_main.Post_processing.fast_med_filt import fast_med_filt
+from synthetic_data import synthetic_stack
+
+
+def offset_maps(lines, width, nan_frac=0.2, seed=0, dtype=np.float64):
+    rng = np.random.default_rng(seed)
+    R_off = rng.normal(0, 1, (lines, width)).astype(dtype)
+    A_off = rng.normal(0, 1, (lines, width)).astype(dtype)
+    R_off[rng.random((lines, width)) < nan_frac] = np.nan
+    A_off[rng.random((lines, width)) < nan_frac] = np.nan
+    return R_off, A_off
+
+
+# np.nanmedian warns for all-nan footprints
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+@pytest.mark.parametrize("radius", [1, 3, 6])
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_fast_med_filt_equals_generic_filter(radius, dtype):
+    R_off, A_off = offset_maps(40, 30, dtype=dtype)
+    R_med, A_med = fast_med_filt(R_off, A_off, radius)
+    np.testing.assert_array_equal(R_med, generic_filter(R_off, np.nanmedian, footprint=disk(radius)))
+    np.testing.assert_array_equal(A_med, generic_filter(A_off, np.nanmedian, footprint=disk(radius)))
+
+
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+def test_fast_med_filt_all_nan_footprints():
+    # large gaps give footprints without any value
+    R_off, A_off = offset_maps(30, 30, nan_frac=0.9)
+    R_med, A_med = fast_med_filt(R_off, A_off, 1)
+    assert np.any(np.isnan(R_med))
+    np.testing.assert_array_equal(R_med, generic_filter(R_off, np.nanmedian, footprint=disk(1)))
+    np.testing.assert_array_equal(A_med, generic_filter(A_off, np.nanmedian, footprint=disk(1)))
+
+
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+def test_tiled_run_med_filt_equals_generic_filter():
+    obj = synthetic_stack(1, 40, 30).Stack[0]
+    obj.mask_nan_data()
+    obj.rem_nans()
+    generic = [v.copy() for v in obj.run_med_filt(4, method="generic_filter")]
+    # numba filter over row tiles with a halo of the filter radius
+    tiled = obj.run_med_filt(4, memory_budget=4 * 30 * 8 * 12, method="numba")
+    for a, b in zip(tiled, generic):
+        np.testing.assert_array_equal(a, b)
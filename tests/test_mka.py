@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from synthetic_data import synthetic_stack
+
+
+# nanpercentile/nanmean warn for all-nan windows in the loop version
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+@pytest.mark.parametrize("window_size", [1, 3])
+def test_numba_MKA_equals_loop(window_size):
+    stack = synthetic_stack(6, 40, 30)
+    loop_R, loop_A = (m.copy() for m in stack.Run_MKA(window_size=window_size, method="loop"))
+    numba_R, numba_A = stack.Run_MKA(window_size=window_size, method="numba")
+    np.testing.assert_array_equal(numba_R, loop_R)
+    np.testing.assert_array_equal(numba_A, loop_A)
+
+
+def test_tiled_MKA_equals_untiled():
+    stack = synthetic_stack(6, 40, 30)
+    numba_R, numba_A = (m.copy() for m in stack.Run_MKA(window_size=3, method="numba"))
+    # a few rows per tile
+    stack.Memory_budget = 6 * 30 * 8 * 8
+    tiled_R, tiled_A = stack.Run_MKA(window_size=3, method="numba")
+    np.testing.assert_array_equal(tiled_R, numba_R)
+    np.testing.assert_array_equal(tiled_A, numba_A)
+
+
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+def test_MKA_subset_and_comp_lim():
+    stack = synthetic_stack(5, 20, 20)
+    subset_R, _ = (m.copy() for m in stack.Run_MKA([0, 2, 4], method="numba"))
+    loop_R, _ = stack.Run_MKA([0, 2, 4], method="loop")
+    np.testing.assert_array_equal(subset_R, loop_R)
+    # comp_lim is the largest fraction of nan kernels, with 0 a pixel needs a value in every kernel
+    strict_R, _ = stack.Run_MKA(comp_lim=0.0, method="numba")
+    valid = np.all(np.stack([~np.isnan(obj.R_off) for obj in stack.Stack]), axis=0)
+    np.testing.assert_array_equal(~np.isnan(strict_R), valid)
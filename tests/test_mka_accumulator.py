@@ -0,0 +1,45 @@
+import numpy as np
+
+from synthetic_data import synthetic_stack
+
+
+def test_incremental_MKA_equals_numba():
+    n_kernels = 8
+    stack = synthetic_stack(n_kernels, 40, 30, dtype=np.float32)
+    # leave-one-out subsets, each kernel is removed from and added back to the accumulator
+    for left_out in range(n_kernels):
+        subset = [i for i in range(n_kernels) if i != left_out]
+        numba_R, numba_A = (m.copy() for m in stack.Run_MKA(subset, method="numba"))
+        incremental_R, incremental_A = stack.Run_MKA(subset, method="incremental")
+        np.testing.assert_array_equal(np.isnan(incremental_R), np.isnan(numba_R))
+        np.testing.assert_array_equal(np.isnan(incremental_A), np.isnan(numba_A))
+        np.testing.assert_allclose(incremental_R, numba_R, rtol=1e-5, atol=1e-6)
+        np.testing.assert_allclose(incremental_A, numba_A, rtol=1e-5, atol=1e-6)
+
+
+def test_accumulator_add_remove():
+    stack = synthetic_stack(12, 30, 20)
+    accumulator = stack.get_MKA_accumulator()
+    rng = np.random.default_rng(1)
+    added = []
+    for i in rng.permutation(12):
+        accumulator.add(stack.Stack[i])
+        added.append(i)
+    for i in rng.permutation(12)[:5]:
+        accumulator.remove(stack.Stack[i])
+        added.remove(i)
+    numba_R, numba_A = (m.copy() for m in stack.Run_MKA(sorted(added), method="numba"))
+    incremental_R, incremental_A = accumulator.MKA()
+    np.testing.assert_allclose(incremental_R, numba_R, rtol=1e-10, atol=1e-12)
+    np.testing.assert_allclose(incremental_A, numba_A, rtol=1e-10, atol=1e-12)
+
+
+def test_accumulator_window_MKA_equals_numba():
+    stack = synthetic_stack(6, 30, 20)
+    accumulator = stack.get_MKA_accumulator()
+    for obj in stack.Stack:
+        accumulator.add(obj)
+    numba_R, numba_A = (m.copy() for m in stack.Run_MKA(window_size=3, method="numba"))
+    incremental_R, incremental_A = accumulator.MKA(3)
+    np.testing.assert_array_equal(incremental_R, numba_R)
+    np.testing.assert_array_equal(incremental_A, numba_A)
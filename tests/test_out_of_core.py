@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from SPOTSAR_main.Post_processing.get_tiles import get_tiles
+from synthetic_data import synthetic_stack
+
+GRIDS = ["R_off", "A_off", "Ccp_off", "Ccs_off", "Lat_off", "Lon_off", "R_idx", "A_idx"]
+
+
+def test_get_tiles_cover_rows_with_halo():
+    assert get_tiles(50, 3, 10) == [(0, 50, 0, 50)]
+    tiles = get_tiles(50, 3, 10, memory_budget=160)
+    assert len(tiles) > 1
+    # written rows cover the grid once, read rows add the halo within the grid
+    assert np.array_equal(np.concatenate([np.arange(ws, we) for _, _, ws, we in tiles]), np.arange(50))
+    for read_start, read_stop, write_start, write_stop in tiles:
+        assert read_start == max(write_start - 3, 0)
+        assert read_stop == min(write_stop + 3, 50)
+    with pytest.raises(ValueError):
+        get_tiles(50, 3, 10, memory_budget=60)
+
+
+def test_store_dir_equals_in_memory(load_frame, tmp_path):
+    in_memory = load_frame()
+    stack = load_frame(store_dir=str(tmp_path) + "/")
+    assert len(stack.Stack) == len(in_memory.Stack)
+    for a, b in zip(in_memory.Stack, stack.Stack):
+        # the out-of-core kernels are memory mapped from the store
+        assert isinstance(b.R_off_raw, np.memmap)
+        for k in GRIDS:
+            np.testing.assert_array_equal(np.asarray(getattr(b, k)), np.asarray(getattr(a, k)), err_msg=k)
+
+
+@pytest.mark.parametrize("method", ["numba", "generic_filter"])
+def test_tiled_median_filter_equals_whole_map(method):
+    obj = synthetic_stack(1, 40, 30).Stack[0]
+    obj.mask_nan_data()
+    obj.rem_nans()
+    whole = [v.copy() for v in obj.run_med_filt(3, method=method)]
+    # row tiles of a few rows with a halo of the filter radius
+    tiled = obj.run_med_filt(3, memory_budget=4 * 30 * 8 * 10, method=method)
+    for a, b in zip(tiled, whole):
+        np.testing.assert_array_equal(a, b)
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from SPOTSAR_main.Post_processing.multikernel import MultiKernel
+from SPOTSAR_main.Post_processing.query_index import EARTH_RADIUS
+from synthetic_data import synthetic_kernel
+
+Q_LATS = [-7.4975, -7.496]
+Q_LONS = [110.4020, 110.4030]
+RADIUS = 120.0
+
+
+def great_circle_distance(lats, lons, q_lat, q_lon):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lats, lons, q_lat, q_lon))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(a))
+
+
+def query_stack():
+    stack = MultiKernel.__new__(MultiKernel)
+    stack.Stack = [synthetic_kernel(60, 50, seed=seed) for seed in range(2)]
+    for obj in stack.Stack:
+        # no data close to the circles, where the polygon and the great circle distance can differ
+        R_off = obj.R_off_raw.copy()
+        for q_lat, q_lon in zip(Q_LATS, Q_LONS):
+            dist = great_circle_distance(obj.Lat_off_raw, obj.Lon_off_raw, q_lat, q_lon)
+            R_off[np.abs(dist - RADIUS) < 0.05 * RADIUS] = np.nan
+        obj.R_off = R_off
+    return stack
+
+
+def test_tree_equals_polygon_away_from_circle_edge():
+    stack = query_stack()
+    tree, _ = stack.query_point_stack("R_off_vec", Q_LATS, Q_LONS, RADIUS, method="tree")
+    polygon, _ = stack.query_point_stack("R_off_vec", Q_LATS, Q_LONS, RADIUS, method="polygon")
+    for tree_stats, polygon_stats in zip(tree, polygon):
+        # window sizes, mean, median, std and 95% interval
+        assert tree_stats[:2] == polygon_stats[:2]
+        for a, b in zip(tree_stats[2:], polygon_stats[2:]):
+            assert np.all(np.isfinite(a))
+            np.testing.assert_allclose(a, b, rtol=1e-6, atol=1e-9)
+
+
+def test_query_index_follows_the_grid():
+    stack = query_stack()
+    index = stack.get_query_index()
+    assert stack.get_query_index() is index
+    # ingesting the stack again replaces the coordinate maps
+    for obj in stack.Stack:
+        obj.Lat_off = obj.Lat_off_raw + 1e-3
+        obj.Lon_off = obj.Lon_off_raw + 1e-3
+    moved = stack.get_query_index()
+    assert moved is not index
+    np.testing.assert_allclose(moved.Lats, index.Lats + 1e-3)
+    assert stack.get_query_index() is moved
+    # and so does a different set of kernels
+    stack.Stack = stack.Stack[:1]
+    assert stack.get_query_index() is not moved
+
+
+def test_query_point_method():
+    with pytest.raises(ValueError):
+        query_stack().query_point_stack("R_off_vec", Q_LATS, Q_LONS, RADIUS, method="grid")
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from SPOTSAR_main.Post_processing.radius_graph import radius_graph
+from SPOTSAR_main.Post_processing.query_index import EARTH_RADIUS
+
+
+def skewed_grid(lines, width, seed=0):
+    """
+    coordinates of a sheared and rotated grid (as a kernel of a descending track), with
+    scattered and blocks of missing pixels
+    """
+    rng = np.random.default_rng(seed)
+    rows, cols = np.indices((lines, width))
+    angle = np.deg2rad(-170.0)
+    # meters: azimuth steps along the track, range steps at 50 degrees to it
+    north = rows * 30.0 * np.cos(angle) + cols * 25.0 * np.cos(angle + np.deg2rad(50))
+    east = rows * 30.0 * np.sin(angle) + cols * 25.0 * np.sin(angle + np.deg2rad(50))
+    lat = -7.5 + np.degrees(north / EARTH_RADIUS)
+    lon = 110.4 + np.degrees(east / (EARTH_RADIUS * np.cos(np.radians(-7.5))))
+    valid = rng.random((lines, width)) > 0.3
+    valid[10:18, 5:12] = False
+    valid[:, -3:] = False
+    return lat[valid], lon[valid], rows[valid], cols[valid]
+
+
+@pytest.mark.parametrize("radius", [40.0, 120.0])
+def test_grid_equals_tree_on_skewed_masked_grid(radius):
+    lats, lons, rows, cols = skewed_grid(40, 30)
+    tree = radius_graph(lats, lons, radius, method="tree")
+    grid = radius_graph(lats, lons, radius, method="grid", rows=rows, cols=cols)
+    assert tree.nnz > 2 * len(lats)
+    np.testing.assert_array_equal(grid.indptr, tree.indptr)
+    np.testing.assert_array_equal(grid.indices, tree.indices)
+    np.testing.assert_allclose(grid.data, tree.data, rtol=1e-9, atol=1e-6)
+    # symmetric, every point is its own neighbour at distance 0
+    assert abs(tree - tree.T).max() < 1e-6
+    np.testing.assert_array_equal(tree.diagonal(), 0)
+
+
+def test_grid_needs_rows_and_cols():
+    lats, lons, rows, cols = skewed_grid(10, 10)
+    with pytest.raises(ValueError):
+        radius_graph(lats, lons, 50.0, method="grid")
+    with pytest.raises(ValueError):
+        radius_graph(lats, lons, 50.0, method="brute")
@@ -0,0 +1,74 @@
+import numpy as np
+
+from SPOTSAR_main.Post_processing.result_cache import ResultCache
+from synthetic_data import synthetic_stack
+
+INPUT_KEYS = ["R_off", "A_off"]
+
+
+def test_same_params_hit(tmp_path):
+    obj = synthetic_stack(1, 20, 10).Stack[0]
+    cache = ResultCache(str(tmp_path / "cache.h5"))
+    key = cache.make_key(obj, "median", {"filt_rad": 2}, INPUT_KEYS)
+    assert cache.get(obj, "median", key) is None
+    cache.put(obj, "median", key, {"Mag_vec": np.arange(5.0)}, {"filt_rad": 2})
+    # same kernel, analysis, parameters and input: same key
+    assert cache.make_key(obj, "median", {"filt_rad": 2}, INPUT_KEYS) == key
+    cached = cache.get(obj, "median", key)
+    np.testing.assert_array_equal(cached["Mag_vec"], np.arange(5.0))
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    # a new cache object of the same file finds the result
+    assert ResultCache(cache.H5_file).get(obj, "median", key) is not None
+
+
+def test_changed_input_or_params_miss(tmp_path):
+    obj = synthetic_stack(1, 20, 10).Stack[0]
+    cache = ResultCache(str(tmp_path / "cache.h5"))
+    key = cache.make_key(obj, "median", {"filt_rad": 2}, INPUT_KEYS)
+    cache.put(obj, "median", key, {"Mag_vec": np.arange(5.0)})
+    assert cache.make_key(obj, "median", {"filt_rad": 3}, INPUT_KEYS) != key
+    assert cache.make_key(obj, "HDBSCAN", {"filt_rad": 2}, INPUT_KEYS) != key
+    # one changed value of an input array
+    obj.R_off_raw[3, 4] += 1
+    changed_key = cache.make_key(obj, "median", {"filt_rad": 2}, INPUT_KEYS)
+    assert changed_key != key
+    assert cache.get(obj, "median", changed_key) is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_kernels_do_not_collide(tmp_path):
+    # kernels with the same data but other windows, stored in one file
+    stack = synthetic_stack(2, 20, 10, seed=1)
+    obj_a, obj_b = stack.Stack
+    obj_b.__dict__.update({k: v for k, v in obj_a.__dict__.items() if k.endswith("_raw")})
+    cache = ResultCache(str(tmp_path / "cache.h5"))
+    keys = [cache.make_key(obj, "median", {"filt_rad": 2}, INPUT_KEYS) for obj in stack.Stack]
+    assert keys[0] != keys[1]
+    for obj, key, value in zip(stack.Stack, keys, [1.0, 2.0]):
+        cache.put(obj, "median", key, {"Mag_vec": np.full(4, value)})
+    np.testing.assert_array_equal(cache.get(obj_a, "median", keys[0])["Mag_vec"], np.full(4, 1.0))
+    np.testing.assert_array_equal(cache.get(obj_b, "median", keys[1])["Mag_vec"], np.full(4, 2.0))
+    # the key of one kernel is not found under the other kernel
+    assert cache.get(obj_b, "median", keys[0]) is None
+    assert cache.stats()["entries"] == 2
+
+
+def test_max_bytes_evicts_least_recently_used(tmp_path):
+    stack = synthetic_stack(3, 20, 10)
+    arrays = {"Mag_vec": np.zeros(100)}
+    nbytes = arrays["Mag_vec"].nbytes
+    cache = ResultCache(str(tmp_path / "cache.h5"), max_bytes=2 * nbytes)
+    keys = [cache.make_key(obj, "median", {"filt_rad": 2}, INPUT_KEYS) for obj in stack.Stack]
+    cache.put(stack.Stack[0], "median", keys[0], arrays)
+    cache.put(stack.Stack[1], "median", keys[1], arrays)
+    # using the first result makes the second one the least recently used
+    assert cache.get(stack.Stack[0], "median", keys[0]) is not None
+    cache.put(stack.Stack[2], "median", keys[2], arrays)
+    assert cache.get(stack.Stack[1], "median", keys[1]) is None
+    assert cache.get(stack.Stack[0], "median", keys[0]) is not None
+    assert cache.get(stack.Stack[2], "median", keys[2]) is not None
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["entries"] == 2
+    assert stats["nbytes"] <= 2 * nbytes
@@ -0,0 +1,32 @@
+import numpy as np
+from sklearn import metrics
+
+from SPOTSAR_main.Post_processing.roc_batch import roc_batch
+
+
+def test_roc_batch_equals_sklearn():
+    # reference inliers (1) and outliers (0), unknown (nan) where not labelled
+    rng = np.random.default_rng(0)
+    shape = (60, 50)
+    labels = (rng.random(shape) > 0.1).astype(np.float64)
+    labels[rng.random(shape) < 0.3] = np.nan
+    # rounded scores to get ties, nan where there is no score
+    scores = {}
+    for method in ["HDBSCAN", "LOF"]:
+        for param in range(3):
+            score = np.round(labels * rng.uniform(0.2, 1) + rng.normal(0, 0.5, shape), 2)
+            score[rng.random(shape) < 0.05] = np.nan
+            scores[(method, param)] = score
+
+    # small blocks so that the scores are evaluated over several blocks
+    table, curves = roc_batch(labels, scores, key_names=("method", "param"), memory_budget=20000, return_curves=True)
+    assert len(table) == len(scores)
+    for row in table.itertuples():
+        score = scores[(row.method, row.param)]
+        test = ~np.isnan(labels) & ~np.isnan(score)
+        fpr, tpr, thresh = metrics.roc_curve(labels[test], score[test], drop_intermediate=False)
+        np.testing.assert_allclose(row.auc, metrics.roc_auc_score(labels[test], score[test]), rtol=1e-12)
+        assert row.best_threshold == thresh[np.argmax(tpr - fpr)]
+        # sklearn starts the curves at an infinite threshold
+        for a, b in zip(curves[(row.method, row.param)], (fpr, tpr, thresh)):
+            np.testing.assert_allclose(a[1:], b[1:])
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from SPOTSAR_main.Post_processing.geometry import Geometry
+from SPOTSAR_main.Post_processing.roi import roi_bounds
+
+# the frame has latitude -7.6 + row * 1e-5 and longitude 110.4 + col * 1e-5 (see write_synthetic_frame)
+ROIS = [
+    {"rng": [100, 200], "azi": [120, 260]},
+    {"lon": [110.4015, 110.4005], "lat": [-7.5985, -7.5975]},
+    {"polygon": [(110.4005, -7.5985), (110.4015, -7.5985), (110.4005, -7.5975)]},
+]
+
+
+def assert_block_of_full_frame(stack, full, r_step, a_step):
+    i0 = int((stack.Limits[0] - full.Limits[0]) / r_step)
+    j0 = int((stack.Limits[2] - full.Limits[2]) / a_step)
+    n, m = stack.Stack[0].R_off.shape
+    assert (n, m) < full.Stack[0].R_off.shape
+    for a, b in zip(full.Stack, stack.Stack):
+        for name in ["R_off", "A_off", "Ccp_off", "Ccs_off", "Lat_off", "Lon_off"]:
+            np.testing.assert_array_equal(np.asarray(getattr(a, name))[i0 : i0 + n, j0 : j0 + m], getattr(b, name), err_msg=name)
+
+
+@pytest.mark.parametrize("roi", ROIS, ids=["radar", "box", "polygon"])
+def test_roi_equals_block_of_full_frame(frame, load_frame, roi):
+    full = load_frame()
+    stack = load_frame(roi=roi)
+    assert len(stack.Stack) == len(full.Stack)
+    assert_block_of_full_frame(stack, full, frame.r_step, frame.a_step)
+
+
+def test_roi_with_store_dir(frame, load_frame, tmp_path):
+    full = load_frame()
+    stack = load_frame(roi=ROIS[1], store_dir=str(tmp_path))
+    assert isinstance(stack.Stack[0].R_off_raw, np.memmap)
+    assert_block_of_full_frame(stack, full, frame.r_step, frame.a_step)
+
+
+def test_roi_bounds(frame):
+    geometry = Geometry.open(frame.lat_file, frame.lon_file, frame.width)
+    box = roi_bounds(ROIS[1], geometry)
+    # pixel (rng, azi) is lat/lon pixel (azi - 1, rng - 1), the float32 longitudes are about 1 pixel apart
+    np.testing.assert_allclose(np.array(box) - 1, [50, 150, 150, 250], atol=2)
+    # the triangle fills the box up to its hypotenuse
+    assert roi_bounds(ROIS[2], geometry) == box
+    assert roi_bounds(ROIS[1], geometry, r_start=11, a_start=21) == (box[0] - 10, box[1] - 10, box[2] - 20, box[3] - 20)
+    assert roi_bounds({"rng": [200, 100], "azi": [5, 9]}) == (100, 200, 5, 9)
+    with pytest.raises(ValueError):
+        roi_bounds(ROIS[1])
+    with pytest.raises(ValueError):
+        roi_bounds({"lon": [0, 1], "lat": [0, 1]}, geometry)
+    with pytest.raises(ValueError):
+        roi_bounds({"x": [0, 1]}, geometry)
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from SPOTSAR_main.Post_processing.multikernel import MultiKernel
+from SPOTSAR_main.Post_processing.window_plane_fit import window_plane_fit
+from synthetic_data import synthetic_kernel
+
+
+def rss_stack():
+    stack = MultiKernel.__new__(MultiKernel)
+    stack.Memory_budget = None
+    stack.Stack = [synthetic_kernel(18, 14, nan_frac=0.1, seed=seed) for seed in range(2)]
+    return stack
+
+
+@pytest.mark.parametrize("deramp", [True, False])
+@pytest.mark.parametrize("memory_budget", [None, 20000])
+def test_vectorized_RSS_equals_loop(deramp, memory_budget):
+    stack = rss_stack()
+    loop = stack.Run_RSS(window_size=5, deramp=deramp, method="loop")
+    loop_maps = stack.Rss_maps
+    # a small budget solves the windows in blocks of rows
+    stack.Memory_budget = memory_budget
+    vectorized = stack.Run_RSS(window_size=5, deramp=deramp, method="vectorized")
+    for (loop_r, loop_a), (vec_r, vec_a) in zip(loop_maps, stack.Rss_maps):
+        np.testing.assert_array_equal(np.isnan(vec_r), np.isnan(loop_r))
+        np.testing.assert_allclose(vec_r, loop_r, rtol=1e-7, atol=1e-12)
+        np.testing.assert_allclose(vec_a, loop_a, rtol=1e-7, atol=1e-12)
+    np.testing.assert_allclose(vectorized, loop, rtol=1e-7)
+
+
+def test_untrimmed_plane_fit_equals_lstsq():
+    rng = np.random.default_rng(0)
+    y, x = np.indices((12, 10)).astype(np.float64)
+    values = np.stack((0.3 * x - 0.2 * y + rng.normal(0, 1, x.shape), rng.normal(0, 1, x.shape)))
+    values[0, rng.random(x.shape) < 0.15] = np.nan
+    w = 4
+    variance = window_plane_fit(values, x, y, w)
+    for i in range(x.shape[0] - w + 1):
+        for j in range(x.shape[1] - w + 1):
+            win = (slice(i, i + w), slice(j, j + w))
+            # points that are finite in both maps
+            ok = np.all(np.isfinite(values[(slice(None),) + win]), axis=0)
+            design = np.column_stack((x[win][ok], y[win][ok], np.ones(np.sum(ok))))
+            for k in range(2):
+                coef = np.linalg.lstsq(design, values[k][win][ok], rcond=None)[0]
+                np.testing.assert_allclose(variance[k, i, j], np.var(values[k][win][ok] - design @ coef), rtol=1e-8, atol=1e-12)
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from sliding_window_std_functions import sliding_window_std
+
+
+def window_std(arr, x_coords, y_coords, win, deplane, confidence=95):
+    """trimmed (deplaned) nan std of every window, one window at a time"""
+    lower_bound = (100 - confidence) / 2
+    out = np.full((arr.shape[0] - win + 1, arr.shape[1] - win + 1), np.nan)
+    for i in range(out.shape[0]):
+        for j in range(out.shape[1]):
+            win_d = arr[i : i + win, j : j + win].ravel()
+            lo, hi = np.nanpercentile(win_d, [lower_bound, 100 - lower_bound])
+            keep = (win_d >= lo) & (win_d <= hi)
+            if not deplane:
+                out[i, j] = np.nanstd(win_d[keep])
+                continue
+            keep &= np.isfinite(x_coords[i : i + win, j : j + win].ravel()) & np.isfinite(y_coords[i : i + win, j : j + win].ravel())
+            if np.sum(keep) < 5:
+                continue
+            design = np.column_stack(
+                (x_coords[i : i + win, j : j + win].ravel()[keep], y_coords[i : i + win, j : j + win].ravel()[keep], np.ones(np.sum(keep)))
+            )
+            coef = np.linalg.lstsq(design, win_d[keep], rcond=None)[0]
+            out[i, j] = np.std(win_d[keep] - design @ coef)
+    return out
+
+
+def std_data(deplane, seed=0):
+    rng = np.random.default_rng(seed)
+    y_coords, x_coords = np.indices((20, 16)).astype(np.float64)
+    arr = 0.05 * x_coords - 0.1 * y_coords + rng.normal(0, 1, x_coords.shape)
+    arr[rng.random(arr.shape) < 0.1] = np.nan
+    arr[rng.random(arr.shape) < 0.02] += 20
+    return arr, x_coords, y_coords, 5, deplane
+
+
+@pytest.mark.parametrize("deplane", [False, True])
+def test_sliding_window_std_equals_per_window(deplane):
+    data = std_data(deplane)
+    arr = data[0].copy()
+    reference = window_std(*data)
+    std = sliding_window_std(data)
+    np.testing.assert_array_equal(np.isnan(std), np.isnan(reference))
+    np.testing.assert_allclose(std, reference, rtol=1e-8, atol=1e-12)
+    # the input is not modified
+    np.testing.assert_array_equal(data[0], arr)
+
+
+@pytest.mark.parametrize("deplane", [False, True])
+def test_blocks_equal_whole_map(deplane):
+    data = std_data(deplane, seed=1)
+    whole = sliding_window_std(data)
+    # blocks of 3 output rows with a halo, windows in chunks of a small memory budget
+    np.testing.assert_array_equal(sliding_window_std(data, block_rows=3, memory_budget=20000), whole)
+
+
+def test_worker_pool_equals_whole_map():
+    data = std_data(True, seed=2)
+    np.testing.assert_array_equal(sliding_window_std(data, block_rows=3, n_workers=2), sliding_window_std(data))
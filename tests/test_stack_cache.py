@@ -0,0 +1,85 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from SPOTSAR_main.Post_processing.multikernel import MultiKernel
+
+
+@pytest.fixture
+def build(frame, tmp_path):
+    """build_cache of a copy of the frame, the files can be touched without changing the frame"""
+    copy_dir = str(tmp_path / "frame") + "/"
+    shutil.copytree(frame.data_dir, copy_dir)
+    cache_file = str(tmp_path / "stack.cache")
+
+    def build(n_files=len(frame.files), r_step=frame.r_step, dtype=np.float32, hash_sources=False):
+        return MultiKernel.build_cache(
+            cache_file, copy_dir, frame.files[:n_files], copy_dir, frame.ccs_files[:n_files],
+            copy_dir + os.path.basename(frame.lat_file), copy_dir + os.path.basename(frame.lon_file),
+            -170.0, 35.0, frame.lines_ccs, frame.width_ccs, frame.width, 1, 1, r_step, frame.a_step,
+            hash_sources=hash_sources, dtype=dtype,
+        )
+
+    build.copy_dir = copy_dir
+    build.files = frame.files
+    return build
+
+
+def assert_same_stack(a, b):
+    assert len(a.Stack) == len(b.Stack)
+    for obj_a, obj_b in zip(a.Stack, b.Stack):
+        for k in ["R_off", "A_off", "Ccs_off", "Lat_off", "Lon_off"]:
+            np.testing.assert_array_equal(np.asarray(getattr(obj_a, k)), np.asarray(getattr(obj_b, k)), err_msg=k)
+
+
+def test_cache_is_reused(build, capsys):
+    stack = build()
+    capsys.readouterr()
+    cached = build()
+    assert capsys.readouterr().out == ""
+    assert_same_stack(stack, cached)
+
+
+def test_touched_file_rebuilds(build, capsys):
+    build()
+    path = build.copy_dir + build.files[0]
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    capsys.readouterr()
+    build()
+    assert "outdated" in capsys.readouterr().out
+    # the rebuilt cache is up to date again
+    build()
+    assert capsys.readouterr().out == ""
+
+
+def test_touched_file_with_hash_is_reused(build, capsys):
+    build(hash_sources=True)
+    path = build.copy_dir + build.files[0]
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    capsys.readouterr()
+    build(hash_sources=True)
+    assert capsys.readouterr().out == ""
+
+
+def test_other_file_list_rebuilds(build, capsys):
+    assert len(build(n_files=1).Stack) == 1
+    capsys.readouterr()
+    stack = build()
+    assert "sources" in capsys.readouterr().out
+    assert len(stack.Stack) == len(build.files)
+    # and back to fewer files
+    assert len(build(n_files=1).Stack) == 1
+
+
+@pytest.mark.parametrize("change", [{"r_step": 8}, {"dtype": np.float64}])
+def test_other_params_rebuild(build, capsys, change):
+    build()
+    capsys.readouterr()
+    stack = build(**change)
+    assert "other parameters" in capsys.readouterr().out
+    if "dtype" in change:
+        assert stack.Stack[0].R_off.dtype == np.float64
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+from sklearn.neighbors import LocalOutlierFactor
+
+from SPOTSAR_main.Post_processing.lof_sweep import lof_sweep
+from synthetic_data import synthetic_kernel
+
+
+def test_HDBSCAN_sweep_equals_per_fit():
+    obj = synthetic_kernel(60, 50)
+    min_samples = 10
+    min_cluster_sizes = [20, 40, 80, 150]
+    sweep = obj.run_HDBSCAN_sweep(min_cluster_sizes, min_samples)
+    for size in min_cluster_sizes:
+        # labels, outlier scores and probabilities of one fit
+        for a, b in zip(obj.run_HDBSCAN(size, min_samples), sweep[size]):
+            np.testing.assert_array_equal(b, a)
+
+
+# LocalOutlierFactor warns for more neighbours than points
+@pytest.mark.filterwarnings("ignore:n_neighbors")
+def test_lof_sweep_equals_LocalOutlierFactor():
+    rng = np.random.default_rng(0)
+    n = 2000
+    X = rng.normal(0, 1, (n, 4))
+    X[: n // 50] += rng.normal(0, 6, (n // 50, 4))
+    n_neighbors_list = [5, 20, 50, n + 10]
+    sweep = lof_sweep(X, n_neighbors_list)
+    for n_neighbors in n_neighbors_list:
+        clf = LocalOutlierFactor(n_neighbors=n_neighbors)
+        labels = clf.fit_predict(X)
+        np.testing.assert_array_equal(sweep[n_neighbors][0], labels)
+        np.testing.assert_allclose(sweep[n_neighbors][1], clf.negative_outlier_factor_, rtol=1e-10)
+
+
+def test_LOF_sweep_equals_run_LOF():
+    obj = synthetic_kernel(40, 30, nan_frac=0.1)
+    sweep = obj.run_LOF_sweep([10, 20])
+    for n_neighbors in [10, 20]:
+        for a, b in zip(obj.run_LOF(n_neighbors=n_neighbors), sweep[n_neighbors]):
+            np.testing.assert_array_equal(b, a)
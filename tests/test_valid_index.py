@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from synthetic_data import synthetic_stack
+
+
+def kernel():
+    obj = synthetic_stack(1, 30, 20, nan_frac=0.1).Stack[0]
+    obj.mask_nan_data()
+    obj.rem_nans()
+    return obj
+
+
+def test_valid_index_selects_nan_free_pixels():
+    obj = kernel()
+    valid = ~obj.Nan_mask
+    np.testing.assert_array_equal(obj.Valid_index, np.flatnonzero(valid))
+    assert obj.Valid_index.dtype == np.int32
+    np.testing.assert_array_equal(obj.R_off_vec, obj.R_off_raw[valid])
+    np.testing.assert_array_equal(obj.Lat_off_vec, obj.Lat_off_raw[valid])
+    rows, cols = np.nonzero(valid)
+    np.testing.assert_array_equal(obj.Row_index_vec, rows)
+    np.testing.assert_array_equal(obj.Col_index_vec, cols)
+    np.testing.assert_array_equal(obj.vec_to_grid(obj.A_off_vec), obj.A_off)
+
+
+def test_vectors_are_reused_until_index_or_map_changes():
+    obj = kernel()
+    r_off_vec = obj.R_off_vec
+    assert obj.R_off_vec is r_off_vec
+    # masks do not change the vectors
+    obj.add_mask("test", obj.R_off_raw > 1)
+    assert obj.R_off_vec is r_off_vec
+
+    obj.R_off = obj.R_off_raw + 1
+    np.testing.assert_array_equal(obj.R_off_vec, r_off_vec + 1)
+
+    r_off_vec = obj.R_off_vec
+    obj.reset_vecs()
+    assert obj.R_off_vec is not r_off_vec
+    np.testing.assert_array_equal(obj.R_off_vec, obj.R_off_raw[~(obj.Nan_mask | (obj.R_off_raw - 1 > 1))])
+
+
+def test_results_follow_valid_index():
+    obj = kernel()
+    old_index = obj.Valid_index
+    labels = np.arange(old_index.size, dtype=np.int64) % 3 - 1
+    scores = np.linspace(0, 1, old_index.size)
+    obj.set_result("HDBSCAN_labels_50_10", labels)
+    obj.set_result("LOF_outlier_scores_20", scores)
+    label_grid = obj.vec_to_grid(labels.astype(float))
+    score_grid = obj.vec_to_grid(scores)
+
+    # fewer valid pixels: the results keep their dtype
+    obj.add_mask("outliers", label_grid == -1)
+    obj.reset_vecs()
+    assert obj.Valid_index.size < old_index.size
+    assert obj.HDBSCAN_labels_50_10_vec.dtype == np.int64
+    np.testing.assert_array_equal(obj.HDBSCAN_labels_50_10_vec, obj.grid_to_vec(label_grid))
+    np.testing.assert_array_equal(obj.LOF_outlier_scores_20_vec, obj.grid_to_vec(score_grid))
+    assert np.all(obj.HDBSCAN_labels_50_10_vec != -1)
+    # name of earlier versions
+    np.testing.assert_array_equal(obj.LOF_outlier_score_20_vec, obj.LOF_outlier_scores_20_vec)
+
+    # back to the nan free pixels: removed pixels have no value any more
+    obj.rem_nans()
+    np.testing.assert_array_equal(obj.Valid_index, old_index)
+    restored = obj.HDBSCAN_labels_50_10_vec
+    assert restored.dtype == np.float64
+    np.testing.assert_array_equal(restored, np.where(labels == -1, np.nan, labels))
+    np.testing.assert_array_equal(obj.HDBSCAN_labels_50_10, np.where(label_grid == -1, np.nan, label_grid))
+    np.testing.assert_array_equal(obj.get_result("LOF_outlier_scores_20", as_grid=True), np.where(label_grid == -1, np.nan, score_grid))
+
+
+def test_result_errors():
+    obj = kernel()
+    with pytest.raises(ValueError):
+        obj.set_result("short", np.zeros(obj.Valid_index.size - 1))
+    with pytest.raises(KeyError):
+        obj.get_result("missing")
+    with pytest.raises(AttributeError):
+        obj.missing_vec
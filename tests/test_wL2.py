@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from SPOTSAR_main.Post_processing.run_wL2 import run_wL2
+from synthetic_data import synthetic_kernel
+
+
+@pytest.mark.parametrize("windows", [(64, 64), (6, 4), (3, 9)])
+def test_numba_wL2_equals_loop(windows):
+    # holes in the grid, windows larger and smaller than the grid
+    obj = synthetic_kernel(25, 20, nan_frac=0.2)
+    obj.R_win, obj.A_win = windows
+    loop = obj.calc_local_L2(method="loop").copy()
+    numba = obj.calc_local_L2(method="numba")
+    np.testing.assert_array_equal(np.isnan(numba), np.isnan(loop))
+    np.testing.assert_allclose(numba, loop, rtol=1e-10)
+
+
+def test_run_wL2_equals_loop():
+    obj = synthetic_kernel(25, 20, nan_frac=0.2)
+    obj.R_win, obj.A_win = 5, 5
+    data = obj.get_data_4_wL2()
+    loop = run_wL2(*data, method="loop")
+    numba = run_wL2(*data, method="numba")
+    np.testing.assert_array_equal(np.isnan(numba), np.isnan(loop))
+    np.testing.assert_allclose(numba, loop, rtol=1e-10)
+    with pytest.raises(ValueError):
+        run_wL2(*data, method="tree")